@@ -0,0 +1,170 @@
+"""alert_dispatcher.py — background delivery of queued alerts
+One daemon thread per process drains the AlertQueue:
+  - one SMTP session (connect, STARTTLS, login) is kept open and reused across
+    polls; it is checked with NOOP after being idle and rebuilt on disconnect;
+  - alerts due in the same poll are grouped per recipient, several alerts
+    becoming one digest email;
+  - failed sends go back to the queue with exponential backoff.
+
+SMTP settings come from the environment (see SMTPConfig.from_env); point
+SMTP_HOST/SMTP_PORT at alerts/smtp_stub.py to test without a mail server.
+"""
+
+import os
+import time
+import smtplib
+import logging
+import threading
+from email.mime.text import MIMEText
+
+logger = logging.getLogger("alert_logger")
+
+
+class SMTPConfig:
+    def __init__(self, host, port=587, username=None, password=None, starttls=True,
+                 sender="shwasnetra@yourdomain.com", timeout=20):
+        self.host, self.port = host, port
+        self.username, self.password = username, password
+        self.starttls = starttls
+        self.sender = sender
+        self.timeout = timeout
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            host=os.getenv("SMTP_HOST", "smtp.yourdomain.com"),
+            port=int(os.getenv("SMTP_PORT", "587")),
+            username=os.getenv("SMTP_USER") or None,
+            password=os.getenv("SMTP_PASSWORD") or None,
+            starttls=os.getenv("SMTP_STARTTLS", "1") not in ("0", "false", "no"),
+            sender=os.getenv("ALERT_FROM", "shwasnetra@yourdomain.com"),
+        )
+
+
+class SMTPSession:
+    """A reusable authenticated SMTP connection."""
+
+    def __init__(self, config, idle_check=30.0):
+        self.config = config
+        self.idle_check = idle_check
+        self._server = None
+        self._last_used = 0.0
+        self.connects = 0
+
+    def _connect(self):
+        c = self.config
+        server = smtplib.SMTP(c.host, c.port, timeout=c.timeout)
+        server.ehlo()
+        if c.starttls:
+            server.starttls()
+            server.ehlo()
+        if c.username:
+            server.login(c.username, c.password or "")
+        self.connects += 1
+        return server
+
+    def _alive(self):
+        if self._server is None:
+            return False
+        if time.monotonic() - self._last_used < self.idle_check:
+            return True
+        try:
+            return self._server.noop()[0] == 250
+        except OSError:  # includes smtplib.SMTPException
+            return False
+
+    def send(self, msg):
+        if not self._alive():
+            self.close()
+            self._server = self._connect()
+        try:
+            self._server.send_message(msg)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            # server dropped an idle session between checks: reconnect once
+            self.close()
+            self._server = self._connect()
+            self._server.send_message(msg)
+        self._last_used = time.monotonic()
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                pass
+            self._server = None
+
+
+def build_message(sender, recipient, alerts):
+    if len(alerts) == 1:
+        subject, body = alerts[0]["subject"], alerts[0]["body"]
+    else:
+        subject = f"🚨 ShwasNetra: {len(alerts)} alerts"
+        body = "\n\n---\n\n".join(f"{a['subject']}\n{a['body']}" for a in alerts)
+    msg = MIMEText(body)
+    msg['Subject'] = subject
+    msg['From'] = sender
+    msg['To'] = recipient
+    return msg
+
+
+class AlertDispatcher:
+    def __init__(self, queue, config=None, poll_interval=5.0, max_attempts=6, base_backoff=30.0, batch_size=200):
+        self.queue = queue
+        self.config = config or SMTPConfig.from_env()
+        self.session = SMTPSession(self.config)
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="alert-dispatcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=10):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.session.close()
+
+    def wake(self):
+        """Run a dispatch pass now instead of waiting for the next poll."""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.dispatch_once()
+            except Exception as e:
+                logger.error(f"[alerts] dispatch loop error: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def dispatch_once(self):
+        """Send everything currently due; returns the number of alerts delivered."""
+        alerts = self.queue.claim_due(self.batch_size)
+        by_recipient = {}
+        for a in alerts:
+            by_recipient.setdefault(a["recipient"], []).append(a)
+
+        delivered = 0
+        for recipient, group in by_recipient.items():
+            try:
+                self.session.send(build_message(self.config.sender, recipient, group))
+                self.queue.mark_sent([a["id"] for a in group])
+                delivered += len(group)
+                logger.info(f"Sent {len(group)} alert(s) to {recipient}")
+            except Exception as e:
+                if not isinstance(e, smtplib.SMTPResponseException):
+                    self.session.close()  # connection-level failure; a 4xx/5xx reply leaves the session usable
+                self.queue.mark_failed(group, e, self.max_attempts, self.base_backoff)
+                logger.error(f"Failed to send {len(group)} alert(s) to {recipient}: {e}")
+        return delivered
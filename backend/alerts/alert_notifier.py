@@ -1,11 +1,15 @@
-import smtplib
-from email.mime.text import MIMEText
 import logging
 from datetime import datetime
 import os
+import threading
 
-# Setup logging for alert tracking
-ALERT_LOG_FILE = 'backend/logs/alerts.log'
+from alerts.alert_queue import AlertQueue
+from alerts.alert_dispatcher import AlertDispatcher
+
+# Setup logging for alert tracking (paths relative to backend/, whatever the working directory)
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+ALERT_LOG_FILE = os.path.join(BACKEND_DIR, 'logs', 'alerts.log')
+ALERT_DB_FILE = os.getenv("ALERT_DB", os.path.join(BACKEND_DIR, 'logs', 'alerts.db'))
 os.makedirs(os.path.dirname(ALERT_LOG_FILE), exist_ok=True)
 
 alert_logger = logging.getLogger("alert_logger")
@@ -13,7 +17,27 @@ alert_logger.setLevel(logging.INFO)
 file_handler = logging.FileHandler(ALERT_LOG_FILE)
 alert_logger.addHandler(file_handler)
 
+_queue = None
+_dispatcher = None
+_lock = threading.Lock()
+
+
+def get_dispatcher():
+    """Process-wide queue + dispatcher, started on first use."""
+    global _queue, _dispatcher
+    with _lock:
+        if _dispatcher is None:
+            _queue = AlertQueue(ALERT_DB_FILE)
+            _dispatcher = AlertDispatcher(_queue, poll_interval=float(os.getenv("ALERT_POLL_SECONDS", "5")))
+            _dispatcher.start()
+        return _dispatcher
+
+
 def send_email_alert(to_email, filename, confidence):
+    """
+    Queue a cancer alert; the dispatcher thread delivers it within ALERT_POLL_SECONDS,
+    folding alerts for the same recipient into one digest.
+    """
     subject = "🚨 Lung Cancer Alert from ShwasNetra"
     body = f"""
     Alert! A scan has been classified as CANCER by the AI.
@@ -25,16 +49,11 @@ def send_email_alert(to_email, filename, confidence):
     Please review the case immediately.
     """
 
-    msg = MIMEText(body)
-    msg['Subject'] = subject
-    msg['From'] = "shwasnetra@yourdomain.com"
-    msg['To'] = to_email
-
     try:
-        with smtplib.SMTP('smtp.yourdomain.com', 587) as server:
-            server.starttls()
-            server.login("your_email", "your_password")
-            server.send_message(msg)
-            alert_logger.info(f"Sent cancer alert for {filename} to {to_email}")
+        dispatcher = get_dispatcher()
+        alert_id = dispatcher.queue.enqueue(to_email, subject, body)
+        alert_logger.info(f"Queued cancer alert {alert_id} for {filename} to {to_email}")
+        return alert_id
     except Exception as e:
-        alert_logger.error(f"Failed to send alert: {str(e)}")
+        alert_logger.error(f"Failed to queue alert: {str(e)}")
+        return None
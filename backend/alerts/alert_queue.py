@@ -0,0 +1,97 @@
+"""alert_queue.py — durable alert queue in SQLite
+Alerts are rows, so they survive restarts and can be enqueued by any gunicorn
+worker. Dispatchers claim due rows under a lease (BEGIN IMMEDIATE makes the
+claim atomic across processes); a dispatcher that dies mid-send leaves its
+rows to be reclaimed when the lease expires.
+
+status: pending -> sending -> sent, or back to pending with a backoff, or
+dead after max_attempts.
+"""
+
+import os
+import time
+import sqlite3
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS alerts (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    recipient       TEXT NOT NULL,
+    subject         TEXT NOT NULL,
+    body            TEXT NOT NULL,
+    created_at      REAL NOT NULL,
+    status          TEXT NOT NULL DEFAULT 'pending',
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    lease_until     REAL,
+    last_error      TEXT
+);
+CREATE INDEX IF NOT EXISTS alerts_due ON alerts (status, next_attempt_at);
+"""
+
+
+class AlertQueue:
+    def __init__(self, db_path, lease_seconds=120):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+
+    def _conn(self):
+        # one connection per thread; autocommit, transactions are explicit
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, recipient, subject, body, delay=0.0):
+        now = time.time()
+        cur = self._conn().execute(
+            "INSERT INTO alerts (recipient, subject, body, created_at, next_attempt_at) VALUES (?, ?, ?, ?, ?)",
+            (recipient, subject, body, now, now + delay))
+        return cur.lastrowid
+
+    def claim_due(self, limit=100):
+        """Lease up to `limit` due alerts (pending, or sending with an expired lease)."""
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT * FROM alerts WHERE (status = 'pending' AND next_attempt_at <= ?) "
+                "OR (status = 'sending' AND lease_until < ?) ORDER BY id LIMIT ?",
+                (now, now, limit)).fetchall()
+            if rows:
+                conn.executemany("UPDATE alerts SET status = 'sending', lease_until = ? WHERE id = ?",
+                                 [(now + self.lease_seconds, r["id"]) for r in rows])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return [dict(r) for r in rows]
+
+    def mark_sent(self, ids):
+        self._conn().executemany("UPDATE alerts SET status = 'sent', attempts = attempts + 1, "
+                                 "lease_until = NULL, last_error = NULL WHERE id = ?", [(i,) for i in ids])
+
+    def mark_failed(self, alerts, error, max_attempts, base_backoff=30.0, max_backoff=3600.0):
+        """Reschedule with exponential backoff (base * 2^attempts), or give up after max_attempts."""
+        now = time.time()
+        updates = []
+        for a in alerts:
+            attempts = a["attempts"] + 1
+            status = "dead" if attempts >= max_attempts else "pending"
+            delay = min(max_backoff, base_backoff * 2 ** (attempts - 1))
+            updates.append((status, attempts, now + delay, str(error)[:500], a["id"]))
+        self._conn().executemany("UPDATE alerts SET status = ?, attempts = ?, next_attempt_at = ?, "
+                                 "lease_until = NULL, last_error = ? WHERE id = ?", updates)
+
+    def counts(self):
+        rows = self._conn().execute("SELECT status, COUNT(*) AS n FROM alerts GROUP BY status").fetchall()
+        return {r["status"]: r["n"] for r in rows}
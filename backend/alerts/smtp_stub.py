@@ -0,0 +1,104 @@
+"""smtp_stub.py — minimal local SMTP server for testing alert delivery
+Accepts EHLO/HELO, AUTH (any credentials), MAIL, RCPT, DATA, RSET, NOOP and
+QUIT without TLS, and keeps every message in memory. `fail_first` rejects the
+first N messages with a 451 to exercise retries; `connections` shows whether
+the dispatcher reused its session.
+
+    python alerts/smtp_stub.py --port 8025
+    SMTP_HOST=127.0.0.1 SMTP_PORT=8025 SMTP_STARTTLS=0 python app.py
+"""
+
+import argparse
+import threading
+import socketserver
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write((line + "\r\n").encode())
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self.reply("220 shwasnetra-smtp-stub ready")
+        mail_from, rcpts = None, []
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            line = raw.decode(errors="replace").rstrip("\r\n")
+            cmd = line[:4].upper()
+            if cmd in ("EHLO", "HELO"):
+                self.reply("250-shwasnetra-smtp-stub")
+                self.reply("250 AUTH PLAIN LOGIN")
+            elif cmd == "AUTH":
+                if line.upper().startswith("AUTH LOGIN"):
+                    for prompt in ("VXNlcm5hbWU6", "UGFzc3dvcmQ6"):  # base64 "Username:" / "Password:"
+                        self.reply(f"334 {prompt}")
+                        self.rfile.readline()
+                self.reply("235 Authentication successful")
+            elif cmd == "MAIL":
+                mail_from, rcpts = line.split(":", 1)[1].strip(), []
+                self.reply("250 OK")
+            elif cmd == "RCPT":
+                rcpts.append(line.split(":", 1)[1].strip())
+                self.reply("250 OK")
+            elif cmd == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                while True:
+                    chunk = self.rfile.readline().decode(errors="replace")
+                    if chunk.rstrip("\r\n") == "." or not chunk:
+                        break
+                    data.append(chunk[1:] if chunk.startswith("..") else chunk)
+                with server.lock:
+                    if server.failures_left > 0:
+                        server.failures_left -= 1
+                        self.reply("451 Temporary failure (stub)")
+                        continue
+                    server.messages.append({"from": mail_from, "to": rcpts, "data": "".join(data)})
+                self.reply("250 OK queued")
+            elif cmd == "RSET":
+                mail_from, rcpts = None, []
+                self.reply("250 OK")
+            elif cmd == "NOOP":
+                self.reply("250 OK")
+            elif cmd == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class SMTPStub(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, port=0, fail_first=0):
+        super().__init__(("127.0.0.1", port), _SMTPHandler)
+        self.lock = threading.Lock()
+        self.messages = []
+        self.connections = 0
+        self.failures_left = fail_first
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local SMTP stub for alert testing.")
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--fail-first", type=int, default=0)
+    args = parser.parse_args()
+    stub = SMTPStub(args.port, args.fail_first)
+    print(f"SMTP stub listening on 127.0.0.1:{stub.port}")
+    try:
+        stub.serve_forever()
+    except KeyboardInterrupt:
+        print(f"{len(stub.messages)} message(s) over {stub.connections} connection(s)")
@@ -1,5 +1,7 @@
 import os
 import io
+import functools
+import hmac
 import json
 import traceback
 import binascii
@@ -10,20 +12,33 @@ from typing import Optional
 from dotenv import load_dotenv
 load_dotenv()
 
-from flask import Flask, request, jsonify, send_from_directory, send_file
+from flask import Flask, request, jsonify, send_from_directory, send_file, g, Response
 from flask_cors import CORS, cross_origin
 from werkzeug.utils import secure_filename
 from PIL import Image
 import numpy as np
-import tensorflow as tf
 import requests
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
+from utils.runtime_config import apply_thread_config
+from utils.inference_backends import load_backend, backend_config_from_env
+from utils.cascade import build_cascade, decode_image
+from utils.tta import TTAEnsemble, LatencyBudget
+from utils.model_registry import ModelRegistry, HotSwapModel, ManifestWatcher
+from utils.admission import (AdmissionController, Rejected, DeadlineExceeded, check_deadline, lane_from, deadline_from,
+                             admission_config_from_env, LANES, INTERACTIVE, BULK)
+from utils.serving_metrics import (stage_timer, record_model, record_admission, render_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE,
+                                   REQUESTS, REQUEST_SECONDS, INFLIGHT, STAGE_SECONDS, PREDICTIONS, LLM_SECONDS,
+                                   ADMISSIONS, DRIFT_SCORE)
+from utils.tracing import span, traced, start_trace, current_trace, end_trace, server_timing, exporter_from_env
+from routes.get_history import get_history
+from utils.report_engine import ReportEngine, remember_image
+from utils.drift_monitor import DriftMonitor
+from utils.similarity_index import SimilarCaseStore
 
 import logging
 import sys
+import time
 
 # -------------------------
 # Logging
@@ -35,17 +50,23 @@ logging.basicConfig(stream=sys.stdout, level=logging.INFO, format="%(asctime)s [
 # -------------------------
 app = Flask(__name__)
 
-# allow production frontend + local dev origins
-CORS(app, resources={r"/*": {"origins": [
+# allow production frontend + local dev origins (asgi.py applies the same list)
+CORS_ORIGINS = [
     "https://shwasnetra.vercel.app",
     "http://localhost:5173",
     "http://127.0.0.1:5173",
     "http://localhost:8083",
     "http://127.0.0.1:8083"
-]}}, supports_credentials=True)
+]
+CORS_EXPOSE_HEADERS = ["X-Request-ID", "Server-Timing"]
+CORS(app, resources={r"/*": {"origins": CORS_ORIGINS}}, supports_credentials=True, expose_headers=CORS_EXPOSE_HEADERS)
 
 # limit upload size to 50 MB
-app.config["MAX_CONTENT_LENGTH"] = 50 * 1024 * 1024  # 50 MB
+MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_BYTES  # 50 MB
+
+# /api/history (prediction history CSV)
+app.register_blueprint(get_history)
 
 # -------------------------
 # Paths & Config
@@ -66,31 +87,65 @@ PBKDF2_ITERS = 200_000
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "").strip()
 GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.2-70b-versatile").strip()
 OPENAI_KEY = os.getenv("OPENAI_API_KEY", "").strip()
+# overridable so benchmarks/stub_llm.py can stand in for the providers
+GROQ_API_URL = os.getenv("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions").strip()
+OPENAI_API_URL = os.getenv("OPENAI_API_URL", "https://api.openai.com/v1/chat/completions").strip()
+
+# Thread layout (WEB_CONCURRENCY / INTRA_OP_THREADS / INTER_OP_THREADS / CPU_AFFINITY);
+# must run before any model runtime starts its thread pools
+THREAD_CONFIG = apply_thread_config()
+
+# Serving backend: "keras" (default), "tflite" or "onnx" (exports from export_models.py)
+SERVING_CONFIG = backend_config_from_env()
+SERVING_BACKEND = SERVING_CONFIG["backend"]
 
 CLASS_NAMES = ["Normal", "Benign", "Malignant", "Unchest"]
-CHEST_FILTER_THRESHOLD = 0.5  # threshold for chest filter model
+# Tracing: no export by default; TRACE_EXPORT=jsonl writes OTLP/JSON lines to logs/traces.jsonl (or TRACE_FILE),
+# TRACE_EXPORT=otlp posts to a collector; TRACE_SAMPLE_RATE (default 0.1) is the share exported (see utils/tracing.py)
+TRACE_EXPORTER = exporter_from_env(os.path.join(BASE_DIR, "logs", "traces.jsonl"))
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))
+UNTRACED_ENDPOINTS = {"/health", "/metrics"}  # probes and scrapes: no trace, no export
+
+# Comma-separated emails alerted (via the queued dispatcher in alerts/) on Malignant predictions
+ALERT_RECIPIENTS = [e.strip() for e in os.getenv("ALERT_RECIPIENTS", "").split(",") if e.strip()]
+ALERT_LABELS = {"Malignant"}
+
+CHEST_FILTER_THRESHOLD = 0.5  # chest filter sigmoid is P(unchest); at or above this the upload is rejected
+# "two_stage" (chest filter, then classifier on accepted images) or "multihead" (one backbone pass)
+CASCADE_MODE = os.getenv("CASCADE_MODE", "two_stage").strip().lower()
+# Test-time augmentation / checkpoint ensemble for the classifier stage (two-stage cascade only)
+TTA_ENABLED = os.getenv("TTA", "0").strip().lower() in ("1", "true", "yes", "on")
+TTA_MAX_VIEWS = int(os.getenv("TTA_VIEWS", "4"))
+TTA_BUDGET_MS = float(os.getenv("TTA_BUDGET_MS", "250"))
+ENSEMBLE_MODEL_PATHS = [p.strip() for p in os.getenv("ENSEMBLE_MODEL_PATHS", "").split(",") if p.strip()]
 
 # -------------------------
 # Model Loading
 # -------------------------
-def load_model_safe(path):
-    try:
-        if not os.path.exists(path):
-            app.logger.info(f"[model] not found: {path}")
-            return None
-        app.logger.info(f"[model] loading: {path}")
-        model = tf.keras.models.load_model(path)
-        app.logger.info(f"[model] loaded: {path} input_shape={getattr(model, 'input_shape', None)}")
-        return model
-    except Exception as e:
-        app.logger.exception(f"[model] failed to load {path}: {e}")
-        return None
-
-CHEST_MODEL_PATH = os.path.join(MODEL_DIR, "chest_filter_model.keras")
-MAIN_MODEL_PATH = os.path.join(MODEL_DIR, "lung_cancer_detector_mobilenetv2_full.keras")
-
-CHEST_FILTER_MODEL = load_model_safe(CHEST_MODEL_PATH)
-MAIN_MODEL = load_model_safe(MAIN_MODEL_PATH)
+CHEST_MODEL_PATH = os.getenv("CHEST_MODEL_PATH", os.path.join(MODEL_DIR, "chest_filter_model.keras"))
+MAIN_MODEL_PATH = os.getenv("MAIN_MODEL_PATH", os.path.join(MODEL_DIR, "lung_cancer_detector_mobilenetv2_full.keras"))
+MULTIHEAD_MODEL_PATH = os.getenv("MULTIHEAD_MODEL_PATH", os.path.join(MODEL_DIR, "shwasnetra_cascade_multihead.keras"))
+
+# Versioned artifacts: the registry's active version wins over the *_MODEL_PATH defaults
+MODEL_REGISTRY = ModelRegistry(os.getenv("MODEL_REGISTRY_DIR", os.path.join(MODEL_DIR, "registry")))
+MODEL_ADMIN_TOKEN = os.getenv("MODEL_ADMIN_TOKEN", "").strip()
+
+def load_served_model(role, default_path):
+    """Hot-swappable slot for `role`, starting on the registry's active version if there is one."""
+    active, _ = MODEL_REGISTRY.pointers(role)
+    path = MODEL_REGISTRY.resolve(role, active) if active else None
+    version = active if path else "default"
+    model = load_backend(path or default_path, SERVING_CONFIG)
+    return HotSwapModel(role, model, version=version, config=SERVING_CONFIG)
+
+# Keras, TFLite or ONNX Runtime behind the same predict()/input_shape surface
+CHEST_FILTER_MODEL = load_served_model("chest_filter", CHEST_MODEL_PATH)
+MAIN_MODEL = load_served_model("main", MAIN_MODEL_PATH)
+SERVED_MODELS = {"chest_filter": CHEST_FILTER_MODEL, "main": MAIN_MODEL}
+# every worker follows manifest changes (activate / shadow) on its own
+MODEL_WATCHER = ManifestWatcher(MODEL_REGISTRY, SERVED_MODELS,
+                                interval=float(os.getenv("MODEL_REGISTRY_POLL_SECONDS", "5"))).start()
+MODEL_WATCHER.sync()
 
 # sensible defaults; may be overridden by loaded model shapes
 CHEST_INPUT_SIZE = (128, 128)
@@ -108,8 +163,37 @@ try:
 except Exception:
     pass
 
+# multi-output model: Keras only (exported TFLite/ONNX graphs keep a single output)
+MULTIHEAD_MODEL = load_backend(MULTIHEAD_MODEL_PATH, dict(SERVING_CONFIG, backend="keras")) \
+    if CASCADE_MODE == "multihead" else None
+ENSEMBLE_MODELS = [load_backend(p, SERVING_CONFIG) for p in ENSEMBLE_MODEL_PATHS] if TTA_ENABLED else []
+TTA = TTAEnsemble([MAIN_MODEL, *ENSEMBLE_MODELS], MAIN_INPUT_SIZE, LatencyBudget(TTA_BUDGET_MS, TTA_MAX_VIEWS)) \
+    if TTA_ENABLED and MAIN_MODEL else None
+CASCADE = build_cascade(CHEST_FILTER_MODEL, MAIN_MODEL, CLASS_NAMES, CHEST_FILTER_THRESHOLD,
+                        CHEST_INPUT_SIZE, MAIN_INPUT_SIZE, multihead_model=MULTIHEAD_MODEL, tta=TTA)
+
+record_model("chest_filter", CHEST_FILTER_MODEL)
+record_model("main", MAIN_MODEL)
+if CASCADE_MODE == "multihead":
+    record_model("multihead", MULTIHEAD_MODEL)
+
 app.logger.info(f"CHEST_INPUT_SIZE={CHEST_INPUT_SIZE} MAIN_INPUT_SIZE={MAIN_INPUT_SIZE} "
-                f"CHEST_MODEL_LOADED={bool(CHEST_FILTER_MODEL)} MAIN_MODEL_LOADED={bool(MAIN_MODEL)}")
+                f"CHEST_MODEL_LOADED={bool(CHEST_FILTER_MODEL)} MAIN_MODEL_LOADED={bool(MAIN_MODEL)} "
+                f"CASCADE={CASCADE.mode} TTA={'%d models' % len(TTA.models) if TTA else 'off'}")
+
+# PDF reports: cached layout/fonts, in-memory Grad-CAM, LRU of rendered payloads
+REPORT_ENGINE = ReportEngine(STATIC_FOLDER, cache_ttl=int(os.getenv("REPORT_CACHE_TTL", "300")),
+                             workers=int(os.getenv("REPORT_WORKERS", "0")) or None,
+                             pool=os.getenv("REPORT_POOL", "thread"))
+MAX_BATCH_REPORTS = 200
+
+# Input drift: per-upload sketches per window, scored against a reference window (per worker)
+DRIFT_MONITOR = DriftMonitor(os.getenv("DRIFT_REFERENCE", os.path.join(BASE_DIR, "logs", "drift_reference.json")),
+                             window_seconds=int(os.getenv("DRIFT_WINDOW_SECONDS", "3600")))
+
+# Similar-case retrieval over the classifier's pooled features (Keras backend only; shared by all workers)
+SIMILAR_CASES = SimilarCaseStore(os.getenv("SIMILAR_INDEX_DIR", os.path.join(BASE_DIR, "logs", "similar_cases")))
+MAX_SIMILAR = 50
 
 # -------------------------
 # AES Decryption
@@ -117,6 +201,7 @@ app.logger.info(f"CHEST_INPUT_SIZE={CHEST_INPUT_SIZE} MAIN_INPUT_SIZE={MAIN_INPU
 def derive_key(password: bytes, salt: bytes, iters=PBKDF2_ITERS):
     return hashlib.pbkdf2_hmac("sha256", password, salt, iters, dklen=32)
 
+@traced()
 def decrypt_aes_gcm_blob(blob: bytes, salt_hex: Optional[str], nonce_hex: Optional[str]) -> Optional[bytes]:
     """
     Expect frontend to send salt & nonce as hex strings (form fields or headers).
@@ -128,10 +213,12 @@ def decrypt_aes_gcm_blob(blob: bytes, salt_hex: Optional[str], nonce_hex: Option
             return None
         salt = binascii.unhexlify(salt_hex)
         nonce = binascii.unhexlify(nonce_hex)
-        key = derive_key(ENCRYPTION_PASSWORD, salt)
+        with stage_timer("pbkdf2"):
+            key = derive_key(ENCRYPTION_PASSWORD, salt)
         aesgcm = AESGCM(key)
         # AESGCM expects ciphertext+tag combined.
-        return aesgcm.decrypt(nonce, blob, None)
+        with stage_timer("aes_decrypt"):
+            return aesgcm.decrypt(nonce, blob, None)
     except Exception as e:
         app.logger.exception(f"[decrypt] failed: {e}")
         return None
@@ -139,6 +226,7 @@ def decrypt_aes_gcm_blob(blob: bytes, salt_hex: Optional[str], nonce_hex: Option
 # -------------------------
 # Preprocessing & Prediction Helpers
 # -------------------------
+@traced()
 def preprocess_image_bytes(image_bytes: bytes, size=(224,224)):
     try:
         img = Image.open(io.BytesIO(image_bytes)).convert("RGB").resize(size)
@@ -148,6 +236,7 @@ def preprocess_image_bytes(image_bytes: bytes, size=(224,224)):
         app.logger.exception(f"[preprocess] {e}")
         return None
 
+@traced()
 def safe_predict_with_model(model, x):
     try:
         if model is None:
@@ -173,6 +262,7 @@ def format_probability_array(arr):
 # -------------------------
 # Chatbot Function (Grok/OpenAI)
 # -------------------------
+@traced()
 def query_llm(prompt: str, history: Optional[list] = None):
     messages = [{"role":"system","content":"You are ShwasAI, a medically-safe, empathetic assistant for lung health."}]
     if history:
@@ -182,30 +272,164 @@ def query_llm(prompt: str, history: Optional[list] = None):
     messages.append({"role":"user","content":prompt})
 
     if GROQ_API_KEY:
+        start, outcome = time.perf_counter(), "error"
         try:
             payload = {"model": GROQ_MODEL, "messages": messages, "temperature": 0.5, "max_tokens": 400}
             headers = {"Authorization": f"Bearer {GROQ_API_KEY}", "Content-Type": "application/json"}
-            r = requests.post("https://api.groq.com/openai/v1/chat/completions", json=payload, headers=headers, timeout=20)
+            with span("llm.groq", model=GROQ_MODEL):
+                r = requests.post(GROQ_API_URL, json=payload, headers=headers, timeout=20)
+            outcome = "ok" if r.status_code == 200 else f"http_{r.status_code}"
             if r.status_code == 200:
                 return r.json()["choices"][0]["message"]["content"].strip()
         except Exception as e:
             app.logger.warning(f"[groq] {e}")
+        finally:
+            LLM_SECONDS.observe(time.perf_counter() - start, provider="groq", outcome=outcome)
 
     if OPENAI_KEY:
+        start, outcome = time.perf_counter(), "error"
         try:
             payload = {"model":"gpt-4o-mini","messages":messages,"temperature":0.5,"max_tokens":400}
             headers = {"Authorization": f"Bearer {OPENAI_KEY}","Content-Type":"application/json"}
-            r = requests.post("https://api.openai.com/v1/chat/completions", json=payload, headers=headers, timeout=20)
+            with span("llm.openai", model="gpt-4o-mini"):
+                r = requests.post(OPENAI_API_URL, json=payload, headers=headers, timeout=20)
+            outcome = "ok" if r.status_code == 200 else f"http_{r.status_code}"
             if r.status_code == 200:
                 return r.json()["choices"][0]["message"]["content"].strip()
         except Exception as e:
             app.logger.warning(f"[openai] {e}")
+        finally:
+            LLM_SECONDS.observe(time.perf_counter() - start, provider="openai", outcome=outcome)
 
     return "I'm currently offline — please try again later."
 
+# -------------------------
+# Request metrics & tracing
+# -------------------------
+def _metrics_endpoint():
+    # route template, not the raw path, so label cardinality stays bounded
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+@app.before_request
+def _start_request_trace():
+    if _metrics_endpoint() in UNTRACED_ENDPOINTS:
+        return
+    start_trace(f"{request.method} {_metrics_endpoint()}", request_id=request.headers.get("X-Request-ID"),
+                traceparent=request.headers.get("traceparent"))
+
+@app.after_request
+def _finish_request_trace(response):
+    trace = current_trace()
+    if trace is not None:
+        end_trace(trace, TRACE_EXPORTER, TRACE_SAMPLE_RATE, **{"http.status_code": response.status_code})
+        response.headers["X-Request-ID"] = trace.request_id
+        response.headers["Server-Timing"] = server_timing(trace)
+    return response
+
+@app.before_request
+def _start_request_metrics():
+    g.metrics_start = time.perf_counter()
+    INFLIGHT.inc(endpoint=_metrics_endpoint())
+
+@app.after_request
+def _finish_request_metrics(response):
+    start = g.pop("metrics_start", None)
+    if start is not None:
+        endpoint = _metrics_endpoint()
+        INFLIGHT.dec(endpoint=endpoint)
+        REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+        REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+    return response
+
+# -------------------------
+# Admission control
+# -------------------------
+# per worker: model work runs PREDICT_MAX_CONCURRENT at a time; the rest wait by lane or get a fast 503
+ADMISSION = {name: AdmissionController(name, **config) for name, config in admission_config_from_env().items()}
+
+def admission_gate(name, default_lane=INTERACTIVE):
+    """
+    Admit the request through ADMISSION[name]. Clients choose the lane with
+    X-Priority: interactive|bulk and may send X-Deadline-Ms, the time they
+    are still willing to wait; the pipeline stops once it has passed.
+    The body is received before admission (and the deadline starts after
+    it), so a slow upload never holds a compute slot.
+    """
+    controller = ADMISSION[name]
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage_timer("receive_body", endpoint=name):
+                # reads the whole stream: multipart into request.files/form, anything else into the data cache
+                request.get_data(cache=True, parse_form_data=True)
+            lane = lane_from(request.headers.get("X-Priority") or request.args.get("priority"), default_lane)
+            deadline = deadline_from(request.headers.get("X-Deadline-Ms"), controller.default_deadline)
+            lane_name = "bulk" if lane == BULK else "interactive"
+            queued_at = time.perf_counter()
+            try:
+                with controller.admit(lane, deadline):
+                    STAGE_SECONDS.observe(time.perf_counter() - queued_at, endpoint=name, stage="queue_wait")
+                    ADMISSIONS.inc(endpoint=name, lane=lane_name, outcome="admitted")
+                    return fn(*args, **kwargs)
+            except Rejected as e:
+                ADMISSIONS.inc(endpoint=name, lane=lane_name, outcome=e.reason)
+                response = jsonify({"error": "Server busy, retry later", "reason": e.reason})
+                response.headers["Retry-After"] = str(e.retry_after)
+                return response, 503
+            except DeadlineExceeded as e:
+                ADMISSIONS.inc(endpoint=name, lane=lane_name, outcome="deadline_exceeded")
+                return jsonify({"error": "Deadline exceeded", "stage": e.stage}), 504
+        return wrapper
+    return decorator
+
 # -------------------------
 # Routes
 # -------------------------
+@app.get("/metrics")
+def metrics():
+    scores = DRIFT_MONITOR.summary()["current"]
+    for name in ("psi", "embedding", "labels", "chest_prob"):
+        if scores.get(name) is not None:
+            DRIFT_SCORE.set(scores[name], score=name)
+    record_admission(ADMISSION, LANES)
+    return Response(render_metrics(), mimetype=METRICS_CONTENT_TYPE)
+
+@app.get("/models")
+def models():
+    """Served / shadow version per role, swap status and per-version latency."""
+    return jsonify({"models": [m.describe() for m in SERVED_MODELS.values()],
+                    "manifest": MODEL_REGISTRY.manifest()}), 200
+
+@app.post("/models/<role>/<action>")
+def update_model(role, action):
+    """
+    action = activate | shadow, JSON body {"version": "..."} (shadow accepts null to stop).
+    Writes the manifest; this worker swaps now, the others on their next poll.
+    Disabled unless MODEL_ADMIN_TOKEN is set; send it as X-Admin-Token.
+    """
+    token = request.headers.get("X-Admin-Token") or ""
+    if not MODEL_ADMIN_TOKEN or not hmac.compare_digest(token.encode(), MODEL_ADMIN_TOKEN.encode()):
+        return jsonify({"error": "Forbidden"}), 403
+    if role not in SERVED_MODELS or action not in ("activate", "shadow"):
+        return jsonify({"error": f"Unknown role/action {role}/{action}"}), 404
+    version = (request.get_json(silent=True) or {}).get("version")
+    if action == "activate" and not version:
+        return jsonify({"error": "version is required"}), 400
+    try:
+        if action == "activate":
+            MODEL_REGISTRY.activate(role, version)
+        else:
+            MODEL_REGISTRY.set_shadow(role, version)
+    except KeyError as e:
+        return jsonify({"error": str(e)}), 404
+    MODEL_WATCHER.sync()  # loads and warms in the background; traffic switches when ready
+    return jsonify(SERVED_MODELS[role].describe()), 202
+
+@app.get("/drift")
+def drift():
+    return jsonify(DRIFT_MONITOR.summary()), 200
+
 @app.get("/health")
 def health():
     """
@@ -217,14 +441,119 @@ def health():
 def index():
     return jsonify({
         "status": "ok",
+        "serving_backend": SERVING_BACKEND,
+        "main_backend": getattr(MAIN_MODEL, "name", None),
+        "chest_backend": getattr(CHEST_FILTER_MODEL, "name", None),
         "main_model_loaded": bool(MAIN_MODEL),
         "chest_model_loaded": bool(CHEST_FILTER_MODEL),
+        "cascade_mode": CASCADE.mode,
+        "admission": {name: c.state() for name, c in ADMISSION.items()},
+        "tta": {"models": len(TTA.models), "max_views": TTA.budget.max_views,
+                "budget_ms": TTA.budget.budget_ms} if TTA else None,
+        "threads": THREAD_CONFIG,
         "chest_input": CHEST_INPUT_SIZE,
         "main_input": MAIN_INPUT_SIZE
     })
 
+def run_prediction(encrypted, salt, nonce, filename):
+    """
+    Decrypt, classify and record one upload; returns (payload, status).
+    Shared by the Flask route and the ASGI app (asgi.py), which runs it on its inference executor.
+    """
+    if not encrypted:
+        return {"error": "No payload received"}, 400
+
+    # Attempt to decrypt
+    decrypted = decrypt_aes_gcm_blob(encrypted, salt, nonce)
+    if decrypted is None:
+        # If decryption fails, return meaningful error
+        return {"error": "Decryption failed - check salt/nonce or encryption scheme"}, 400
+
+    # Persist decrypted upload for traceability
+    fpath = os.path.join(UPLOAD_FOLDER, filename)
+    with stage_timer("disk_write"), open(fpath, "wb") as out:
+        out.write(decrypted)
+
+    # Decode once; the chest filter runs first and rejected uploads skip the classifier
+    check_deadline("decode")
+    with stage_timer("decode"):
+        img = decode_image(decrypted)
+    if img is None:
+        return {"error": "Failed to preprocess image"}, 400
+    try:
+        result = CASCADE.predict_images([img])[0]
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        app.logger.exception(f"[predict] cascade failed: {e}")
+        return {"error": "Model inference failed"}, 500
+    # the cascade times its own stages; skipped stages report 0 and are not recorded
+    for stage in ("chest", "main"):
+        if result["timings_ms"][stage] > 0:
+            STAGE_SECONDS.observe(result["timings_ms"][stage] / 1000.0, endpoint="predict",
+                                  stage=f"{stage}_inference")
+    label = result["label"]
+    conf = result["confidence"]
+    PREDICTIONS.inc(label=label)
+    try:
+        with stage_timer("drift"):
+            DRIFT_MONITOR.observe(img, result)
+    except Exception as e:
+        app.logger.warning(f"[predict] drift monitor skipped: {e}")
+    if ALERT_RECIPIENTS and label in ALERT_LABELS:
+        from alerts.alert_notifier import send_email_alert  # queues only; never blocks on SMTP
+        for recipient in ALERT_RECIPIENTS:
+            send_email_alert(recipient, filename, round(conf * 100, 2))
+
+    if result["rejected"]:
+        payload = {
+            "status": "success",
+            "prediction": label,
+            "confidence": round(conf * 100, 2),
+            "chest_probability": result["chest_prob"],
+            "gradcam": None,
+            "message": "The uploaded image does not appear to be a chest scan"
+        }
+    else:
+        # Save a simple gradcam placeholder (actual Grad-CAM generation optional)
+        try:
+            with stage_timer("heatmap"):
+                gradcam_path = os.path.join(STATIC_FOLDER, f"gradcam_{filename}.png")
+                png = io.BytesIO()
+                img.save(png, format="PNG")
+                with open(gradcam_path, "wb") as out:
+                    out.write(png.getvalue())
+            gradcam_file = os.path.basename(gradcam_path)
+            remember_image(gradcam_file, png.getvalue())  # /download_report embeds it without a disk read
+        except Exception as e:
+            app.logger.exception("Failed to write gradcam placeholder")
+            gradcam_file = None
+
+        case_id = None
+        if result.get("embedding") is not None:
+            try:
+                with stage_timer("similar_index"):
+                    case_id = SIMILAR_CASES.add(result["embedding"], filename=filename, prediction=label,
+                                                confidence=round(conf * 100, 2), gradcam=gradcam_file,
+                                                timestamp=datetime.utcnow().isoformat())
+            except Exception as e:
+                app.logger.warning(f"[predict] similar-case index skipped: {e}")
+
+        payload = {
+            "status": "success",
+            "prediction": label,
+            "confidence": round(conf * 100, 2),
+            "gradcam": gradcam_file,
+            "case_id": case_id,
+            "message": f"AI Prediction: {label} ({conf * 100:.2f}%)"
+        }
+        if "uncertainty" in result:
+            payload["uncertainty"] = result["uncertainty"]
+    return payload, 200
+
 @app.route("/predict", methods=["POST"])
 @cross_origin()
+@admission_gate("predict")
 def predict():
     """
     Accepts either multipart form with:
@@ -243,87 +572,48 @@ def predict():
         filename = None
 
         # If multipart form upload (recommended)
-        if "file" in request.files:
-            f = request.files["file"]
-            encrypted = f.read()
-            salt = request.form.get("salt") or request.headers.get("X-SHWASNETRA-SALT")
-            nonce = request.form.get("nonce") or request.headers.get("X-SHWASNETRA-NONCE")
-            filename = secure_filename(f.filename or f"upload_{datetime.utcnow().timestamp()}.png")
-        else:
-            # raw bytes case
-            encrypted = request.get_data()
-            salt = request.headers.get("X-SHWASNETRA-SALT") or request.args.get("salt")
-            nonce = request.headers.get("X-SHWASNETRA-NONCE") or request.args.get("nonce")
-            filename = f"upload_{int(datetime.utcnow().timestamp())}.png"
-
-        if not encrypted:
-            return jsonify({"error": "No payload received"}), 400
-
-        # Attempt to decrypt
-        decrypted = decrypt_aes_gcm_blob(encrypted, salt, nonce)
-        if decrypted is None:
-            # If decryption fails, return meaningful error
-            return jsonify({"error": "Decryption failed - check salt/nonce or encryption scheme"}), 400
-
-        # Persist decrypted upload for traceability
-        fpath = os.path.join(UPLOAD_FOLDER, filename)
-        with open(fpath, "wb") as out:
-            out.write(decrypted)
-
-        # Chest filter model (optional)
-        if CHEST_FILTER_MODEL:
-            x_chest = preprocess_image_bytes(decrypted, size=CHEST_INPUT_SIZE)
-            if x_chest is None:
-                return jsonify({"error": "Failed to preprocess chest image"}), 400
-            chest_pred = safe_predict_with_model(CHEST_FILTER_MODEL, x_chest)
-            try:
-                chest_prob = float(np.squeeze(chest_pred))
-            except Exception:
-                chest_prob = 0.0
-            # If model suggests NOT a chest x-ray (threshold logic as used earlier)
-            if chest_prob < CHEST_FILTER_THRESHOLD:
-                # NOTE: logic preserved from original but inverted threshold if desired adjust
-                pass  # continue normally
-            # If you instead want to reject when chest_prob indicates not-chest, adjust here.
-
-        # Main prediction
-        if MAIN_MODEL:
-            x_main = preprocess_image_bytes(decrypted, size=MAIN_INPUT_SIZE)
-            if x_main is None:
-                return jsonify({"error": "Failed to preprocess main image"}), 400
-            arr_main = safe_predict_with_model(MAIN_MODEL, x_main)
-            if arr_main is None:
-                return jsonify({"error": "Model inference failed"}), 500
-            idx, conf = format_probability_array(arr_main)
-            label = CLASS_NAMES[idx] if idx < len(CLASS_NAMES) else "Unknown"
-        else:
-            # fallback dummy response if model not available
-            label = "Unknown"
-            conf = 0.0
-
-        # Save a simple gradcam placeholder (actual Grad-CAM generation optional)
-        try:
-            gradcam_path = os.path.join(STATIC_FOLDER, f"gradcam_{filename}.png")
-            Image.open(io.BytesIO(decrypted)).convert("RGB").save(gradcam_path)
-            gradcam_file = os.path.basename(gradcam_path)
-        except Exception as e:
-            app.logger.exception("Failed to write gradcam placeholder")
-            gradcam_file = None
-
-        return jsonify({
-            "status": "success",
-            "prediction": label,
-            "confidence": round(conf * 100, 2),
-            "gradcam": gradcam_file,
-            "message": f"AI Prediction: {label} ({conf * 100:.2f}%)"
-        }), 200
-
+        with stage_timer("read_body"):
+            if "file" in request.files:
+                f = request.files["file"]
+                encrypted = f.read()
+                salt = request.form.get("salt") or request.headers.get("X-SHWASNETRA-SALT")
+                nonce = request.form.get("nonce") or request.headers.get("X-SHWASNETRA-NONCE")
+                filename = secure_filename(f.filename or f"upload_{datetime.utcnow().timestamp()}.png")
+            else:
+                # raw bytes case
+                encrypted = request.get_data()
+                salt = request.headers.get("X-SHWASNETRA-SALT") or request.args.get("salt")
+                nonce = request.headers.get("X-SHWASNETRA-NONCE") or request.args.get("nonce")
+                filename = f"upload_{int(datetime.utcnow().timestamp())}.png"
+
+        payload, status = run_prediction(encrypted, salt, nonce, filename)
+        with stage_timer("response"):
+            return jsonify(payload), status
+
+    except DeadlineExceeded:
+        raise  # answered by admission_gate
     except Exception as e:
         app.logger.exception("Prediction failed")
         return jsonify({"error": "Internal server error", "detail": str(e)}), 500
 
+@app.get("/similar")
+@cross_origin()
+def similar():
+    """Top-k prior cases whose backbone features are closest to case `case_id` (from /predict)."""
+    try:
+        case_id = int(request.args.get("case_id", ""))
+        k = max(1, min(MAX_SIMILAR, int(request.args.get("k", 5))))
+    except ValueError:
+        return jsonify({"error": "case_id and k must be integers"}), 400
+    with span("similar_search", k=k):
+        matches = SIMILAR_CASES.similar(case_id, k)
+    if matches is None:
+        return jsonify({"error": f"Unknown case_id {case_id}"}), 404
+    return jsonify({"case_id": case_id, "indexed_cases": len(SIMILAR_CASES), "similar": matches}), 200
+
 @app.route("/chat", methods=["POST"])
 @cross_origin()
+@admission_gate("chat")
 def chat():
     try:
         data = request.get_json() or {}
@@ -350,37 +640,45 @@ def download_report():
         result = data.get("result", {})
         ai_explanation = data.get("ai_explanation", "")
 
-        buffer = io.BytesIO()
-        c = canvas.Canvas(buffer, pagesize=A4)
-        width, height = A4
-
-        c.setFont("Helvetica-Bold", 18)
-        c.drawCentredString(width/2, height-60, "🫁 ShwasNetra AI Diagnostic Report")
-        c.setFont("Helvetica", 12)
-        c.drawString(50, height-100, f"Date: {datetime.utcnow().strftime('%Y-%m-%d %H:%M UTC')}")
-        y = height-140
-        c.drawString(50, y, f"Age: {patient.get('age','N/A')}  Gender: {patient.get('gender','N/A')}")
-        y -= 20
-        c.drawString(50, y, f"Smoking: {patient.get('smoking','N/A')}  Cough: {patient.get('cough','N/A')}")
-        y -= 30
-        c.drawString(50, y, f"Result: {result.get('result','N/A')}  Confidence: {result.get('confidence','N/A')}%")
-        y -= 30
-        c.setFont("Helvetica-Bold", 14)
-        c.drawString(50, y, "AI Explanation:")
-        y -= 20
-        c.setFont("Helvetica", 11)
-        text = c.beginText(60, y)
-        for line in ai_explanation.splitlines():
-            text.textLine(line)
-        c.drawText(text)
-        c.showPage()
-        c.save()
-        buffer.seek(0)
+        with stage_timer("render", endpoint="download_report"):
+            pdf = REPORT_ENGINE.render({"patient": patient, "result": result, "ai_explanation": ai_explanation})
+        buffer = io.BytesIO(pdf)
         return send_file(buffer, as_attachment=True, download_name="ShwasNetra_Report.pdf", mimetype="application/pdf")
     except Exception:
         app.logger.exception("Report generation failed")
         return jsonify({"error": "Report generation failed"}), 500
 
+@app.route("/download_reports", methods=["POST"])
+@cross_origin()
+@admission_gate("download_reports", default_lane=BULK)
+def download_reports():
+    """
+    Batch reports. JSON body:
+      - reports: list of /download_report payloads (patient, result, ai_explanation)
+      - format: "zip" (one PDF per report, default) or "pdf" (one multi-page PDF)
+    """
+    try:
+        data = request.get_json(force=True) or {}
+        reports = data.get("reports") or []
+        fmt = data.get("format", "zip")
+        if not reports or not isinstance(reports, list):
+            return jsonify({"error": "No reports given"}), 400
+        if len(reports) > MAX_BATCH_REPORTS:
+            return jsonify({"error": f"At most {MAX_BATCH_REPORTS} reports per batch"}), 400
+        if fmt not in ("zip", "pdf"):
+            return jsonify({"error": "format must be 'zip' or 'pdf'"}), 400
+
+        with stage_timer("render_batch", endpoint="download_reports"):
+            body = REPORT_ENGINE.render_batch(reports, fmt)
+        if fmt == "pdf":
+            return send_file(io.BytesIO(body), as_attachment=True, download_name="ShwasNetra_Reports.pdf",
+                             mimetype="application/pdf")
+        return send_file(io.BytesIO(body), as_attachment=True, download_name="ShwasNetra_Reports.zip",
+                         mimetype="application/zip")
+    except Exception:
+        app.logger.exception("Batch report generation failed")
+        return jsonify({"error": "Report generation failed"}), 500
+
 # -------------------------
 # Run Server (for local dev)
 # -------------------------
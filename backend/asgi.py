@@ -0,0 +1,152 @@
+"""asgi.py — single ASGI application for the ShwasNetra backend
+Hosts every route in one process model:
+  - /predict and /chat are native async routes. The body is read on the
+    event loop, so a slow upload costs a coroutine rather than a worker
+    thread. The blocking work then runs on a bounded executor, with
+    contextvars copied so traces and deadlines follow it:
+      * inference: PREDICT_MAX_CONCURRENT + queue threads;
+      * LLM calls: CHAT_MAX_CONCURRENT + queue threads. Raise
+        CHAT_MAX_CONCURRENT here, because these threads only wait on the
+        provider.
+    Both go through the same AdmissionController as the Flask routes
+    (lanes, deadlines, 503 + Retry-After). When an executor has no free
+    slot, the request is rejected on the loop instead of queueing
+    invisibly in the executor.
+  - /bulk/predict is the FastAPI router from routes/bulk_predict.py: a
+    multipart list of images, run as one cascade batch on the inference
+    executor in the bulk lane of the predict controller. It answers with
+    cascade labels, not the old binary cancer/normal result (see that module).
+  - Everything else (/health, /metrics, /similar, /download_report(s),
+    /api/history, /models, ...) is the Flask app from app.py, mounted
+    through WSGIMiddleware. Starlette reads the request body before it
+    hands the request to a thread, so slow uploads to these routes do not
+    hold a thread either.
+
+Run (from backend/):
+    uvicorn asgi:app --host 0.0.0.0 --port 8000 --workers 2
+    gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:app   # keeps the per-worker CPU pinning
+Compare with the WSGI deployment using benchmarks/asgi_vs_wsgi.py.
+"""
+
+import time
+from datetime import datetime
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.wsgi import WSGIMiddleware
+from starlette.formparsers import MultiPartException
+from werkzeug.utils import secure_filename
+
+import app as backend
+from routes import bulk_predict
+from utils.async_bridge import BoundedExecutor, run_admitted, too_large, read_body, read_form, UploadTooLarge
+from utils.serving_metrics import stage_timer, REQUESTS, REQUEST_SECONDS, INFLIGHT
+from utils.tracing import start_trace, end_trace, server_timing
+
+PREDICT = backend.ADMISSION["predict"]
+CHAT = backend.ADMISSION["chat"]
+INFERENCE_EXECUTOR = BoundedExecutor("inference", PREDICT.capacity)
+IO_EXECUTOR = BoundedExecutor("llm-io", CHAT.capacity)
+NATIVE_PATHS = {"/predict", "/chat", "/bulk/predict"}
+
+
+@asynccontextmanager
+async def lifespan(_):
+    yield
+    INFERENCE_EXECUTOR.shutdown()
+    IO_EXECUTOR.shutdown()
+
+
+app = FastAPI(title="ShwasNetra backend", lifespan=lifespan, docs_url=None, redoc_url=None)
+app.state.inference_executor = INFERENCE_EXECUTOR  # shared with routes/bulk_predict.py
+app.add_middleware(CORSMiddleware, allow_origins=backend.CORS_ORIGINS, allow_credentials=True,
+                   allow_methods=["*"], allow_headers=["*"], expose_headers=backend.CORS_EXPOSE_HEADERS)
+
+
+@app.middleware("http")
+async def request_trace_and_metrics(request: Request, call_next):
+    """Same trace and metrics as the Flask hooks, for the routes that do not go through Flask."""
+    endpoint = request.url.path
+    if endpoint not in NATIVE_PATHS:
+        return await call_next(request)
+    trace = start_trace(f"{request.method} {endpoint}", request_id=request.headers.get("X-Request-ID"),
+                        traceparent=request.headers.get("traceparent"))
+    start = time.perf_counter()
+    INFLIGHT.inc(endpoint=endpoint)
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        INFLIGHT.dec(endpoint=endpoint)
+        REQUESTS.inc(endpoint=endpoint, status=status)
+        REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+        end_trace(trace, backend.TRACE_EXPORTER, backend.TRACE_SAMPLE_RATE, **{"http.status_code": status})
+    response.headers["X-Request-ID"] = trace.request_id
+    response.headers["Server-Timing"] = server_timing(trace)
+    return response
+
+
+@app.post("/predict")
+async def predict(request: Request):
+    """Same contract as the Flask route: multipart (file, salt, nonce) or a raw body with X-SHWASNETRA-* headers."""
+    if too_large(request, backend.MAX_UPLOAD_BYTES):
+        return JSONResponse({"error": "Upload too large"}, status_code=413)
+    try:
+        with stage_timer("read_body"):
+            if request.headers.get("content-type", "").startswith("multipart/form-data"):
+                form = await read_form(request, backend.MAX_UPLOAD_BYTES)
+                try:
+                    upload = form.get("file")
+                    if upload is None or isinstance(upload, str):
+                        return JSONResponse({"error": "No payload received"}, status_code=400)
+                    encrypted = await upload.read()
+                    salt = form.get("salt") or request.headers.get("X-SHWASNETRA-SALT")
+                    nonce = form.get("nonce") or request.headers.get("X-SHWASNETRA-NONCE")
+                    filename = secure_filename(upload.filename or f"upload_{datetime.utcnow().timestamp()}.png")
+                finally:
+                    await form.close()
+            else:
+                encrypted = await read_body(request, backend.MAX_UPLOAD_BYTES)
+                salt = request.headers.get("X-SHWASNETRA-SALT") or request.query_params.get("salt")
+                nonce = request.headers.get("X-SHWASNETRA-NONCE") or request.query_params.get("nonce")
+                filename = f"upload_{int(datetime.utcnow().timestamp())}.png"
+
+        result, error = await run_admitted(PREDICT, INFERENCE_EXECUTOR, request,
+                                           backend.run_prediction, encrypted, salt, nonce, filename)
+        if error is not None:
+            return error
+        payload, status = result
+        with stage_timer("response"):
+            return JSONResponse(payload, status_code=status)
+    except UploadTooLarge:
+        return JSONResponse({"error": "Upload too large"}, status_code=413)
+    except MultiPartException as e:
+        return JSONResponse({"error": "Malformed upload", "detail": e.message}, status_code=400)
+    except Exception as e:
+        backend.app.logger.exception("Prediction failed")
+        return JSONResponse({"error": "Internal server error", "detail": str(e)}, status_code=500)
+
+
+@app.post("/chat")
+async def chat(request: Request):
+    try:
+        data = await request.json()
+    except ValueError:
+        data = {}
+    try:
+        msg = ((data or {}).get("message") or "").strip()
+        if not msg:
+            return JSONResponse({"error": "Empty message"}, status_code=400)
+        reply, error = await run_admitted(CHAT, IO_EXECUTOR, request, backend.query_llm, msg, data.get("history", []))
+        return error or JSONResponse({"reply": reply})
+    except Exception as e:
+        backend.app.logger.exception("Chat failed")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+app.include_router(bulk_predict.router, prefix="/bulk")
+# last: anything not matched above is served by the Flask app
+app.mount("/", WSGIMiddleware(backend.app))
@@ -0,0 +1,193 @@
+"""asgi_vs_wsgi.py — the ASGI app (asgi.py) against the gunicorn WSGI deployments
+Each deployment is started in turn on the same port with the same models and
+worker count:
+  wsgi_sync     gunicorn -k sync --threads 1 app:app (one request per worker)
+  wsgi_gthread  gunicorn.conf.py as shipped (gthread + admission control)
+  asgi          gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:app
+and driven through three scenarios:
+  predict       closed-loop encrypted uploads to /predict
+  slow_upload   the same, while --slow-clients connections trickle uploads
+                over --slow-seconds each (mobile clients on a bad link)
+  chat_mixed    /chat against a stub LLM that answers after --llm-delay-ms,
+                concurrently with the predict load; reports both sides
+The JSON report holds throughput, latency percentiles and status counts per
+deployment and scenario.
+
+Usage (from backend/; needs gunicorn, uvicorn and fastapi installed):
+    python benchmarks/asgi_vs_wsgi.py --workers 2 --concurrency 8 --requests 200 --output bench/asgi.json
+"""
+
+import os
+import json
+import time
+import socket
+import argparse
+import platform
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from load_test import encrypt_upload, wait_ready
+from stub_llm import start_stub
+from run_suite import BACKEND_DIR, model_env, upload_images, make_request, drive, git_commit
+
+DEPLOYMENTS = {
+    "wsgi_sync": ["gunicorn", "-c", "gunicorn.conf.py", "-k", "sync", "--threads", "1", "app:app"],
+    "wsgi_gthread": ["gunicorn", "-c", "gunicorn.conf.py", "app:app"],
+    "asgi": ["gunicorn", "-c", "gunicorn.conf.py", "-k", "uvicorn.workers.UvicornWorker", "asgi:app"],
+}
+SCENARIOS = ("predict", "slow_upload", "chat_mixed")
+
+
+# -------------------------
+# Slow clients
+# -------------------------
+def slow_upload(port, payload, seconds, chunks=20):
+    """POST one multipart upload to /predict, trickling the body over `seconds`; returns the status line."""
+    blob, salt, nonce = payload
+    prepared = requests.Request("POST", f"http://127.0.0.1:{port}/predict", files={"file": ("scan.png", blob)},
+                                data={"salt": salt, "nonce": nonce}).prepare()
+    head = f"POST /predict HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nConnection: close\r\n"
+    head += "".join(f"{k}: {v}\r\n" for k, v in prepared.headers.items()) + "\r\n"
+    body = prepared.body
+    step = max(1, len(body) // chunks)
+    with socket.create_connection(("127.0.0.1", port), timeout=seconds + 120) as sock:
+        sock.sendall(head.encode())
+        for i in range(0, len(body), step):
+            sock.sendall(body[i:i + step])
+            time.sleep(seconds / chunks)
+        return sock.recv(64).split(b"\r\n", 1)[0].decode(errors="replace")
+
+
+class Background:
+    """Run `call(i)` in a loop on n threads until stopped; counts the outcomes."""
+
+    def __init__(self, n, call):
+        self.n, self.call = n, call
+        self.outcomes = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = [threading.Thread(target=self._run, args=(k,), daemon=True) for k in range(n)]
+
+    def _run(self, k):
+        i = k
+        while not self._stop.is_set():
+            try:
+                outcome = str(self.call(i))
+            except Exception as e:
+                outcome = type(e).__name__
+            with self._lock:
+                self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+            i += self.n
+
+    def __enter__(self):
+        for t in self._threads:
+            t.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        for t in self._threads:
+            t.join()
+
+
+# -------------------------
+# Scenarios
+# -------------------------
+def run_scenario(scenario, url, port, payloads, args):
+    predict = make_request("predict", url, payloads)
+    if scenario == "predict":
+        return drive(predict, args.concurrency, args.requests)
+    if scenario == "slow_upload":
+        with Background(args.slow_clients,
+                        lambda i: slow_upload(port, payloads[i % len(payloads)], args.slow_seconds)) as slow:
+            stats = drive(predict, args.concurrency, args.requests)
+        return dict(stats, slow_clients=args.slow_clients, slow_outcomes=slow.outcomes)
+    chat = make_request("chat", url, payloads)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        chat_stats = pool.submit(drive, chat, args.chat_concurrency, args.chat_requests)
+        predict_stats = drive(predict, args.concurrency, args.requests)
+        return {"predict": predict_stats, "chat": chat_stats.result()}
+
+
+def summary_line(name, scenario, stats):
+    if scenario == "chat_mixed":
+        return (f"{name:>13} {scenario:>12}  predict p50={stats['predict']['p50_ms']}ms "
+                f"p99={stats['predict']['p99_ms']}ms | chat {stats['chat']['throughput_rps']} rps "
+                f"p99={stats['chat']['p99_ms']}ms {stats['chat']['status']}")
+    return (f"{name:>13} {scenario:>12}  {stats['throughput_rps']:>8} rps  p50={stats['p50_ms']}ms "
+            f"p99={stats['p99_ms']}ms  {stats['status']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the ASGI app with the gunicorn WSGI deployments.")
+    parser.add_argument("--deployments", nargs="+", default=list(DEPLOYMENTS), choices=DEPLOYMENTS)
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=SCENARIOS)
+    parser.add_argument("--workers", type=int, default=1, help="WEB_CONCURRENCY for every deployment")
+    parser.add_argument("--concurrency", type=int, default=8, help="closed-loop /predict clients")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--slow-clients", type=int, default=8)
+    parser.add_argument("--slow-seconds", type=float, default=5.0, help="time each slow client takes to upload")
+    parser.add_argument("--chat-concurrency", type=int, default=16)
+    parser.add_argument("--chat-requests", type=int, default=64)
+    parser.add_argument("--llm-delay-ms", type=float, default=2000, help="stub LLM response delay")
+    parser.add_argument("--models", choices=["auto", "real", "dummy"], default="auto")
+    parser.add_argument("--images", help="upload these images instead of synthetic PNGs")
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--work-dir", default=os.path.join(BACKEND_DIR, "benchmarks", ".work"))
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args()
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    env_models, model_kind = model_env(args.models, args.work_dir)
+    stub, stub_url = start_stub(delay_ms=args.llm_delay_ms)
+    # admission limits are per worker and identical for every deployment
+    env = dict(os.environ, PORT=str(args.port), WEB_CONCURRENCY=str(args.workers),
+               GROQ_API_KEY="stub", GROQ_API_URL=stub_url, OPENAI_API_KEY="",
+               TRACE_FILE=os.path.join(args.work_dir, "traces.jsonl"), **env_models)
+    url = f"http://127.0.0.1:{args.port}"
+    payloads = [encrypt_upload(b) for b in upload_images(args.images)]
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "models": model_kind,
+            "workers": args.workers,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "slow_clients": args.slow_clients,
+            "slow_seconds": args.slow_seconds,
+            "llm_delay_ms": args.llm_delay_ms,
+        },
+        "results": {},
+    }
+    try:
+        for name in args.deployments:
+            log = open(os.path.join(args.work_dir, f"{name}.log"), "ab")
+            server = subprocess.Popen(DEPLOYMENTS[name], cwd=BACKEND_DIR, env=env,
+                                      stdout=log, stderr=subprocess.STDOUT)
+            try:
+                wait_ready(url, server)
+                drive(make_request("predict", url, payloads), args.concurrency, args.warmup)
+                for scenario in args.scenarios:
+                    stats = run_scenario(scenario, url, args.port, payloads, args)
+                    report["results"][f"{name}/{scenario}"] = stats
+                    print(summary_line(name, scenario, stats))
+            finally:
+                server.terminate()
+                server.wait(timeout=60)
+                log.close()
+    finally:
+        stub.shutdown()
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,122 @@
+"""cascade_latency.py — two-model path vs. early-exit cascade vs. multi-head model
+Per-request latency of the three ways /predict can score an upload:
+  two_model  - both models always run, each decoding the bytes itself (old path)
+  cascade    - decode once, chest filter first, classifier only for accepted images
+  multihead  - one backbone pass with both heads (needs shwasnetra_cascade_multihead.keras)
+
+Usage (from backend/):
+    python benchmarks/cascade_latency.py --chest-dir model_training/dataset/chest \\
+        --non-chest-dir model_training/dataset/train_split/unchest --requests 200
+"""
+
+import os
+import sys
+import time
+import json
+import random
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from utils.inference_backends import load_backend, backend_config_from_env
+from utils.cascade import TwoStageCascade, build_cascade, to_batch, decode_image
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "model_training")
+CLASS_NAMES = ["Normal", "Benign", "Malignant", "Unchest"]
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+def list_images(root, limit):
+    paths = []
+    for dirpath, _, files in os.walk(root):
+        paths.extend(os.path.join(dirpath, f) for f in files if f.lower().endswith(IMAGE_EXTS))
+    return sorted(paths)[:limit]
+
+
+def request_mix(chest_dir, non_chest_dir, n, non_chest_fraction, seed=0):
+    """n upload payloads (raw bytes) with the requested share of non-chest images."""
+    rng = random.Random(seed)
+    chest = list_images(chest_dir, n)
+    other = list_images(non_chest_dir, n) if non_chest_dir else []
+    if not chest:
+        raise SystemExit(f"No images under {chest_dir}")
+    picks = [rng.choice(other) if other and rng.random() < non_chest_fraction else rng.choice(chest)
+             for _ in range(n)]
+    payloads = []
+    for p in picks:
+        with open(p, "rb") as f:
+            payloads.append(f.read())
+    return payloads
+
+
+def two_model_path(chest_model, main_model, chest_size, main_size):
+    """The original /predict flow: each model decodes the upload itself and both always run."""
+    def run(image_bytes):
+        if chest_model is not None:
+            chest_model.predict(to_batch([decode_image(image_bytes)], chest_size), verbose=0)
+        if main_model is not None:
+            main_model.predict(to_batch([decode_image(image_bytes)], main_size), verbose=0)
+    return run
+
+
+def measure(fn, payloads, warmup=5):
+    for p in payloads[:warmup]:
+        fn(p)
+    latencies = []
+    start = time.perf_counter()
+    for p in payloads:
+        t = time.perf_counter()
+        fn(p)
+        latencies.append((time.perf_counter() - t) * 1000.0)
+    wall = time.perf_counter() - start
+    lat = np.asarray(latencies)
+    return {
+        "requests": len(payloads),
+        "mean_ms": round(float(lat.mean()), 2),
+        "p50_ms": round(float(np.percentile(lat, 50)), 2),
+        "p95_ms": round(float(np.percentile(lat, 95)), 2),
+        "p99_ms": round(float(np.percentile(lat, 99)), 2),
+        "throughput_rps": round(len(payloads) / wall, 2),
+    }
+
+
+def input_size(model, default):
+    shape = getattr(model, "input_shape", None)
+    return (int(shape[1]), int(shape[2])) if shape and len(shape) >= 4 and shape[1] else default
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency of the two-model path vs. the cascade runtimes.")
+    parser.add_argument("--chest-dir", required=True)
+    parser.add_argument("--non-chest-dir", help="images the chest filter should reject")
+    parser.add_argument("--non-chest-fraction", type=float, default=0.2)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    config = backend_config_from_env()
+    chest_model = load_backend(os.path.join(MODEL_DIR, "chest_filter_model.keras"), config)
+    main_model = load_backend(os.path.join(MODEL_DIR, "lung_cancer_detector_mobilenetv2_full.keras"), config)
+    multihead = load_backend(os.path.join(MODEL_DIR, "shwasnetra_cascade_multihead.keras"),
+                             dict(config, backend="keras"))
+    chest_size, main_size = input_size(chest_model, (128, 128)), input_size(main_model, (224, 224))
+
+    payloads = request_mix(args.chest_dir, args.non_chest_dir, args.requests, args.non_chest_fraction)
+    cascade = TwoStageCascade(chest_model, main_model, CLASS_NAMES, args.threshold, chest_size, main_size)
+    rejected = sum(cascade.predict(p)["rejected"] for p in payloads)
+
+    results = {
+        "backend": config["backend"],
+        "rejected_fraction": round(rejected / len(payloads), 3),
+        "two_model": measure(two_model_path(chest_model, main_model, chest_size, main_size), payloads),
+        "cascade": measure(cascade.predict, payloads),
+    }
+    if multihead is not None:
+        mh = build_cascade(None, None, CLASS_NAMES, args.threshold, multihead_model=multihead)
+        results["multihead"] = measure(mh.predict, payloads)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
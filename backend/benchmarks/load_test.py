@@ -0,0 +1,188 @@
+"""load_test.py — sweep gunicorn/thread layouts against /predict
+For every combination of workers x intra-op x inter-op threads x affinity the
+harness starts `gunicorn -c gunicorn.conf.py app:app` with that layout, warms
+it up, drives /predict with encrypted uploads from a fixed number of
+concurrent clients, and reports throughput and latency percentiles.
+
+Usage (from backend/):
+    python benchmarks/load_test.py --images ../sample_test --workers 1 2 4 --intra 2 4 8 \\
+        --affinity none spread --concurrency 8 --requests 400 --output load_test.json
+    python benchmarks/load_test.py --url http://localhost:8000 --images ../sample_test   # one running server
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import hashlib
+import secrets
+import argparse
+import itertools
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND_DIR)
+from utils.runtime_config import available_cores
+
+# Must match app.ENCRYPTION_PASSWORD / PBKDF2_ITERS
+ENCRYPTION_PASSWORD = b"shwasnetra2025"
+PBKDF2_ITERS = 200_000
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+def encrypt_upload(image_bytes):
+    """(ciphertext, salt_hex, nonce_hex) in the format the frontend sends."""
+    salt, nonce = secrets.token_bytes(16), secrets.token_bytes(12)
+    key = hashlib.pbkdf2_hmac("sha256", ENCRYPTION_PASSWORD, salt, PBKDF2_ITERS, dklen=32)
+    return AESGCM(key).encrypt(nonce, image_bytes, None), salt.hex(), nonce.hex()
+
+
+def load_payloads(image_dir, limit=32):
+    paths = []
+    for root, _, files in os.walk(image_dir):
+        paths.extend(os.path.join(root, f) for f in files if f.lower().endswith(IMAGE_EXTS))
+    if not paths:
+        raise SystemExit(f"No images under {image_dir}")
+    payloads = []
+    for p in sorted(paths)[:limit]:
+        with open(p, "rb") as f:
+            payloads.append(encrypt_upload(f.read()))
+    return payloads
+
+
+def drive(url, payloads, concurrency, total):
+    """Closed loop: `concurrency` clients, `total` requests overall."""
+    counter = itertools.count()
+
+    def client(_):
+        session = requests.Session()
+        latencies, errors = [], 0
+        while True:
+            i = next(counter)
+            if i >= total:
+                return latencies, errors
+            blob, salt, nonce = payloads[i % len(payloads)]
+            start = time.perf_counter()
+            try:
+                r = session.post(f"{url}/predict", files={"file": ("scan.png", blob)},
+                                 data={"salt": salt, "nonce": nonce}, timeout=120)
+                ok = r.status_code == 200
+            except requests.RequestException:
+                ok = False
+            latencies.append((time.perf_counter() - start) * 1000.0)
+            errors += not ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        per_client = list(pool.map(client, range(concurrency)))
+    wall = time.perf_counter() - start
+    lat = np.asarray([ms for latencies, _ in per_client for ms in latencies])
+    return {
+        "requests": int(len(lat)),
+        "errors": int(sum(e for _, e in per_client)),
+        "throughput_rps": round(len(lat) / wall, 2),
+        "p50_ms": round(float(np.percentile(lat, 50)), 1),
+        "p95_ms": round(float(np.percentile(lat, 95)), 1),
+        "p99_ms": round(float(np.percentile(lat, 99)), 1),
+        "max_ms": round(float(lat.max()), 1),
+    }
+
+
+def wait_ready(url, proc, timeout=300):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with code {proc.returncode}")
+        try:
+            if requests.get(f"{url}/health", timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(1)
+    raise TimeoutError(f"{url} not ready after {timeout}s")
+
+
+def start_server(layout, port, log_path):
+    env = dict(os.environ, PORT=str(port), WEB_CONCURRENCY=str(layout["workers"]),
+               INTRA_OP_THREADS=str(layout["intra"]), INTER_OP_THREADS=str(layout["inter"]),
+               CPU_AFFINITY=layout["affinity"])
+    # let the layout decide; inherited values would override apply_thread_config's defaults
+    for name in ("TF_NUM_INTRAOP_THREADS", "TF_NUM_INTEROP_THREADS", "OMP_NUM_THREADS",
+                 "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "ONNX_INTRA_OP_THREADS", "ONNX_INTER_OP_THREADS"):
+        env.pop(name, None)
+    log = open(log_path, "ab")
+    return subprocess.Popen(["gunicorn", "-c", "gunicorn.conf.py", "app:app"], cwd=BACKEND_DIR,
+                            env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def layouts(args, cores):
+    for workers, intra, inter, affinity in itertools.product(args.workers, args.intra, args.inter, args.affinity):
+        if workers * intra > cores * args.max_oversubscription:
+            continue
+        yield {"workers": workers, "intra": intra, "inter": inter, "affinity": affinity}
+
+
+def print_table(rows):
+    cols = ["workers", "intra", "inter", "affinity", "throughput_rps", "p50_ms", "p95_ms", "p99_ms", "errors"]
+    print(" | ".join(f"{c:>14}" for c in cols))
+    for r in sorted(rows, key=lambda r: -r["throughput_rps"]):
+        print(" | ".join(f"{str(r.get(c, '')):>14}" for c in cols))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep worker/thread layouts against /predict.")
+    parser.add_argument("--images", required=True, help="directory of plain images to upload")
+    parser.add_argument("--url", help="benchmark an already running server instead of sweeping")
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4])
+    parser.add_argument("--intra", nargs="+", type=int, default=[1, 2, 4])
+    parser.add_argument("--inter", nargs="+", type=int, default=[1])
+    parser.add_argument("--affinity", nargs="+", default=["none", "spread"], choices=["none", "spread"])
+    parser.add_argument("--max-oversubscription", type=float, default=1.0,
+                        help="skip layouts using more than this many threads per core")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--output", help="write results as .json or .csv")
+    args = parser.parse_args()
+
+    payloads = load_payloads(args.images)
+    rows = []
+    if args.url:
+        drive(args.url, payloads, args.concurrency, args.warmup)
+        rows.append(dict(drive(args.url, payloads, args.concurrency, args.requests), workers="?", intra="?",
+                         inter="?", affinity="?"))
+    else:
+        cores = available_cores()
+        url = f"http://127.0.0.1:{args.port}"
+        for layout in layouts(args, cores):
+            print(f"▶ {layout}")
+            proc = start_server(layout, args.port, os.path.join(BACKEND_DIR, "logs", "load_test_gunicorn.log"))
+            try:
+                wait_ready(url, proc)
+                # every worker loads its models on boot; warm all of them before measuring
+                drive(url, payloads, max(args.concurrency, layout["workers"]), args.warmup)
+                rows.append(dict(layout, cores=cores, **drive(url, payloads, args.concurrency, args.requests)))
+                print(f"  {rows[-1]}")
+            except Exception as e:
+                print(f"  ❌ {e}")
+            finally:
+                proc.terminate()
+                proc.wait(timeout=60)
+
+    print_table(rows)
+    if args.output:
+        if args.output.endswith(".csv") and rows:
+            with open(args.output, "w", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+                writer.writeheader()
+                writer.writerows(rows)
+        else:
+            with open(args.output, "w") as f:
+                json.dump(rows, f, indent=2)
@@ -0,0 +1,275 @@
+"""run_suite.py — reproducible end-to-end benchmark of the backend
+Starts the app under gunicorn (real models when present, otherwise the dummy
+model from save_dummy_model.py), a stub LLM server for /chat, and drives
+  predict          encrypted uploads (AES-GCM, PBKDF2 key) to /predict
+  chat             /chat against benchmarks/stub_llm.py
+  download_report  PDF generation (a distinct payload per request, report cache off)
+  history          GET /api/history
+at each requested concurrency. The report (JSON) holds throughput, latency
+percentiles, status counts and peak RSS of the server process tree, plus the
+commit and machine it ran on, so two runs can be diffed with --compare.
+
+Usage (from backend/):
+    python benchmarks/run_suite.py --concurrency 1 4 16 --requests 200 --output bench/2025-10-01.json
+    python benchmarks/run_suite.py --output new.json --compare bench/2025-10-01.json
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import platform
+import argparse
+import itertools
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+from load_test import encrypt_upload, wait_ready
+from stub_llm import start_stub
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+REPO_ROOT = os.path.dirname(BACKEND_DIR)
+MODEL_DIR = os.path.join(BACKEND_DIR, "model_training")
+REAL_MODELS = ["chest_filter_model.keras", "lung_cancer_detector_mobilenetv2_full.keras"]
+SCENARIOS = ("predict", "chat", "download_report", "history")
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+# -------------------------
+# Fixtures
+# -------------------------
+def model_env(mode, work_dir):
+    """Environment overrides selecting real or dummy models; returns (env, description)."""
+    have_real = all(os.path.exists(os.path.join(MODEL_DIR, m)) for m in REAL_MODELS)
+    if mode == "real" or (mode == "auto" and have_real):
+        return {}, "real"
+    path = os.path.join(work_dir, "dummy_main.keras")
+    if not os.path.exists(path):
+        # separate process: the driver itself never imports TensorFlow
+        subprocess.run([sys.executable, "-c", f"import save_dummy_model as m; m.save_dummy_model({path!r})"],
+                       cwd=REPO_ROOT, check=True)
+    # no chest filter with the dummy model: its random sigmoid would reject half the uploads
+    return {"MAIN_MODEL_PATH": path, "CHEST_MODEL_PATH": os.path.join(work_dir, "no_chest_filter.keras")}, "dummy"
+
+
+def upload_images(image_dir, n=16, size=(512, 512), seed=0):
+    """Raw image bytes: files from image_dir, or seeded synthetic PNGs."""
+    if image_dir:
+        paths = sorted(os.path.join(r, f) for r, _, fs in os.walk(image_dir) for f in fs
+                       if f.lower().endswith(IMAGE_EXTS))[:n]
+        if paths:
+            out = []
+            for p in paths:
+                with open(p, "rb") as f:
+                    out.append(f.read())
+            return out
+    from PIL import Image
+    rng = np.random.default_rng(seed)
+    out = []
+    for _ in range(n):
+        buf = io.BytesIO()
+        Image.fromarray(rng.integers(0, 256, (*size, 3), dtype=np.uint8)).save(buf, format="PNG")
+        out.append(buf.getvalue())
+    return out
+
+
+REPORT_BODY = {
+    "patient": {"age": 54, "gender": "F", "smoking": "former", "cough": "yes"},
+    "result": {"result": "Benign", "confidence": 91.3},
+    "ai_explanation": "\n".join(f"Line {i}: benchmark explanation text for the generated report." for i in range(30)),
+}
+
+
+def make_request(scenario, url, payloads):
+    if scenario == "predict":
+        def call(session, i):
+            blob, salt, nonce = payloads[i % len(payloads)]
+            return session.post(f"{url}/predict", files={"file": ("scan.png", blob)},
+                                data={"salt": salt, "nonce": nonce}, timeout=120)
+    elif scenario == "chat":
+        def call(session, i):
+            return session.post(f"{url}/chat", json={"message": f"What does a benign nodule mean? ({i})",
+                                                     "history": []}, timeout=60)
+    elif scenario == "download_report":
+        def call(session, i):
+            body = dict(REPORT_BODY, patient=dict(REPORT_BODY["patient"], id=f"bench-{i}"))
+            return session.post(f"{url}/download_report", json=body, timeout=60)
+    else:
+        def call(session, i):
+            return session.get(f"{url}/api/history", timeout=30)
+    return call
+
+
+# -------------------------
+# Measurement
+# -------------------------
+def rss_tree_mb(pid):
+    """Resident memory of pid and all its descendants (Linux /proc), in MB."""
+    total_kb, stack = 0, [pid]
+    while stack:
+        p = stack.pop()
+        try:
+            with open(f"/proc/{p}/status") as f:
+                total_kb += next((int(line.split()[1]) for line in f if line.startswith("VmRSS:")), 0)
+            for task in os.listdir(f"/proc/{p}/task"):
+                with open(f"/proc/{p}/task/{task}/children") as f:
+                    stack.extend(int(c) for c in f.read().split())
+        except (FileNotFoundError, ProcessLookupError, PermissionError):
+            continue
+    return total_kb / 1024.0
+
+
+class MemorySampler:
+    def __init__(self, pid, interval=0.2):
+        self.pid, self.interval = pid, interval
+        self.peak = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, rss_tree_mb(self.pid))
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def drive(call, concurrency, total):
+    counter = itertools.count()
+
+    def client(_):
+        session = requests.Session()
+        latencies, statuses = [], {}
+        while (i := next(counter)) < total:
+            start = time.perf_counter()
+            try:
+                status = str(call(session, i).status_code)
+            except requests.RequestException as e:
+                status = type(e).__name__
+            latencies.append((time.perf_counter() - start) * 1000.0)
+            statuses[status] = statuses.get(status, 0) + 1
+        return latencies, statuses
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        per_client = list(pool.map(client, range(concurrency)))
+    wall = time.perf_counter() - start
+    lat = np.asarray([ms for latencies, _ in per_client for ms in latencies])
+    statuses = {}
+    for _, s in per_client:
+        for k, v in s.items():
+            statuses[k] = statuses.get(k, 0) + v
+    return {
+        "requests": int(len(lat)),
+        "status": statuses,
+        "throughput_rps": round(len(lat) / wall, 2),
+        "mean_ms": round(float(lat.mean()), 2),
+        "p50_ms": round(float(np.percentile(lat, 50)), 2),
+        "p95_ms": round(float(np.percentile(lat, 95)), 2),
+        "p99_ms": round(float(np.percentile(lat, 99)), 2),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(report, baseline):
+    """Per-scenario relative change vs. a previous report (positive = larger)."""
+    rows = []
+    for key, new in report["results"].items():
+        old = baseline.get("results", {}).get(key)
+        if not old:
+            continue
+        row = {"scenario": key}
+        for metric in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "peak_rss_mb"):
+            if old.get(metric):
+                row[metric] = round(100.0 * (new[metric] - old[metric]) / old[metric], 1)
+        rows.append(row)
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end backend benchmark suite.")
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=SCENARIOS)
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4])
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--models", choices=["auto", "real", "dummy"], default="auto")
+    parser.add_argument("--images", help="upload these images instead of synthetic PNGs")
+    parser.add_argument("--workers", type=int, default=1, help="WEB_CONCURRENCY for the server")
+    parser.add_argument("--llm-delay-ms", type=float, default=100, help="stub LLM response delay")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--work-dir", default=os.path.join(BACKEND_DIR, "benchmarks", ".work"))
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--compare", help="previous JSON report to diff against")
+    args = parser.parse_args()
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    env_models, model_kind = model_env(args.models, args.work_dir)
+    stub, stub_url = start_stub(delay_ms=args.llm_delay_ms)
+    # REPORT_CACHE_TTL=0: download_report measures rendering, not cache hits
+    env = dict(os.environ, PORT=str(args.port), WEB_CONCURRENCY=str(args.workers),
+               GROQ_API_KEY="stub", GROQ_API_URL=stub_url, OPENAI_API_KEY="", REPORT_CACHE_TTL="0",
+               TRACE_FILE=os.path.join(args.work_dir, "traces.jsonl"), **env_models)
+    url = f"http://127.0.0.1:{args.port}"
+    payloads = [encrypt_upload(b) for b in upload_images(args.images)]
+
+    log = open(os.path.join(args.work_dir, "gunicorn.log"), "ab")
+    server = subprocess.Popen(["gunicorn", "-c", "gunicorn.conf.py", "app:app"], cwd=BACKEND_DIR,
+                              env=env, stdout=log, stderr=subprocess.STDOUT)
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "models": model_kind,
+            "workers": args.workers,
+            "requests": args.requests,
+            "llm_delay_ms": args.llm_delay_ms,
+        },
+        "results": {},
+    }
+    try:
+        wait_ready(url, server)
+        for scenario in args.scenarios:
+            call = make_request(scenario, url, payloads)
+            drive(call, max(args.concurrency), args.warmup)
+            for concurrency in args.concurrency:
+                with MemorySampler(server.pid) as mem:
+                    stats = drive(call, concurrency, args.requests)
+                stats.update(concurrency=concurrency, peak_rss_mb=round(mem.peak, 1))
+                report["results"][f"{scenario}@c{concurrency}"] = stats
+                print(f"{scenario:>16} c={concurrency:<3} {stats['throughput_rps']:>8} rps  "
+                      f"p50={stats['p50_ms']}ms p99={stats['p99_ms']}ms  rss={stats['peak_rss_mb']}MB  {stats['status']}")
+        report["meta"]["final_rss_mb"] = round(rss_tree_mb(server.pid), 1)
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+        stub.shutdown()
+
+    if args.compare:
+        with open(args.compare) as f:
+            report["compare"] = {"baseline": args.compare, "delta_pct": compare(report, json.load(f))}
+        for row in report["compare"]["delta_pct"]:
+            print(row)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
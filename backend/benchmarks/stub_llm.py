@@ -0,0 +1,57 @@
+"""stub_llm.py — OpenAI-compatible chat endpoint for benchmarks
+Answers POST /v1/chat/completions with a fixed reply after an optional delay,
+so /chat can be load-tested without calling (or paying for) a real provider.
+Point the backend at it with GROQ_API_KEY=stub GROQ_API_URL=http://127.0.0.1:<port>/v1/chat/completions.
+
+    python benchmarks/stub_llm.py --port 8799 --delay-ms 150
+"""
+
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = "This is a benchmark reply from the stub LLM server."
+
+
+def make_handler(delay_ms):
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if delay_ms:
+                time.sleep(delay_ms / 1000.0)
+            payload = json.dumps({
+                "id": "stub",
+                "object": "chat.completion",
+                "model": body.get("model", "stub"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": REPLY}, "finish_reason": "stop"}],
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    return StubHandler
+
+
+def start_stub(port=0, delay_ms=0):
+    """Serve on a daemon thread; returns (server, url of the completions endpoint)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(delay_ms))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub OpenAI-compatible chat server.")
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--delay-ms", type=float, default=0)
+    args = parser.parse_args()
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(args.delay_ms))
+    print(f"Stub LLM on http://127.0.0.1:{args.port}/v1/chat/completions (delay {args.delay_ms} ms)")
+    server.serve_forever()
@@ -0,0 +1,139 @@
+"""export_models.py — CPU-optimized exports of the served Keras models
+For every model it writes, under model_training/exported/<model name>/:
+  - saved_model/        TensorFlow SavedModel (serving signature)
+  - float32.tflite      reference TFLite conversion
+  - float16.tflite      float16 weights (half the size, same CPU kernels)
+  - int8.tflite         full-integer quantization calibrated on real images
+  - model.onnx          ONNX graph for ONNX Runtime serving (needs tf2onnx)
+  - report.json         accuracy drift of each exported variant vs. the Keras model
+
+Usage (from backend/):
+    python export_models.py --calibration-dir model_training/dataset/chest
+Exits non-zero if a variant's top-1 agreement falls below --min-agreement.
+"""
+
+import os
+import sys
+import json
+import argparse
+import numpy as np
+import tensorflow as tf
+
+from utils.tflite_runtime import exported_model_path
+from utils.inference_backends import TFLiteBackend, OnnxBackend
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+MODEL_DIR = os.path.join(BASE_DIR, "model_training")
+SERVED_MODELS = ["lung_cancer_detector_mobilenetv2_full.keras", "chest_filter_model.keras"]
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+def load_calibration_images(calibration_dir, size, limit=200, seed=42):
+    """Up to `limit` images (recursively), preprocessed exactly like app.preprocess_image_bytes."""
+    from PIL import Image
+    paths = []
+    for root, _, files in os.walk(calibration_dir):
+        paths.extend(os.path.join(root, f) for f in files if f.lower().endswith(IMAGE_EXTS))
+    paths = sorted(paths)
+    if len(paths) > limit:
+        paths = list(np.random.default_rng(seed).choice(paths, limit, replace=False))
+    images = [np.asarray(Image.open(p).convert("RGB").resize(size), dtype=np.float32) / 255.0 for p in paths]
+    return np.stack(images) if images else np.zeros((0, *size, 3), np.float32)
+
+
+def convert_tflite(model, variant, calibration):
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if variant == "float16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif variant == "int8":
+        if not len(calibration):
+            raise ValueError("int8 export needs calibration images")
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = lambda: ([calibration[i:i + 1]] for i in range(len(calibration)))
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        # float input/output so the serving code does not change
+    return converter.convert()
+
+
+def convert_onnx(model, path, opset=17):
+    import tf2onnx
+    spec = [tf.TensorSpec((None, *model.input_shape[1:]), tf.float32, name="input")]
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=opset, output_path=path)
+
+
+def drift_report(model, exported, calibration, batch_size=16):
+    """Compare an exported backend's outputs against the Keras model on the calibration images."""
+    if not len(calibration):
+        return {"images": 0}
+    ref = np.concatenate([model.predict(calibration[i:i + batch_size], verbose=0)
+                          for i in range(0, len(calibration), batch_size)])
+    out = np.concatenate([exported.predict(calibration[i:i + batch_size])
+                          for i in range(0, len(calibration), batch_size)])
+    ref, out = ref.reshape(len(calibration), -1), out.reshape(len(calibration), -1)
+    if ref.shape[1] == 1:  # sigmoid head
+        agree = (ref[:, 0] > 0.5) == (out[:, 0] > 0.5)
+    else:
+        agree = ref.argmax(axis=1) == out.argmax(axis=1)
+    diff = np.abs(ref - out)
+    return {
+        "images": int(len(calibration)),
+        "top1_agreement": float(agree.mean()),
+        "max_abs_diff": float(diff.max()),
+        "mean_abs_diff": float(diff.mean()),
+    }
+
+
+def export_model(keras_path, calibration_dir, variants, calibration_limit):
+    model = tf.keras.models.load_model(keras_path)
+    size = (int(model.input_shape[1]), int(model.input_shape[2]))
+    calibration = load_calibration_images(calibration_dir, size, calibration_limit) if calibration_dir else \
+        np.zeros((0, *size, 3), np.float32)
+
+    out_dir = os.path.dirname(exported_model_path(keras_path, "float32"))
+    os.makedirs(out_dir, exist_ok=True)
+    model.export(os.path.join(out_dir, "saved_model"))
+
+    report = {"model": os.path.basename(keras_path), "input_size": size, "variants": {}}
+    for variant in variants:
+        if variant == "onnx":
+            path = exported_model_path(keras_path, "model", ext="onnx")
+            convert_onnx(model, path)
+            exported = OnnxBackend(path)
+        else:
+            path = exported_model_path(keras_path, variant)
+            with open(path, "wb") as f:
+                f.write(convert_tflite(model, variant, calibration))
+            exported = TFLiteBackend(path, size=1, num_threads=os.cpu_count())
+        entry = {"path": os.path.relpath(path, BASE_DIR), "bytes": os.path.getsize(path)}
+        entry.update(drift_report(model, exported, calibration))
+        report["variants"][variant] = entry
+        print(f"✅ {report['model']} [{variant}] {entry['bytes'] / 1e6:.1f} MB "
+              f"agreement={entry.get('top1_agreement', 'n/a')} max_abs_diff={entry.get('max_abs_diff', 'n/a')}")
+
+    with open(os.path.join(out_dir, "report.json"), "w") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export served models to SavedModel, quantized TFLite and ONNX.")
+    parser.add_argument("--models", nargs="+", default=[os.path.join(MODEL_DIR, m) for m in SERVED_MODELS])
+    parser.add_argument("--calibration-dir", help="images used for int8 calibration and drift checks")
+    parser.add_argument("--calibration-limit", type=int, default=200)
+    parser.add_argument("--variants", nargs="+", default=["float32", "float16", "int8"],
+                        help="any of float32 float16 int8 onnx")
+    parser.add_argument("--min-agreement", type=float, default=0.98)
+    args = parser.parse_args()
+
+    failed = False
+    for path in args.models:
+        if not os.path.exists(path):
+            print(f"⚠️ Skipping missing model {path}")
+            continue
+        report = export_model(path, args.calibration_dir, args.variants, args.calibration_limit)
+        for variant, entry in report["variants"].items():
+            if entry.get("top1_agreement", 1.0) < args.min_agreement:
+                print(f"❌ {report['model']} [{variant}] agreement {entry['top1_agreement']:.3f} < {args.min_agreement}")
+                failed = True
+    sys.exit(1 if failed else 0)
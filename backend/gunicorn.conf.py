@@ -0,0 +1,48 @@
+"""gunicorn.conf.py — worker layout for the ShwasNetra backend
+Workers and per-worker thread pools come from utils/runtime_config.py, so
+WEB_CONCURRENCY, INTRA_OP_THREADS, INTER_OP_THREADS and CPU_AFFINITY tune the
+whole process tree (pick values with benchmarks/load_test.py). The app is not
+preloaded: TensorFlow must start its pools inside each worker, after post_fork
+has exported the thread counts and pinned the worker.
+
+Workers are gthread so that a burst is accepted into the worker, where
+utils/admission.py queues it by priority (or rejects it with 503 +
+Retry-After); model work itself still runs one request at a time per worker
+(PREDICT_MAX_CONCURRENT). The thread count is what the admission controllers
+can hold at once (running + every lane's queue, summed over endpoints) plus
+spares for ungated routes and probes, and worker_connections equals it: a
+request past that waits in the short kernel backlog, never in gthread's own
+unbounded, priority-blind queue where queue_full could not fire.
+"""
+
+import os
+
+from utils.runtime_config import thread_config_from_env, apply_thread_config
+from utils.admission import admission_config_from_env, capacity
+
+THREAD_CONFIG = thread_config_from_env()
+ADMISSION_THREADS = sum(capacity(c) for c in admission_config_from_env().values())
+SPARE_THREADS = int(os.getenv("GUNICORN_SPARE_THREADS", "4"))  # /health, /metrics and other ungated routes
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = THREAD_CONFIG["workers"]
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", str(ADMISSION_THREADS + SPARE_THREADS)))  # mostly waiting, not computing
+worker_connections = threads
+backlog = int(os.getenv("GUNICORN_BACKLOG", "64"))  # keep the unobservable kernel queue short
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))  # first request in a worker loads the models
+preload_app = False
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+
+
+def pre_fork(server, worker):
+    # lowest slot not held by a live worker, so a restarted worker reuses its cores
+    taken = {getattr(w, "cpu_slot", None) for w in server.WORKERS.values()}
+    worker.cpu_slot = next(i for i in range(len(taken) + 1) if i not in taken)
+
+
+def post_fork(server, worker):
+    apply_thread_config(THREAD_CONFIG, slot=worker.cpu_slot)
+    server.log.info(f"worker {worker.pid} slot={worker.cpu_slot} intra={THREAD_CONFIG['intra_op_threads']} "
+                    f"inter={THREAD_CONFIG['inter_op_threads']} affinity={THREAD_CONFIG['cpu_affinity']}")
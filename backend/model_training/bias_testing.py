@@ -0,0 +1,201 @@
+"""bias_testing.py — streaming subgroup bias metrics
+SubgroupAggregator keeps, for every subgroup (e.g. gender=female,
+age_group=senior, and "overall"), a confusion matrix, calibration bins and a
+confidence histogram. update() is O(attributes) per prediction, so nothing
+has to be rescanned; aggregates from several workers combine with merge()
+(all state is additive counts), and reports cost O(groups).
+
+    agg = SubgroupAggregator()
+    agg.update_batch(preds, trues, confidences, {"gender": genders, "age_group": ages})
+    agg.save("logs/bias_worker0.json")
+    SubgroupAggregator.load_many(paths).report()
+
+CLI: python model_training/bias_testing.py logs/bias_*.json
+"""
+
+import sys
+import json
+import argparse
+import numpy as np
+
+OVERALL = "overall"
+
+
+class GroupStats:
+    """Additive per-group counts: confusion matrix, calibration bins, confidence histogram."""
+
+    def __init__(self, n_bins=10):
+        self.n_bins = n_bins
+        self.confusion = np.zeros((2, 2), dtype=np.int64)  # [true, pred]
+        self.bin_count = np.zeros(n_bins, dtype=np.int64)
+        self.bin_conf = np.zeros(n_bins)                   # sum of confidences per bin
+        self.bin_pos = np.zeros(n_bins, dtype=np.int64)    # positives (true == 1) per bin
+        self.hist_pos = np.zeros(n_bins, dtype=np.int64)   # confidence histogram, true == 1
+        self.hist_neg = np.zeros(n_bins, dtype=np.int64)   # confidence histogram, true == 0
+
+    def add(self, pred, true, conf):
+        """Vectorized update from equally long arrays."""
+        bins = np.clip((conf * self.n_bins).astype(np.int64), 0, self.n_bins - 1)
+        np.add.at(self.confusion, (true, pred), 1)
+        self.bin_count += np.bincount(bins, minlength=self.n_bins)
+        self.bin_conf += np.bincount(bins, weights=conf, minlength=self.n_bins)
+        self.bin_pos += np.bincount(bins, weights=true, minlength=self.n_bins).astype(np.int64)
+        self.hist_pos += np.bincount(bins[true == 1], minlength=self.n_bins)
+        self.hist_neg += np.bincount(bins[true == 0], minlength=self.n_bins)
+
+    def merge(self, other):
+        if other.n_bins != self.n_bins:
+            raise ValueError(f"Cannot merge {other.n_bins}-bin stats into {self.n_bins}-bin stats")
+        for name in ("confusion", "bin_count", "bin_conf", "bin_pos", "hist_pos", "hist_neg"):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        return self
+
+    def metrics(self):
+        (tn, fp), (fn, tp) = self.confusion.tolist()
+        n = tn + fp + fn + tp
+        ratio = lambda a, b: a / b if b else None
+        # expected calibration error: |mean confidence - observed positive rate|, weighted per bin
+        filled = self.bin_count > 0
+        ece = float(np.sum(np.abs(self.bin_conf[filled] - self.bin_pos[filled]))) / n if n else None
+        return {
+            "n": n,
+            "positives": tp + fn,
+            "accuracy": ratio(tp + tn, n),
+            "tpr": ratio(tp, tp + fn),
+            "fpr": ratio(fp, fp + tn),
+            "fnr": ratio(fn, tp + fn),
+            "precision": ratio(tp, tp + fp),
+            "positive_rate": ratio(tp + fp, n),
+            "ece": ece,
+        }
+
+    def to_dict(self):
+        return {"n_bins": self.n_bins, "confusion": self.confusion.tolist(), "bin_count": self.bin_count.tolist(),
+                "bin_conf": self.bin_conf.tolist(), "bin_pos": self.bin_pos.tolist(),
+                "hist_pos": self.hist_pos.tolist(), "hist_neg": self.hist_neg.tolist()}
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls(data["n_bins"])
+        stats.confusion = np.asarray(data["confusion"], dtype=np.int64)
+        for name in ("bin_count", "bin_pos", "hist_pos", "hist_neg"):
+            setattr(stats, name, np.asarray(data[name], dtype=np.int64))
+        stats.bin_conf = np.asarray(data["bin_conf"], dtype=float)
+        return stats
+
+
+class SubgroupAggregator:
+    def __init__(self, n_bins=10):
+        self.n_bins = n_bins
+        self.groups = {}  # (attribute, value) -> GroupStats; (OVERALL, OVERALL) for everything
+
+    def _stats(self, key):
+        stats = self.groups.get(key)
+        if stats is None:
+            stats = self.groups[key] = GroupStats(self.n_bins)
+        return stats
+
+    def update(self, pred, true, confidence, metadata=None):
+        """One prediction; `confidence` is the model's probability of the positive class."""
+        self.update_batch([pred], [true], [confidence], {k: [v] for k, v in (metadata or {}).items()})
+
+    def update_batch(self, preds, trues, confidences, metadata=None):
+        """A batch of predictions; metadata maps attribute -> per-prediction values."""
+        pred = np.asarray(preds, dtype=np.int64)
+        true = np.asarray(trues, dtype=np.int64)
+        conf = np.asarray(confidences, dtype=float)
+        self._stats((OVERALL, OVERALL)).add(pred, true, conf)
+        for attribute, values in (metadata or {}).items():
+            values = np.asarray(values, dtype=str)
+            for value in np.unique(values):
+                mask = values == value
+                self._stats((attribute, str(value))).add(pred[mask], true[mask], conf[mask])
+
+    def merge(self, other):
+        if other.n_bins != self.n_bins:
+            raise ValueError(f"Cannot merge a {other.n_bins}-bin aggregate into a {self.n_bins}-bin one")
+        for key, stats in other.groups.items():
+            self._stats(key).merge(stats)
+        return self
+
+    # -------------------------
+    # Queries
+    # -------------------------
+    def metrics(self, attribute=None):
+        """{(attribute, value): metrics} for every group, or only those of one attribute."""
+        return {key: stats.metrics() for key, stats in sorted(self.groups.items())
+                if attribute is None or key[0] == attribute}
+
+    def disparity(self, attribute, metric="tpr"):
+        """(max - min) of a metric across the attribute's groups, with the groups at each end."""
+        values = {value: m[metric] for (_, value), m in self.metrics(attribute).items() if m[metric] is not None}
+        if len(values) < 2:
+            return None
+        lo, hi = min(values, key=values.get), max(values, key=values.get)
+        return {"metric": metric, "gap": values[hi] - values[lo], "min_group": lo, "max_group": hi}
+
+    def fairness(self, attribute):
+        """Common fairness gaps for one attribute (None where a group lacks the needed cases)."""
+        gap = lambda metric: (self.disparity(attribute, metric) or {}).get("gap")
+        tpr_gap, fpr_gap = gap("tpr"), gap("fpr")
+        odds = [g for g in (tpr_gap, fpr_gap) if g is not None]
+        return {
+            "demographic_parity": gap("positive_rate"),
+            "equal_opportunity": tpr_gap,
+            "equalized_odds": max(odds) if odds else None,
+            "accuracy": gap("accuracy"),
+            "calibration": gap("ece"),
+        }
+
+    def attributes(self):
+        return sorted({attribute for attribute, _ in self.groups if attribute != OVERALL})
+
+    def report(self, out=sys.stdout):
+        fmt = lambda v: "   -  " if v is None else f"{v:6.3f}"
+        print(f"{'group':<28}{'n':>7}  {'acc':>6}  {'tpr':>6}  {'fpr':>6}  {'ece':>6}", file=out)
+        for (attribute, value), m in self.metrics().items():
+            name = OVERALL if attribute == OVERALL else f"{attribute}={value}"
+            print(f"{name:<28}{m['n']:>7}  {fmt(m['accuracy'])}  {fmt(m['tpr'])}  {fmt(m['fpr'])}  {fmt(m['ece'])}",
+                  file=out)
+        for attribute in self.attributes():
+            gaps = ", ".join(f"{k}={fmt(v).strip()}" for k, v in self.fairness(attribute).items())
+            print(f"⚖️ {attribute}: {gaps}", file=out)
+
+    # -------------------------
+    # Persistence
+    # -------------------------
+    def to_dict(self):
+        return {"n_bins": self.n_bins,
+                "groups": [{"attribute": a, "value": v, **s.to_dict()} for (a, v), s in self.groups.items()]}
+
+    @classmethod
+    def from_dict(cls, data):
+        agg = cls(data["n_bins"])
+        for group in data["groups"]:
+            agg.groups[(group["attribute"], group["value"])] = GroupStats.from_dict(group)
+        return agg
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    @classmethod
+    def load_many(cls, paths):
+        """Merge the partial aggregates written by several workers."""
+        merged = None
+        for path in paths:
+            agg = cls.load(path)
+            merged = agg if merged is None else merged.merge(agg)
+        return merged
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge saved subgroup aggregates and print bias metrics.")
+    parser.add_argument("aggregates", nargs="+", help="JSON files written by SubgroupAggregator.save()")
+    args = parser.parse_args()
+    SubgroupAggregator.load_many(args.aggregates).report()
@@ -0,0 +1,213 @@
+"""data_pipeline.py — shared tf.data input pipeline for the Keras training scripts
+Replaces ImageDataGenerator.flow_from_directory: files are decoded in parallel,
+cached as uint8 after resizing, shuffled, batched, augmented per batch with
+Keras preprocessing layers and prefetched so MobileNetV2 never waits on input.
+
+Benchmark the input side on its own with:
+    python model_training/data_pipeline.py <data_dir> --img-size 224 --batch-size 32
+"""
+
+import os
+import time
+import argparse
+import numpy as np
+import tensorflow as tf
+
+AUTOTUNE = tf.data.AUTOTUNE
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+# ----------------------------------------
+# File listing & split
+# ----------------------------------------
+
+def list_image_files(data_dir, class_names=None):
+    """
+    Same layout rules as flow_from_directory: one sub-folder per class
+    (sorted alphabetically unless class_names is given), images found recursively.
+    Returns (paths, labels, class_names).
+    """
+    if class_names is None:
+        class_names = sorted(d for d in os.listdir(data_dir) if os.path.isdir(os.path.join(data_dir, d)))
+    paths, labels = [], []
+    for label, name in enumerate(class_names):
+        for root, _, files in os.walk(os.path.join(data_dir, name)):
+            for f in sorted(files):
+                if f.lower().endswith(IMAGE_EXTS):
+                    paths.append(os.path.join(root, f))
+                    labels.append(label)
+    return paths, np.array(labels, dtype=np.int64), list(class_names)
+
+
+def split_files(paths, labels, validation_split, seed=42):
+    """Deterministic per-class train/val split (same seed -> same split on every run)."""
+    paths = np.asarray(paths)
+    rng = np.random.default_rng(seed)
+    train_idx, val_idx = [], []
+    for label in np.unique(labels):
+        idx = np.flatnonzero(labels == label)
+        idx = idx[np.argsort(paths[idx])]  # independent of os.listdir order
+        idx = rng.permutation(idx)
+        n_val = int(round(len(idx) * validation_split))
+        val_idx.append(idx[:n_val])
+        train_idx.append(idx[n_val:])
+    train_idx, val_idx = np.sort(np.concatenate(train_idx)), np.sort(np.concatenate(val_idx))
+    return (paths[train_idx].tolist(), labels[train_idx]), (paths[val_idx].tolist(), labels[val_idx])
+
+
+# ----------------------------------------
+# Augmentation
+# ----------------------------------------
+
+def make_augmenter(horizontal_flip=False, rotation_range=0, width_shift_range=0.0, height_shift_range=0.0,
+                   zoom_range=0.0, brightness_range=None, fill_mode='nearest', seed=None):
+    """
+    Keras preprocessing layers equivalent to the ImageDataGenerator arguments the
+    training scripts use (rotation in degrees, shifts/zoom as fractions).
+    Runs on whole batches on the CPU. shear_range has no layer equivalent and is not supported.
+    """
+    layers = []
+    if horizontal_flip:
+        layers.append(tf.keras.layers.RandomFlip('horizontal', seed=seed))
+    if rotation_range:
+        layers.append(tf.keras.layers.RandomRotation(rotation_range / 360.0, fill_mode=fill_mode, seed=seed))
+    if width_shift_range or height_shift_range:
+        layers.append(tf.keras.layers.RandomTranslation(height_shift_range, width_shift_range,
+                                                        fill_mode=fill_mode, seed=seed))
+    if zoom_range:
+        layers.append(tf.keras.layers.RandomZoom(zoom_range, fill_mode=fill_mode, seed=seed))
+    if brightness_range:
+        low, high = brightness_range
+        layers.append(tf.keras.layers.RandomBrightness((low - 1.0, high - 1.0), value_range=(0.0, 1.0), seed=seed))
+    if not layers:
+        return None
+    return tf.keras.Sequential(layers, name='augmentation')
+
+
+# ----------------------------------------
+# Dataset builders
+# ----------------------------------------
+
+def _encode_labels(labels, label_mode, num_classes):
+    if label_mode == 'binary':
+        return tf.cast(labels, tf.float32)
+    if label_mode == 'categorical':
+        return tf.one_hot(labels, num_classes)
+    return labels  # 'sparse'
+
+
+def build_dataset(paths, labels, img_size, batch_size=32, label_mode='binary', num_classes=2,
+                  augmenter=None, shuffle=False, cache=True, shuffle_buffer=1000, seed=42,
+                  interpolation='nearest'):
+    """
+    paths/labels -> batched (images in [0, 1], labels) dataset.
+    Decoded images are cached as uint8 (in memory, or on disk if `cache` is a path),
+    so decoding happens once per run rather than once per epoch.
+    """
+    size = (img_size, img_size) if isinstance(img_size, int) else tuple(img_size)
+
+    def decode(path, label):
+        img = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+        img = tf.image.resize(img, size, method=interpolation)
+        img.set_shape((*size, 3))
+        return tf.cast(tf.clip_by_value(img, 0, 255), tf.uint8), label
+
+    def rescale(images, batch_labels):
+        images = tf.cast(images, tf.float32) / 255.0
+        if augmenter is not None:
+            images = augmenter(images, training=True)
+        return images, _encode_labels(batch_labels, label_mode, num_classes)
+
+    ds = tf.data.Dataset.from_tensor_slices((tf.constant(list(paths), dtype=tf.string), np.asarray(labels, dtype=np.int64)))
+    ds = ds.map(decode, num_parallel_calls=AUTOTUNE, deterministic=not shuffle)
+    if cache:
+        ds = ds.cache(cache if isinstance(cache, str) else '')
+    if shuffle:
+        ds = ds.shuffle(max(1, min(shuffle_buffer, len(paths))), seed=seed, reshuffle_each_iteration=True)
+    ds = ds.batch(batch_size)
+    ds = ds.map(rescale, num_parallel_calls=AUTOTUNE, deterministic=not shuffle)
+    return ds.prefetch(AUTOTUNE)
+
+
+def build_train_val_datasets(data_dir, img_size, batch_size=32, label_mode='binary', validation_split=0.2,
+                             augment=None, seed=42, cache=True, class_names=None):
+    """
+    One-call replacement for a pair of flow_from_directory(subset='training'/'validation')
+    generators. `augment` is a dict of make_augmenter() arguments applied to training only.
+    Returns (train_ds, val_ds, info) where info holds class_names and the label arrays.
+    """
+    paths, labels, class_names = list_image_files(data_dir, class_names)
+    (train_paths, train_labels), (val_paths, val_labels) = split_files(paths, labels, validation_split, seed)
+    augmenter = make_augmenter(seed=seed, **augment) if augment else None
+    common = dict(img_size=img_size, batch_size=batch_size, label_mode=label_mode,
+                  num_classes=len(class_names), cache=cache, seed=seed)
+    train_ds = build_dataset(train_paths, train_labels, augmenter=augmenter, shuffle=True, **common)
+    val_ds = build_dataset(val_paths, val_labels, shuffle=False, **common)
+    info = {
+        'class_names': class_names,
+        'class_indices': {name: i for i, name in enumerate(class_names)},
+        'train_labels': train_labels,
+        'val_labels': val_labels,
+        'train_paths': train_paths,
+        'val_paths': val_paths,
+    }
+    print(f"Found {len(train_paths)} training and {len(val_paths)} validation images "
+          f"belonging to {len(class_names)} classes.")
+    return train_ds, val_ds, info
+
+
+def balanced_class_weights(labels):
+    """Same values as sklearn's compute_class_weight('balanced'), as a Keras class_weight dict."""
+    classes, counts = np.unique(labels, return_counts=True)
+    weights = len(labels) / (len(classes) * counts)
+    return {int(c): float(w) for c, w in zip(classes, weights)}
+
+
+# ----------------------------------------
+# Input throughput benchmark
+# ----------------------------------------
+
+def benchmark_input(dataset, epochs=2):
+    """
+    Images/sec the pipeline delivers with no model attached, per epoch.
+    The first epoch includes decoding (and fills the cache); later ones read the cache.
+    """
+    rates = []
+    for _ in range(epochs):
+        count, start = 0, time.perf_counter()
+        for images, _ in dataset:
+            count += int(images.shape[0])
+        rates.append(count / (time.perf_counter() - start))
+    return rates
+
+
+def _benchmark_image_data_generator(data_dir, img_size, batch_size, steps, warmup=5):
+    """Baseline: the legacy flow_from_directory path the scripts used before."""
+    from tensorflow.keras.preprocessing.image import ImageDataGenerator
+    gen = ImageDataGenerator(rescale=1. / 255, horizontal_flip=True, rotation_range=15).flow_from_directory(
+        data_dir, target_size=(img_size, img_size), batch_size=batch_size, class_mode='sparse')
+    for _ in range(warmup):
+        next(gen)
+    count, start = 0, time.perf_counter()
+    for _ in range(steps):
+        images, _ = next(gen)
+        count += len(images)
+    return count / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure training input throughput (images/sec).")
+    parser.add_argument('data_dir')
+    parser.add_argument('--img-size', type=int, default=224)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--steps', type=int, default=50, help="batches timed for the baseline")
+    parser.add_argument('--baseline', action='store_true', help="also time ImageDataGenerator")
+    args = parser.parse_args()
+
+    train_ds, _, _ = build_train_val_datasets(
+        args.data_dir, args.img_size, args.batch_size, label_mode='sparse', validation_split=0.0,
+        augment={'horizontal_flip': True, 'rotation_range': 15})
+    for epoch, rate in enumerate(benchmark_input(train_ds), start=1):
+        print(f"tf.data epoch {epoch}:      {rate:.1f} images/sec")
+    if args.baseline:
+        print(f"ImageDataGenerator:    {_benchmark_image_data_generator(args.data_dir, args.img_size, args.batch_size, args.steps):.1f} images/sec")
@@ -0,0 +1,143 @@
+"""feature_cache.py — train classifier heads on cached backbone features
+While base_model.trainable is False the MobileNetV2 output for an image never
+changes, so the frozen phase only needs one backbone pass per image (and per
+fixed augmentation variant). Pooled features are stored in a memory-mapped
+.npy and the head layers of the real model are trained on them directly; the
+head layers are shared, so fine-tuning afterwards continues from these weights.
+"""
+
+import os
+import json
+import hashlib
+import numpy as np
+import tensorflow as tf
+
+try:
+    from data_pipeline import build_dataset
+except ImportError:  # imported as model_training.feature_cache (e.g. from backend/train_model.py)
+    from model_training.data_pipeline import build_dataset
+
+# Deterministic views of each image; "identity" is always used for validation
+VARIANTS = {
+    "identity": lambda x: x,
+    "hflip": lambda x: tf.image.flip_left_right(x),
+    "zoom": lambda x: tf.image.resize(tf.image.central_crop(x, 0.9), tf.shape(x)[1:3]),
+}
+
+
+def _cache_key(paths, img_size, variant, base_model):
+    h = hashlib.sha1()
+    h.update(json.dumps([base_model.name, base_model.count_params(), img_size, variant]).encode())
+    for p in paths:
+        h.update(p.encode())
+        h.update(str(os.path.getmtime(p)).encode())
+    return h.hexdigest()[:16]
+
+
+def extract_features(base_model, paths, img_size, cache_dir, variant="identity", batch_size=64):
+    """
+    Run the frozen backbone + global average pooling once over `paths` and
+    store the result as float16 in cache_dir/<key>.npy. Reuses the file when the
+    image list, image size, variant and backbone are unchanged.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    out_path = os.path.join(cache_dir, f"{variant}_{_cache_key(paths, img_size, variant, base_model)}.npy")
+    if os.path.exists(out_path):
+        return np.load(out_path, mmap_mode="r")
+
+    pooling = tf.keras.layers.GlobalAveragePooling2D()
+    transform = VARIANTS[variant]
+
+    @tf.function
+    def embed(images):
+        return pooling(base_model(transform(images), training=False))
+
+    dim = int(base_model.output_shape[-1])
+    tmp_path = out_path + ".tmp.npy"
+    features = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float16, shape=(len(paths), dim))
+    ds = build_dataset(paths, np.zeros(len(paths), dtype=np.int64), img_size, batch_size=batch_size,
+                       label_mode="sparse", shuffle=False, cache=False)
+    offset = 0
+    for images, _ in ds:
+        batch = embed(images).numpy()
+        features[offset:offset + len(batch)] = batch
+        offset += len(batch)
+    features.flush()
+    del features
+    os.replace(tmp_path, out_path)
+    print(f"💾 Cached {len(paths)} '{variant}' features -> {out_path}")
+    return np.load(out_path, mmap_mode="r")
+
+
+def head_model(model, base_model):
+    """
+    A model made of the layers that follow the last GlobalAveragePooling2D in
+    `model`, taking pooled features as input. Layers are shared, not copied.
+    """
+    pool_idx = max(i for i, layer in enumerate(model.layers)
+                   if isinstance(layer, tf.keras.layers.GlobalAveragePooling2D))
+    inputs = tf.keras.Input(shape=(int(base_model.output_shape[-1]),))
+    x = inputs
+    for layer in model.layers[pool_idx + 1:]:
+        x = layer(x)
+    return tf.keras.Model(inputs, x, name="cached_feature_head")
+
+
+def _encode(labels, label_mode, num_classes):
+    labels = np.asarray(labels)
+    if label_mode == "categorical":
+        return np.eye(num_classes, dtype=np.float32)[labels]
+    if label_mode == "binary":
+        return labels.astype(np.float32)
+    return labels.astype(np.int64)
+
+
+def _stream(arrays, labels, batch_size, shuffle, seed=0):
+    """
+    tf.data pipeline of float32 batches read straight from the memory-mapped
+    feature files (rows of all `arrays` in turn), reshuffled each epoch; only
+    one batch per prefetch slot is ever in RAM.
+    """
+    offsets = np.cumsum([0] + [len(a) for a in arrays])
+    dim = arrays[0].shape[1]
+    rng = np.random.default_rng(seed)
+
+    def batches():
+        order = rng.permutation(offsets[-1]) if shuffle else np.arange(offsets[-1])
+        for start in range(0, len(order), batch_size):
+            rows = np.sort(order[start:start + batch_size])  # sorted: sequential reads within each file
+            source = np.searchsorted(offsets, rows, side="right") - 1
+            x = np.empty((len(rows), dim), dtype=np.float32)
+            for a in np.unique(source):
+                mask = source == a
+                x[mask] = arrays[a][rows[mask] - offsets[a]]
+            yield x, labels[rows]
+
+    signature = (tf.TensorSpec((None, dim), tf.float32),
+                 tf.TensorSpec((None,) + labels.shape[1:], tf.as_dtype(labels.dtype)))
+    n_batches = -(-int(offsets[-1]) // batch_size)  # known length: Keras sees clean epoch ends
+    return (tf.data.Dataset.from_generator(batches, output_signature=signature)
+            .apply(tf.data.experimental.assert_cardinality(n_batches)).prefetch(2))
+
+
+def fit_head_from_cache(model, base_model, train_paths, train_labels, val_paths, val_labels, img_size,
+                        loss, label_mode="binary", num_classes=2, cache_dir="feature_cache",
+                        variants=("identity", "hflip"), optimizer="adam", batch_size=32, **fit_kwargs):
+    """
+    Frozen-backbone phase on cached features. Training uses every variant of every
+    image; validation uses the identity view. Batches are streamed from the
+    memory-mapped caches, never loaded whole. Returns the Keras History (same
+    'accuracy'/'val_accuracy'/'loss'/'val_loss' keys as model.fit).
+    """
+    train_features = [extract_features(base_model, train_paths, img_size, cache_dir, v) for v in variants]
+    y_train = np.concatenate([_encode(train_labels, label_mode, num_classes)] * len(variants))
+    train_ds = _stream(train_features, y_train, batch_size, shuffle=True)
+    validation_data = None
+    if len(val_paths):
+        val_features = extract_features(base_model, val_paths, img_size, cache_dir, "identity")
+        validation_data = _stream([val_features], _encode(val_labels, label_mode, num_classes), batch_size,
+                                  shuffle=False)
+
+    head = head_model(model, base_model)
+    head.compile(optimizer=optimizer, loss=loss, metrics=["accuracy"])
+    return head.fit(train_ds, validation_data=validation_data, **fit_kwargs)
@@ -0,0 +1,93 @@
+"""split_manifest.py — zero-copy train/val splits
+A split is a CSV manifest (path, label, class, split) instead of copied folders.
+Each file's split is decided by a hash of its relative path, so it never changes
+between runs and adding images does not reshuffle existing ones. The manifest is
+consumed directly by data_pipeline.build_dataset; materialize_split() can still
+produce train/val folders using hard links when a tool needs real directories.
+"""
+
+import os
+import csv
+import shutil
+import hashlib
+
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.bmp')
+MANIFEST_FIELDS = ['path', 'label', 'class', 'split']
+
+
+def hash_split(rel_path, val_fraction, salt="shwasnetra"):
+    """'val' for a stable val_fraction of paths, 'train' for the rest."""
+    digest = hashlib.sha1(f"{salt}:{rel_path}".encode("utf-8")).digest()
+    return "val" if int.from_bytes(digest[:8], "big") / 2 ** 64 < val_fraction else "train"
+
+
+def list_class_files(dataset_dir, folder):
+    """Image paths under dataset_dir/folder, relative to dataset_dir, sorted."""
+    found = []
+    for root, _, files in os.walk(os.path.join(dataset_dir, folder)):
+        for f in files:
+            if f.lower().endswith(IMAGE_EXTS):
+                found.append(os.path.relpath(os.path.join(root, f), dataset_dir).replace(os.sep, "/"))
+    return sorted(found)
+
+
+def build_manifest_rows(dataset_dir, class_folders, val_fraction=0.2, salt="shwasnetra"):
+    """class_folders: ordered {class_name: folder}; label = position in that order."""
+    rows = []
+    for label, (cls, folder) in enumerate(class_folders.items()):
+        for rel in list_class_files(dataset_dir, folder):
+            rows.append({'path': rel, 'label': label, 'class': cls, 'split': hash_split(rel, val_fraction, salt)})
+    return rows
+
+
+def read_manifest(manifest_path):
+    with open(manifest_path, newline='') as f:
+        return [dict(row, label=int(row['label'])) for row in csv.DictReader(f)]
+
+
+def prepare_split_manifest(dataset_dir, class_folders, manifest_path, val_fraction=0.2, salt="shwasnetra"):
+    """
+    (Re)write the manifest only when the file listing changed. Cost is one
+    directory walk; no image is opened or copied.
+    """
+    rows = build_manifest_rows(dataset_dir, class_folders, val_fraction, salt)
+    if os.path.exists(manifest_path) and read_manifest(manifest_path) == rows:
+        return rows, False
+    tmp = manifest_path + ".tmp"
+    with open(tmp, "w", newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=MANIFEST_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp, manifest_path)
+    return rows, True
+
+
+def load_split(manifest_path, split, dataset_dir):
+    """(paths, labels, class_names) for one split, ready for data_pipeline.build_dataset."""
+    rows = read_manifest(manifest_path)
+    class_names = [cls for _, cls in sorted({(r['label'], r['class']) for r in rows})]
+    chosen = [r for r in rows if r['split'] == split]
+    return [os.path.join(dataset_dir, r['path']) for r in chosen], [r['label'] for r in chosen], class_names
+
+
+def materialize_split(manifest_path, dataset_dir, split_dirs):
+    """
+    Fallback for tools that need folders: hard-link every manifest entry into
+    split_dirs[split]/<class>/ (copying only where linking is impossible, e.g.
+    across filesystems). Existing links are kept, so reruns do no work.
+    """
+    linked = copied = 0
+    for row in read_manifest(manifest_path):
+        dst_dir = os.path.join(split_dirs[row['split']], row['class'])
+        os.makedirs(dst_dir, exist_ok=True)
+        dst = os.path.join(dst_dir, row['path'].replace("/", "__"))
+        if os.path.exists(dst):
+            continue
+        src = os.path.join(dataset_dir, row['path'])
+        try:
+            os.link(src, dst)
+            linked += 1
+        except OSError:
+            shutil.copy2(src, dst)
+            copied += 1
+    return linked, copied
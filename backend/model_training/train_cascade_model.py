@@ -0,0 +1,83 @@
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau
+from data_pipeline import list_image_files, split_files, make_augmenter, build_dataset
+
+# One MobileNetV2 backbone with two heads, replacing chest_filter_model +
+# lung_cancer_detector_mobilenetv2_full in utils/cascade.py (CASCADE_MODE=multihead):
+#   chest     - sigmoid, probability the image is NOT a chest scan (same as the filter)
+#   diagnosis - softmax over the same classes as the main classifier
+IMG_SIZE = 224
+BATCH_SIZE = 32
+EPOCHS = 30
+FINE_TUNE_EPOCHS = 20
+UNCHEST_CLASS = "unchest"
+
+# Same folder as train_lung_cancer_classifier.py; its 'unchest' class feeds the chest head
+train_dir = "E:/Shwasnetra/backend/model_training/dataset/chest"
+
+paths, labels, class_names = list_image_files(train_dir)
+unchest_idx = class_names.index(UNCHEST_CLASS)
+(train_paths, train_labels), (val_paths, val_labels) = split_files(paths, labels, validation_split=0.15)
+print(f"Found {len(train_paths)} training and {len(val_paths)} validation images "
+      f"belonging to {len(class_names)} classes: {class_names}")
+
+augmenter = make_augmenter(horizontal_flip=True, rotation_range=15, width_shift_range=0.1,
+                           height_shift_range=0.1, zoom_range=0.15, fill_mode='nearest')
+
+
+def two_heads(images, one_hot):
+    chest = tf.expand_dims(one_hot[:, unchest_idx], -1)
+    return images, {"chest": chest, "diagnosis": one_hot}
+
+
+common = dict(img_size=IMG_SIZE, batch_size=BATCH_SIZE, label_mode="categorical", num_classes=len(class_names))
+train_ds = build_dataset(train_paths, train_labels, augmenter=augmenter, shuffle=True, **common).map(two_heads)
+val_ds = build_dataset(val_paths, val_labels, shuffle=False, **common).map(two_heads)
+
+base_model = tf.keras.applications.MobileNetV2(
+    input_shape=(IMG_SIZE, IMG_SIZE, 3),
+    include_top=False,
+    weights='imagenet'
+)
+base_model.trainable = False
+
+inputs = tf.keras.Input(shape=(IMG_SIZE, IMG_SIZE, 3))
+features = tf.keras.layers.GlobalAveragePooling2D()(base_model(inputs, training=False))
+features = tf.keras.layers.Dropout(0.2)(features)
+chest = tf.keras.layers.Dense(1, activation="sigmoid", name="chest")(features)
+diagnosis = tf.keras.layers.Dense(len(class_names), activation="softmax", name="diagnosis")(features)
+model = tf.keras.Model(inputs, [chest, diagnosis], name="shwasnetra_cascade_multihead")
+
+losses = {"chest": "binary_crossentropy", "diagnosis": "categorical_crossentropy"}
+metrics = {"chest": ["accuracy"], "diagnosis": ["accuracy"]}
+model.compile(optimizer='adam', loss=losses, metrics=metrics)
+model.summary()
+
+model.fit(
+    train_ds,
+    validation_data=val_ds,
+    epochs=EPOCHS,
+    callbacks=[EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True, verbose=1),
+               ReduceLROnPlateau(monitor='val_loss', patience=5, factor=0.5, min_lr=1e-6, verbose=1)],
+    verbose=2
+)
+
+# Fine-tune the shared backbone on both objectives
+base_model.trainable = True
+model.compile(optimizer=tf.keras.optimizers.Adam(1e-5), loss=losses, metrics=metrics)
+model.fit(
+    train_ds,
+    validation_data=val_ds,
+    epochs=FINE_TUNE_EPOCHS,
+    callbacks=[EarlyStopping(monitor='val_loss', patience=8, restore_best_weights=True, verbose=1),
+               ReduceLROnPlateau(monitor='val_loss', patience=4, factor=0.5, min_lr=1e-7, verbose=1)],
+    verbose=2
+)
+
+val_metrics = model.evaluate(val_ds, return_dict=True, verbose=0)
+print(f"Validation: {val_metrics}")
+print(f"Unchest fraction in validation split: {np.mean(np.asarray(val_labels) == unchest_idx):.3f}")
+
+model.save("shwasnetra_cascade_multihead.keras")
+print("Multi-head cascade model trained and saved as shwasnetra_cascade_multihead.keras")
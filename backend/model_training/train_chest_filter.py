@@ -1,8 +1,7 @@
 import tensorflow as tf
-from tensorflow.keras.preprocessing.image import ImageDataGenerator
 from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau
-import numpy as np
-from sklearn.utils.class_weight import compute_class_weight
+from data_pipeline import list_image_files, split_files, balanced_class_weights
+from feature_cache import fit_head_from_cache
 
 IMG_SIZE = 128  # small input size to keep model lightweight
 BATCH_SIZE = 32
@@ -11,43 +10,14 @@ EPOCHS = 30
 # Correct path based on your folder structure (train_split has 'chest' and 'unchest' subfolders)
 train_dir = "E:/Shwasnetra/backend/model_training/dataset/train_split"
 
-# Data augmentation for robustness
-datagen = ImageDataGenerator(
-    rescale=1./255,
-    validation_split=0.15,
-    horizontal_flip=True,
-    rotation_range=10,
-    width_shift_range=0.05,
-    height_shift_range=0.05,
-    fill_mode='nearest'
-)
-
-train_generator = datagen.flow_from_directory(
-    train_dir,
-    target_size=(IMG_SIZE, IMG_SIZE),
-    batch_size=BATCH_SIZE,
-    class_mode="binary",
-    subset="training",
-    shuffle=True
-)
-
-val_generator = datagen.flow_from_directory(
-    train_dir,
-    target_size=(IMG_SIZE, IMG_SIZE),
-    batch_size=BATCH_SIZE,
-    class_mode="binary",
-    subset="validation",
-    shuffle=False
-)
+# Only the file split is needed: the head trains on cached backbone features
+paths, labels, class_names = list_image_files(train_dir)
+(train_paths, train_labels), (val_paths, val_labels) = split_files(paths, labels, validation_split=0.15, seed=42)
+print(f"Found {len(train_paths)} training and {len(val_paths)} validation images "
+      f"belonging to {len(class_names)} classes.")
 
-# Calculate class weights for imbalanced data handling (use keyword arguments)
-labels = train_generator.classes
-class_weights = compute_class_weight(
-    class_weight='balanced',
-    classes=np.unique(labels),
-    y=labels
-)
-class_weights = dict(enumerate(class_weights))
+# Calculate class weights for imbalanced data handling
+class_weights = balanced_class_weights(train_labels)
 
 # Base model for binary classification: lightweight MobileNetV2
 base_model = tf.keras.applications.MobileNetV2(
@@ -74,9 +44,16 @@ model.summary()
 early_stopping = EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True)
 reduce_lr = ReduceLROnPlateau(monitor='val_loss', patience=5, factor=0.5, min_lr=1e-6, verbose=1)
 
-history = model.fit(
-    train_generator,
-    validation_data=val_generator,
+# Backbone stays frozen for the whole run, so train the head on cached
+# MobileNetV2 features (one backbone pass per image + flipped variant)
+history = fit_head_from_cache(
+    model, base_model,
+    train_paths, train_labels,
+    val_paths, val_labels,
+    img_size=IMG_SIZE,
+    loss='binary_crossentropy',
+    label_mode="binary",
+    batch_size=BATCH_SIZE,
     epochs=EPOCHS,
     class_weight=class_weights,
     callbacks=[early_stopping, reduce_lr],
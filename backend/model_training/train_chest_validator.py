@@ -1,39 +1,29 @@
 import tensorflow as tf
-from tensorflow.keras.preprocessing.image import ImageDataGenerator
 from tensorflow.keras.applications import MobileNetV2
 from tensorflow.keras.layers import GlobalAveragePooling2D, Dense, Dropout
 from tensorflow.keras.models import Model
 from tensorflow.keras.callbacks import EarlyStopping, ModelCheckpoint
 import os
+from data_pipeline import build_train_val_datasets
+from feature_cache import fit_head_from_cache
 
 DATA_DIR = "dataset"
 OUTPUT_MODEL = "chest_vs_nonchest_classifier.keras"
 
-# Data generator with augmentation for robustness
-datagen = ImageDataGenerator(
-    rescale=1./255,
-    validation_split=0.2,
-    rotation_range=15,
-    zoom_range=0.1,
-    shear_range=0.1,
-    horizontal_flip=True,
-    brightness_range=[0.7, 1.3]
-)
-
-train_gen = datagen.flow_from_directory(
+# tf.data pipeline with augmentation for robustness (training split only;
+# shear has no preprocessing-layer equivalent and is dropped)
+train_ds, val_ds, data_info = build_train_val_datasets(
     DATA_DIR,
-    target_size=(224, 224),
+    img_size=224,
     batch_size=16,
-    class_mode='binary',
-    subset='training'
-)
-
-val_gen = datagen.flow_from_directory(
-    DATA_DIR,
-    target_size=(224, 224),
-    batch_size=16,
-    class_mode='binary',
-    subset='validation'
+    label_mode='binary',
+    validation_split=0.2,
+    augment=dict(
+        rotation_range=15,
+        zoom_range=0.1,
+        horizontal_flip=True,
+        brightness_range=[0.7, 1.3]
+    )
 )
 
 base_model = MobileNetV2(weights='imagenet', include_top=False, input_shape=(224, 224, 3))
@@ -53,18 +43,24 @@ callbacks = [
     ModelCheckpoint(OUTPUT_MODEL, monitor="val_loss", save_best_only=True, verbose=1)
 ]
 
-# Train longer, but safely
-history = model.fit(
-    train_gen, 
-    validation_data=val_gen, 
+# Train longer, but safely — frozen phase runs on cached backbone features
+# (checkpointing starts with fine-tuning, since the head alone is not a full model)
+history = fit_head_from_cache(
+    model, base_model,
+    data_info["train_paths"], data_info["train_labels"],
+    data_info["val_paths"], data_info["val_labels"],
+    img_size=224,
+    loss='binary_crossentropy',
+    label_mode='binary',
+    batch_size=16,
     epochs=50,
-    callbacks=callbacks
+    callbacks=[callbacks[0]]
 )
 
 # Optionally unfreeze for fine-tuning if val accuracy plateaus
 base_model.trainable = True
 model.compile(optimizer=tf.keras.optimizers.Adam(1e-5), loss='binary_crossentropy', metrics=['accuracy'])
-history_finetune = model.fit(train_gen, validation_data=val_gen, epochs=10, callbacks=callbacks)
+history_finetune = model.fit(train_ds, validation_data=val_ds, epochs=10, callbacks=callbacks)
 
 model.save(OUTPUT_MODEL)
 print(f"✅ Saved improved classifier to {OUTPUT_MODEL}")
@@ -1,8 +1,9 @@
 import tensorflow as tf
-from tensorflow.keras.preprocessing.image import ImageDataGenerator
-import os, shutil
-from sklearn.model_selection import train_test_split
+import os
 import matplotlib.pyplot as plt
+from data_pipeline import build_dataset
+from feature_cache import fit_head_from_cache
+from split_manifest import prepare_split_manifest, load_split, materialize_split
 
 # -----------------------------------------------------------
 # ✅ Paths
@@ -10,36 +11,17 @@ import matplotlib.pyplot as plt
 DATASET_DIR = "model_training/dataset"
 TRAIN_DIR = "model_training/dataset/train_split"
 VAL_DIR = "model_training/dataset/val_split"
+SPLIT_MANIFEST = "model_training/dataset/filter_split.csv"
 
-# Clean old splits (to prevent stale files)
-if os.path.exists(TRAIN_DIR):
-    shutil.rmtree(TRAIN_DIR)
-if os.path.exists(VAL_DIR):
-    shutil.rmtree(VAL_DIR)
+# Set True only if another tool needs train_split/val_split folders
+# (e.g. train_chest_filter.py); they are filled with hard links, not copies.
+MATERIALIZE_SPLIT_DIRS = False
 
-os.makedirs(TRAIN_DIR, exist_ok=True)
-os.makedirs(VAL_DIR, exist_ok=True)
 
 # -----------------------------------------------------------
-# ✅ Collect images recursively
-# -----------------------------------------------------------
-def collect_images(folder_name):
-    """Recursively find all images inside a folder (any subfolder)."""
-    exts = ('.png', '.jpg', '.jpeg', '.bmp')
-    folder_path = os.path.join(DATASET_DIR, folder_name)
-    all_images = []
-    for root, _, files in os.walk(folder_path):
-        for f in files:
-            if f.lower().endswith(exts):
-                all_images.append(os.path.join(root, f))
-    return all_images
-
-
-# -----------------------------------------------------------
-# ✅ Prepare dataset split
+# ✅ Prepare dataset split (manifest only — no image is copied)
 # -----------------------------------------------------------
 def prepare_split():
-    chest_images = collect_images("chest")
     unchest_folder = "unchest"
 
     if not os.path.exists(os.path.join(DATASET_DIR, unchest_folder)):
@@ -48,66 +30,41 @@ def prepare_split():
                 unchest_folder = alt
                 break
 
-    unchest_images = collect_images(unchest_folder)
+    rows, changed = prepare_split_manifest(
+        DATASET_DIR,
+        {"chest": "chest", "unchest": unchest_folder},
+        SPLIT_MANIFEST,
+        val_fraction=0.2
+    )
 
-    if len(chest_images) == 0:
+    counts = {cls: sum(1 for r in rows if r["class"] == cls) for cls in ("chest", "unchest")}
+    if counts["chest"] == 0:
         raise ValueError(f"No chest images found in {DATASET_DIR}/chest")
-    if len(unchest_images) == 0:
+    if counts["unchest"] == 0:
         raise ValueError(f"No unchest images found in {DATASET_DIR}/{unchest_folder}")
+    print(f"{'📝 Wrote' if changed else '♻️ Reused'} split manifest {SPLIT_MANIFEST}: {counts}")
 
-    chest_train, chest_val = train_test_split(chest_images, test_size=0.2, random_state=42)
-    unchest_train, unchest_val = train_test_split(unchest_images, test_size=0.2, random_state=42)
-
-    # Copy to split folders
-    for cls, (train_list, val_list) in {
-        "chest": (chest_train, chest_val),
-        "unchest": (unchest_train, unchest_val)
-    }.items():
-        os.makedirs(os.path.join(TRAIN_DIR, cls), exist_ok=True)
-        os.makedirs(os.path.join(VAL_DIR, cls), exist_ok=True)
-        for src in train_list:
-            try:
-                shutil.copy(src, os.path.join(TRAIN_DIR, cls))
-            except Exception as e:
-                print(f"⚠️ Skipped {src}: {e}")
-        for src in val_list:
-            try:
-                shutil.copy(src, os.path.join(VAL_DIR, cls))
-            except Exception as e:
-                print(f"⚠️ Skipped {src}: {e}")
+    if MATERIALIZE_SPLIT_DIRS:
+        linked, copied = materialize_split(SPLIT_MANIFEST, DATASET_DIR, {"train": TRAIN_DIR, "val": VAL_DIR})
+        print(f"🔗 Split folders updated: {linked} hard links, {copied} copies")
 
 prepare_split()
 
 # -----------------------------------------------------------
-# ✅ Image Generators with Augmentation
+# ✅ Split + validation pipeline (training runs on cached features)
 # -----------------------------------------------------------
-train_datagen = ImageDataGenerator(
-    rescale=1.0/255.0,
-    rotation_range=8,
-    width_shift_range=0.1,
-    height_shift_range=0.1,
-    zoom_range=0.1,
-    horizontal_flip=True
-)
-
-val_datagen = ImageDataGenerator(rescale=1.0/255.0)
+train_paths, train_labels, class_names = load_split(SPLIT_MANIFEST, "train", DATASET_DIR)
+val_paths, val_labels, _ = load_split(SPLIT_MANIFEST, "val", DATASET_DIR)
 
-train_gen = train_datagen.flow_from_directory(
-    TRAIN_DIR,
-    target_size=(128, 128),
+val_ds = build_dataset(
+    val_paths, val_labels,
+    img_size=128,
     batch_size=16,
-    class_mode="binary"
-)
-
-val_gen = val_datagen.flow_from_directory(
-    VAL_DIR,
-    target_size=(128, 128),
-    batch_size=16,
-    class_mode="binary"
+    label_mode="binary"
 )
 
 print("\n✅ Class indices mapping:")
-print(train_gen.class_indices)
+print({name: i for i, name in enumerate(class_names)})
 # Expect: {'chest': 0, 'unchest': 1}
 
 # -----------------------------------------------------------
@@ -131,8 +88,19 @@ model.compile(optimizer="adam", loss="binary_crossentropy", metrics=["accuracy"]
 # -----------------------------------------------------------
 # ✅ Train Model
 # -----------------------------------------------------------
+# The base stays frozen, so the head trains on cached MobileNetV2 features
 EPOCHS = 10
-history = model.fit(train_gen, validation_data=val_gen, epochs=EPOCHS)
+history = fit_head_from_cache(
+    model, base_model,
+    train_paths, train_labels,
+    val_paths, val_labels,
+    img_size=128,
+    loss="binary_crossentropy",
+    label_mode="binary",
+    cache_dir="model_training/feature_cache",
+    batch_size=16,
+    epochs=EPOCHS
+)
 
 # -----------------------------------------------------------
 # ✅ Plot and Save
@@ -164,7 +132,8 @@ print(f"\n✅ Chest filter model trained and saved at {SAVE_PATH}")
 # -----------------------------------------------------------
 # ✅ Test quick sample batch
 # -----------------------------------------------------------
-sample_imgs, sample_labels = next(val_gen)
+sample_imgs, sample_labels = next(iter(val_ds))
+sample_labels = sample_labels.numpy()
 preds = model.predict(sample_imgs)
 print("\n🔍 Sample predictions:")
 for i in range(min(5, len(preds))):
@@ -1,8 +1,7 @@
 import tensorflow as tf
-from tensorflow.keras.preprocessing.image import ImageDataGenerator
 from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau
-import numpy as np
-from sklearn.utils.class_weight import compute_class_weight
+from data_pipeline import build_train_val_datasets, balanced_class_weights
+from feature_cache import fit_head_from_cache
 
 # Constants - adjust paths and params as needed
 IMG_SIZE = 224
@@ -12,46 +11,25 @@ FINE_TUNE_EPOCHS = 30  # fine tune all layers after initial training
 
 train_dir = "E:/Shwasnetra/backend/model_training/dataset/chest"
 
-# Data augmentation plus validation split
-datagen = ImageDataGenerator(
-    rescale=1./255,
-    validation_split=0.15,
-    horizontal_flip=True,
-    rotation_range=15,
-    width_shift_range=0.1,
-    height_shift_range=0.1,
-    zoom_range=0.15,
-    fill_mode='nearest'
-)
-
-# Training data generator
-train_generator = datagen.flow_from_directory(
-    train_dir,
-    target_size=(IMG_SIZE, IMG_SIZE),
-    batch_size=BATCH_SIZE,
-    class_mode="categorical",
-    subset="training",
-    shuffle=True
-)
-
-# Validation data generator
-val_generator = datagen.flow_from_directory(
+# tf.data pipeline: augmentation on the training split, deterministic validation split
+train_ds, val_ds, data_info = build_train_val_datasets(
     train_dir,
-    target_size=(IMG_SIZE, IMG_SIZE),
+    img_size=IMG_SIZE,
     batch_size=BATCH_SIZE,
-    class_mode="categorical",
-    subset="validation",
-    shuffle=False
+    label_mode="categorical",
+    validation_split=0.15,
+    augment=dict(
+        horizontal_flip=True,
+        rotation_range=15,
+        width_shift_range=0.1,
+        height_shift_range=0.1,
+        zoom_range=0.15,
+        fill_mode='nearest'
+    )
 )
 
 # Compute class weights for imbalance correction
-labels = train_generator.classes
-class_weights = compute_class_weight(
-    class_weight='balanced',
-    classes=np.unique(labels),
-    y=labels
-)
-class_weights = dict(enumerate(class_weights))
+class_weights = balanced_class_weights(data_info["train_labels"])
 print(f"Class weights: {class_weights}")
 
 # Base model with frozen layers initially
@@ -77,10 +55,17 @@ model.summary()
 early_stopping = EarlyStopping(monitor='val_loss', patience=25, restore_best_weights=True, verbose=1)
 reduce_lr = ReduceLROnPlateau(monitor='val_loss', patience=7, factor=0.5, min_lr=1e-6, verbose=1)
 
-# Phase 1: Train head only
-model.fit(
-    train_generator,
-    validation_data=val_generator,
+# Phase 1: Train head only, on cached MobileNetV2 features (the frozen
+# backbone runs once per image + flipped variant instead of once per epoch)
+fit_head_from_cache(
+    model, base_model,
+    data_info["train_paths"], data_info["train_labels"],
+    data_info["val_paths"], data_info["val_labels"],
+    img_size=IMG_SIZE,
+    loss='categorical_crossentropy',
+    label_mode="categorical",
+    num_classes=len(data_info["class_names"]),
+    batch_size=BATCH_SIZE,
     epochs=EPOCHS,
     class_weight=class_weights,
     callbacks=[early_stopping, reduce_lr],
@@ -100,8 +85,8 @@ fine_tune_es = EarlyStopping(monitor='val_loss', patience=15, restore_best_weigh
 fine_tune_lr = ReduceLROnPlateau(monitor='val_loss', patience=7, factor=0.5, min_lr=1e-7, verbose=1)
 
 model.fit(
-    train_generator,
-    validation_data=val_generator,
+    train_ds,
+    validation_data=val_ds,
     epochs=FINE_TUNE_EPOCHS,
     class_weight=class_weights,
     callbacks=[fine_tune_es, fine_tune_lr],
@@ -1,27 +1,68 @@
-from fastapi import APIRouter, UploadFile, File
-from typing import List
-from utils.model_prediction_utils import predict_bulk_images
+"""bulk_predict.py — POST /bulk/predict (ASGI only, mounted by asgi.py)
+Multipart `files` (at most MAX_BULK_FILES, MAX_UPLOAD_BYTES in total) run as
+one cascade batch: the same chest filter + classifier as /predict.
+
+Response: {"results": [{"filename", "prediction", "confidence"} or
+{"filename", "error"}]}. BREAKING: "prediction" is now a cascade label
+(Normal / Benign / Malignant, or Unchest when the chest filter rejects the
+image) and "confidence" is the probability of that label (for Unchest, the
+chest filter's). Before, this route returned the binary
+lung_cancer_detector result, "cancer" / "normal" with the raw sigmoid as
+confidence.
+"""
+
+from fastapi import APIRouter, Request
 from fastapi.responses import JSONResponse
+from starlette.formparsers import MultiPartException
+
+import app as backend
+from utils.admission import BULK
+from utils.async_bridge import run_admitted, too_large, read_form, UploadTooLarge
+from utils.cascade import decode_image
 
 router = APIRouter()
 
+MAX_BULK_FILES = 64
+
+
+def predict_files(uploads):
+    """One cascade batch (chest filter + classifier) for every readable image; an error entry for the rest."""
+    images = [decode_image(contents) for _, contents in uploads]
+    results = [{"filename": filename, "error": "Unreadable image"} for filename, _ in uploads]
+    readable = [i for i, img in enumerate(images) if img is not None]
+    if readable:
+        for i, result in zip(readable, backend.CASCADE.predict_images([images[i] for i in readable])):
+            backend.PREDICTIONS.inc(label=result["label"])
+            results[i] = {
+                "filename": uploads[i][0],
+                "prediction": result["label"],
+                "confidence": result["confidence"]
+            }
+    return results
+
+
+# shares the predict controller and inference executor with /predict, in the bulk lane
 @router.post("/predict")
-async def bulk_predict(files: List[UploadFile] = File(...)):
-    results = []
-    for file in files:
-        contents = await file.read()
-        filename = file.filename
-
-        try:
-            prediction = predict_bulk_images(contents, filename)
-            results.append({
-                "filename": filename,
-                "prediction": prediction["label"],
-                "confidence": prediction["confidence"]
-            })
-        except Exception as e:
-            results.append({
-                "filename": filename,
-                "error": str(e)
-            })
-    return JSONResponse(content={"results": results})
+async def bulk_predict(request: Request):
+    if too_large(request, backend.MAX_UPLOAD_BYTES):
+        return JSONResponse({"error": "Upload too large"}, status_code=413)
+    if not backend.MAIN_MODEL:
+        return JSONResponse({"error": "Model not loaded"}, status_code=503)
+    try:
+        # the cap applies while the body streams in, before anything is spooled past it
+        form = await read_form(request, backend.MAX_UPLOAD_BYTES, max_files=MAX_BULK_FILES)
+    except UploadTooLarge:
+        return JSONResponse({"error": "Upload too large"}, status_code=413)
+    except MultiPartException as e:
+        return JSONResponse({"error": e.message}, status_code=400)
+    try:
+        files = [f for f in form.getlist("files") if not isinstance(f, str)]
+        if not files:
+            return JSONResponse({"error": "No files received"}, status_code=400)
+        uploads = [(file.filename, await file.read()) for file in files]
+    finally:
+        await form.close()
+
+    results, error = await run_admitted(backend.ADMISSION["predict"], request.app.state.inference_executor,
+                                        request, predict_files, uploads, default_lane=BULK)
+    return error or JSONResponse(content={"results": results})
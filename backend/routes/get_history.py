@@ -6,7 +6,8 @@ import os
 
 get_history = Blueprint('get_history', __name__)
 
-HISTORY_FILE = 'backend/logs/prediction_history.csv'
+# resolved from this file so it works whatever the working directory
+HISTORY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'logs', 'prediction_history.csv')
 
 @get_history.route('/api/history', methods=['GET'])
 def fetch_history():
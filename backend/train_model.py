@@ -1,5 +1,6 @@
 import tensorflow as tf
-from tensorflow.keras.preprocessing.image import ImageDataGenerator
+from model_training.data_pipeline import build_train_val_datasets
+from model_training.feature_cache import fit_head_from_cache
 
 # MobileNetV2 base with imagenet weights
 base_model = tf.keras.applications.MobileNetV2(
@@ -24,34 +25,27 @@ model.compile(optimizer='adam',
 print(model.summary())
 
 # Updated paths based on your directory listing:
-train_data_dir = 'E:/Shwasnetra/backend/model_training/dataset/chest'  # Use this for training (contains three folders)
-val_data_dir = 'E:/Shwasnetra/backend/model_training/dataset/chest'    # You should split part of this for validation or create separate val folder
+train_data_dir = 'E:/Shwasnetra/backend/model_training/dataset/chest'  # Contains three class folders; validation is split off below
 
-# Data generators
-train_datagen = ImageDataGenerator(rescale=1./255, horizontal_flip=True, rotation_range=20, validation_split=0.2)  # Use train-validation split
-val_datagen = ImageDataGenerator(rescale=1./255, validation_split=0.2)
-
-# Use subset parameter to split dataset
-train_generator = train_datagen.flow_from_directory(
+# tf.data pipeline: deterministic 80/20 split, augmentation on the training split only
+train_ds, val_ds, data_info = build_train_val_datasets(
     train_data_dir,
-    target_size=(224, 224),
+    img_size=224,
     batch_size=32,
-    class_mode='sparse',
-    subset='training'  # Use 80% for training
+    label_mode='sparse',
+    validation_split=0.2,
+    augment=dict(horizontal_flip=True, rotation_range=20)
 )
 
-val_generator = val_datagen.flow_from_directory(
-    val_data_dir,
-    target_size=(224, 224),
-    batch_size=32,
-    class_mode='sparse',
-    subset='validation'  # Use 20% for validation
-)
-
-# Train head first - frozen base
-model.fit(train_generator,
-          epochs=10,
-          validation_data=val_generator)
+# Train head first - frozen base, so use cached backbone features
+fit_head_from_cache(model, base_model,
+                    data_info['train_paths'], data_info['train_labels'],
+                    data_info['val_paths'], data_info['val_labels'],
+                    img_size=224,
+                    loss='sparse_categorical_crossentropy',
+                    label_mode='sparse',
+                    cache_dir='model_training/feature_cache',
+                    epochs=10)
 
 # Unfreeze some layers for fine tuning
 base_model.trainable = True
@@ -62,9 +56,9 @@ model.compile(optimizer=tf.keras.optimizers.Adam(1e-5),
               loss='sparse_categorical_crossentropy',
               metrics=['accuracy'])
 
-model.fit(train_generator,
+model.fit(train_ds,
           epochs=10,
-          validation_data=val_generator)
+          validation_data=val_ds)
 
 # Save trained model
 model.save('model_training/lung_cancer_detector_mobilenetv2.keras')
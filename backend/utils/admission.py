@@ -0,0 +1,175 @@
+"""admission.py — per-endpoint admission control, priority lanes and deadlines
+Each gunicorn worker runs a few threads (gthread) so requests are accepted
+into the process instead of piling up in the kernel backlog; an
+AdmissionController then decides, per endpoint, which of them may compute:
+  - at most `max_concurrent` run at once (1 for CPU-bound model work, which
+    keeps the thread layout from utils/runtime_config.py intact);
+  - waiting requests are served by lane (0 = interactive before 1 = bulk),
+    FIFO within a lane, and each lane has a bounded queue;
+  - a request is rejected at once, with a Retry-After hint, when its lane is
+    full or when the expected queue wait (queue position x EWMA service
+    time) already exceeds its deadline; one that times out while queued is
+    dropped the same way.
+The admitted request's deadline is kept in a context variable so the
+pipeline can stop between stages (check_deadline) once the caller has given up.
+
+admission_config_from_env() holds the per-endpoint limits; gunicorn.conf.py
+sizes each worker's thread pool from the same numbers (see capacity()).
+"""
+
+import os
+import math
+import time
+import heapq
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+
+INTERACTIVE, BULK = 0, 1
+LANES = {"interactive": INTERACTIVE, "bulk": BULK}
+
+_deadline = contextvars.ContextVar("shwasnetra_deadline", default=None)
+
+
+class Rejected(Exception):
+    """Not admitted; `retry_after` is a hint in whole seconds."""
+
+    def __init__(self, reason, retry_after=1):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed while it was being processed."""
+
+    def __init__(self, stage):
+        super().__init__(f"deadline exceeded before {stage}")
+        self.stage = stage
+
+
+def check_deadline(stage):
+    """Raise DeadlineExceeded if the current request's deadline has passed (no-op outside admission)."""
+    deadline = _deadline.get()
+    if deadline is not None and time.monotonic() >= deadline:
+        raise DeadlineExceeded(stage)
+
+
+def admission_config_from_env():
+    """AdmissionController arguments per gated endpoint, from PREDICT_* / CHAT_* env vars."""
+    return {
+        "predict": dict(max_concurrent=int(os.getenv("PREDICT_MAX_CONCURRENT", "1")),
+                        max_queue=(int(os.getenv("PREDICT_QUEUE", "8")), int(os.getenv("PREDICT_BULK_QUEUE", "4"))),
+                        default_deadline=float(os.getenv("PREDICT_DEADLINE_SECONDS", "30"))),
+        "download_reports": dict(max_concurrent=1, max_queue=(2, 2), default_deadline=60.0),
+        # chat threads only wait on the provider; asgi.py sizes its I/O pool from this entry
+        "chat": dict(max_concurrent=int(os.getenv("CHAT_MAX_CONCURRENT", "4")),
+                     max_queue=(int(os.getenv("CHAT_QUEUE", "8")), 4), default_deadline=30.0),
+    }
+
+
+def capacity(config):
+    """Requests one controller can hold at once: running plus queued in every lane."""
+    return config["max_concurrent"] + sum(config["max_queue"])
+
+
+def lane_from(value, default=INTERACTIVE):
+    """Lane for an X-Priority / ?priority= value ("interactive" or "bulk")."""
+    return LANES.get((value or "").strip().lower(), default)
+
+
+def deadline_from(deadline_ms, default_seconds):
+    """Absolute monotonic deadline: the client's X-Deadline-Ms budget, capped by the endpoint default."""
+    budget = default_seconds
+    try:
+        budget = min(budget, float(deadline_ms) / 1000.0)
+    except (TypeError, ValueError):
+        pass
+    return time.monotonic() + budget
+
+
+def remaining_seconds():
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+class AdmissionController:
+    def __init__(self, name, max_concurrent=1, max_queue=(8, 4), default_deadline=30.0, alpha=0.2):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = tuple(max_queue)  # per lane
+        self.default_deadline = default_deadline
+        self.alpha = alpha
+        self.service_seconds = None  # EWMA of admitted request duration
+        self.inflight = 0
+        self._waiting = []           # heap of (lane, seq, ticket)
+        self._queued = [0] * len(self.max_queue)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    @property
+    def capacity(self):
+        return capacity(vars(self))
+
+    def expected_wait(self, lane):
+        """Seconds a new request in `lane` would wait, from queue position and service time."""
+        ahead = sum(self._queued[:lane + 1]) + self.inflight - self.max_concurrent + 1
+        if ahead <= 0:
+            return 0.0
+        return ahead * (self.service_seconds or 0.0) / self.max_concurrent
+
+    @contextmanager
+    def admit(self, lane=INTERACTIVE, deadline=None):
+        """
+        Block until this request may run, or raise Rejected. `deadline` is an
+        absolute time.monotonic() value (defaults to now + default_deadline).
+        """
+        lane = min(max(lane, 0), len(self.max_queue) - 1)
+        deadline = deadline or time.monotonic() + self.default_deadline
+        ticket = object()
+        with self._cond:
+            wait = self.expected_wait(lane)
+            if self.inflight >= self.max_concurrent or self._waiting:
+                if self._queued[lane] >= self.max_queue[lane]:
+                    raise Rejected("queue_full", wait or self.service_seconds or 1)
+                if time.monotonic() + wait > deadline:
+                    raise Rejected("deadline", wait)
+            entry = (lane, next(self._seq), ticket)
+            heapq.heappush(self._waiting, entry)
+            self._queued[lane] += 1
+            try:
+                while self.inflight >= self.max_concurrent or self._waiting[0][2] is not ticket:
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        raise Rejected("expired", self.expected_wait(lane))
+                    self._cond.wait(left)
+            except Rejected:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+                raise
+            finally:
+                self._queued[lane] -= 1
+            heapq.heappop(self._waiting)
+            self.inflight += 1
+            self._cond.notify_all()
+
+        token = _deadline.set(deadline)
+        start = time.monotonic()
+        try:
+            yield deadline
+        finally:
+            _deadline.reset(token)
+            elapsed = time.monotonic() - start
+            with self._cond:
+                self.inflight -= 1
+                self.service_seconds = elapsed if self.service_seconds is None \
+                    else (1 - self.alpha) * self.service_seconds + self.alpha * elapsed
+                self._cond.notify_all()
+
+    def state(self):
+        with self._cond:
+            return {"inflight": self.inflight, "max_concurrent": self.max_concurrent,
+                    "queued": list(self._queued), "max_queue": list(self.max_queue),
+                    "service_ms": None if self.service_seconds is None else round(self.service_seconds * 1000, 1)}
@@ -0,0 +1,125 @@
+"""async_bridge.py — run blocking backend work from the ASGI app (asgi.py)
+An event-loop route awaits the work on a BoundedExecutor, behind the same
+AdmissionController the Flask routes use:
+  - the executor has one thread per request the controller can hold
+    (running + queued), and refuses work when they are all taken, so no
+    request waits invisibly in an executor queue;
+  - the work runs in a copy of the caller's context, so the request's trace
+    (and the deadline admit() sets) are visible on the thread;
+  - Rejected / DeadlineExceeded become the same 503 + Retry-After / 504
+    responses as admission_gate in app.py.
+Request bodies are read through capped_stream(), which stops at the upload
+limit as the bytes arrive; a chunked upload has no Content-Length for
+too_large() to check up front.
+"""
+
+import time
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi.responses import JSONResponse
+from starlette.formparsers import MultiPartParser, MultiPartException
+
+from utils.admission import Rejected, DeadlineExceeded, lane_from, deadline_from, INTERACTIVE, BULK
+from utils.serving_metrics import STAGE_SECONDS, ADMISSIONS
+
+
+class BoundedExecutor:
+    """Thread pool that refuses work when every thread is taken, instead of queueing it."""
+
+    def __init__(self, name, size):
+        self.size = size
+        self.busy = 0  # only touched on the event loop
+        self._pool = ThreadPoolExecutor(max_workers=size, thread_name_prefix=name)
+
+    async def run(self, fn, *args):
+        """(result, True), or (None, False) without running fn when the pool is full."""
+        if self.busy >= self.size:
+            return None, False
+        loop = asyncio.get_running_loop()
+        self.busy += 1
+        future = self._pool.submit(contextvars.copy_context().run, fn, *args)
+        # the slot is freed when the thread finishes, even if the client disconnected first
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release))
+        return await asyncio.wrap_future(future), True
+
+    def _release(self):
+        self.busy -= 1
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _admitted(controller, lane, deadline, fn, *args):
+    """Executor side: wait for admission (raises Rejected), then run fn."""
+    queued_at = time.perf_counter()
+    with controller.admit(lane, deadline):
+        STAGE_SECONDS.observe(time.perf_counter() - queued_at, endpoint=controller.name, stage="queue_wait")
+        ADMISSIONS.inc(endpoint=controller.name, lane="bulk" if lane == BULK else "interactive", outcome="admitted")
+        return fn(*args)
+
+
+async def run_admitted(controller, executor, request, fn, *args, default_lane=INTERACTIVE):
+    """
+    Await fn(*args) on `executor` behind `controller`; returns (result, None),
+    or (None, error response) for the 503 / 504 cases. Lane and deadline come
+    from X-Priority / ?priority= and X-Deadline-Ms, as in admission_gate.
+    """
+    lane = lane_from(request.headers.get("X-Priority") or request.query_params.get("priority"), default_lane)
+    deadline = deadline_from(request.headers.get("X-Deadline-Ms"), controller.default_deadline)
+    lane_name = "bulk" if lane == BULK else "interactive"
+    try:
+        result, accepted = await executor.run(_admitted, controller, lane, deadline, fn, *args)
+        if not accepted:
+            raise Rejected("queue_full", controller.expected_wait(lane) or controller.service_seconds or 1)
+        return result, None
+    except Rejected as e:
+        ADMISSIONS.inc(endpoint=controller.name, lane=lane_name, outcome=e.reason)
+        return None, JSONResponse({"error": "Server busy, retry later", "reason": e.reason}, status_code=503,
+                                  headers={"Retry-After": str(e.retry_after)})
+    except DeadlineExceeded as e:
+        ADMISSIONS.inc(endpoint=controller.name, lane=lane_name, outcome="deadline_exceeded")
+        return None, JSONResponse({"error": "Deadline exceeded", "stage": e.stage}, status_code=504)
+
+
+def too_large(request, limit):
+    """True when the declared Content-Length exceeds `limit` (checked before reading the body)."""
+    try:
+        return int(request.headers.get("content-length", 0)) > limit
+    except ValueError:
+        return False
+
+
+class UploadTooLarge(MultiPartException):
+    """The body passed the upload limit while it was being read (a MultiPartException, so the
+    multipart parser closes the files it has spooled so far)."""
+
+    def __init__(self, limit):
+        super().__init__(f"Upload larger than {limit} bytes")
+
+
+async def capped_stream(request, limit):
+    """request.stream(), raising UploadTooLarge as soon as more than `limit` bytes have arrived."""
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > limit:
+            raise UploadTooLarge(limit)
+        yield chunk
+
+
+async def read_body(request, limit):
+    """The whole body, at most `limit` bytes (UploadTooLarge past that)."""
+    return b"".join([chunk async for chunk in capped_stream(request, limit)])
+
+
+async def read_form(request, limit, max_files=1000):
+    """
+    Multipart form from capped_stream(); UploadTooLarge past `limit`,
+    MultiPartException for a malformed body. The caller closes the form.
+    """
+    try:
+        return await MultiPartParser(request.headers, capped_stream(request, limit), max_files=max_files).parse()
+    except ValueError as e:  # python-multipart's parse errors; Starlette only wraps its own checks
+        raise MultiPartException(f"Malformed multipart body: {e}") from e
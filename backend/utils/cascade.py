@@ -0,0 +1,209 @@
+"""cascade.py — chest filter + classifier with early exit
+The upload is decoded once and resized per stage. The chest filter runs first;
+images it rejects (sigmoid = probability of "unchest", chest=0 / unchest=1 in
+training) never reach the 224px classifier. A multi-head model trained by
+model_training/train_cascade_model.py can replace both stages with a single
+backbone pass behind the same interface.
+
+Every result is a dict:
+  rejected, chest_prob, label, confidence, probs, timings_ms {decode, chest, main}
+and, when the main model can return its pooled backbone features in the same
+pass (Keras backend), embedding (float32 vector) for classified images.
+With a TTAEnsemble (utils/tta.py) attached, the classifier stage runs over
+augmented views / several checkpoints and classified results also carry
+uncertainty {variance, std, views, models}.
+"""
+
+import io
+import time
+import logging
+import numpy as np
+from PIL import Image
+
+from utils.tracing import span
+from utils.admission import check_deadline
+
+logger = logging.getLogger("shwasnetra.cascade")
+
+REJECT_LABEL = "Unchest"
+
+
+def decode_image(image_bytes):
+    """RGB PIL image, or None if the bytes are not a readable image."""
+    try:
+        img = Image.open(io.BytesIO(image_bytes))
+        return img.convert("RGB")
+    except Exception as e:
+        logger.warning(f"[cascade] decode failed: {e}")
+        return None
+
+
+def to_batch(images, size):
+    """Same preprocessing as app.preprocess_image_bytes, for a list of decoded images."""
+    return np.stack([np.asarray(img.resize(size), dtype=np.float32) / 255.0 for img in images])
+
+
+def _ms(start):
+    return round((time.perf_counter() - start) * 1000.0, 3)
+
+
+def _squeeze_rows(preds, n):
+    return np.asarray(preds, dtype=np.float32).reshape(n, -1)
+
+
+class TwoStageCascade:
+    """Chest filter, then the main classifier on accepted images only."""
+
+    mode = "two_stage"
+
+    def __init__(self, chest_model, main_model, class_names, threshold=0.5,
+                 chest_size=(128, 128), main_size=(224, 224), reject_label=REJECT_LABEL, tta=None):
+        self.chest_model = chest_model
+        self.tta = tta
+        self.main_model = main_model
+        self.class_names = list(class_names)
+        self.threshold = threshold
+        self.chest_size = tuple(chest_size)
+        self.main_size = tuple(main_size)
+        self.reject_label = reject_label
+
+    def _chest_probs(self, images):
+        if not self.chest_model:  # None, or a hot-swap slot with nothing loaded
+            return None
+        try:
+            with span("chest_inference", images=len(images)):
+                preds = self.chest_model.predict(to_batch(images, self.chest_size), verbose=0)
+        except Exception as e:
+            # the filter is advisory: a failing filter lets the classifier decide
+            logger.exception(f"[cascade] chest filter failed: {e}")
+            return None
+        return _squeeze_rows(preds, len(images))[:, 0]
+
+    def _main_probs(self, images):
+        """(probs, embeddings or None, uncertainty or None) for the accepted images."""
+        if self.tta is not None:
+            probs, variance, embeddings, n_views = self.tta.predict_images(images)
+            uncertainty = [{"variance": v, "views": n_views, "models": len(self.tta.models)} for v in variance]
+            return probs, embeddings, uncertainty
+        if not self.main_model:
+            return None, None, None
+        with span("main_inference", images=len(images)):
+            x = to_batch(images, self.main_size)
+            if hasattr(self.main_model, "predict_with_embedding"):
+                preds, embeddings = self.main_model.predict_with_embedding(x)
+            else:
+                preds, embeddings = self.main_model.predict(x, verbose=0), None
+            return _squeeze_rows(preds, len(images)), embeddings, None
+
+    def _result(self, chest_prob, probs):
+        rejected = chest_prob is not None and chest_prob >= self.threshold
+        if rejected:
+            label, conf = self.reject_label, float(chest_prob)
+        elif probs is None:
+            label, conf = "Unknown", 0.0
+        elif probs.size == 1:  # sigmoid head
+            idx = int(probs[0] > 0.5)
+            label = self.class_names[idx] if idx < len(self.class_names) else "Unknown"
+            conf = float(probs[0])
+        else:
+            idx = int(np.argmax(probs))
+            label = self.class_names[idx] if idx < len(self.class_names) else "Unknown"
+            conf = float(probs[idx])
+        return {
+            "rejected": bool(rejected),
+            "chest_prob": None if chest_prob is None else float(chest_prob),
+            "label": label,
+            "confidence": conf,
+            "probs": None if probs is None or rejected else [float(p) for p in probs],
+        }
+
+    def predict_images(self, images):
+        """Decoded PIL images -> list of result dicts (one chest batch, one main batch)."""
+        timings = {"decode": 0.0, "chest": 0.0, "main": 0.0}
+        start = time.perf_counter()
+        chest = self._chest_probs(images)
+        timings["chest"] = _ms(start)
+
+        keep = [i for i in range(len(images)) if chest is None or chest[i] < self.threshold]
+        main, embedded, spread = {}, {}, {}
+        if keep:
+            check_deadline("main_inference")  # the caller gave up: skip the expensive stage
+            start = time.perf_counter()
+            probs, embeddings, uncertainty = self._main_probs([images[i] for i in keep])
+            timings["main"] = _ms(start)
+            if probs is not None:
+                main = dict(zip(keep, probs))
+            if embeddings is not None:
+                embedded = dict(zip(keep, embeddings))
+            if uncertainty is not None:
+                spread = dict(zip(keep, uncertainty))
+
+        results = []
+        for i in range(len(images)):
+            r = self._result(None if chest is None else chest[i], main.get(i))
+            r["timings_ms"] = timings
+            if i in embedded and not r["rejected"]:
+                r["embedding"] = embedded[i]
+            if i in spread and not r["rejected"]:
+                r["uncertainty"] = self._uncertainty(spread[i], main[i])
+            results.append(r)
+        return results
+
+    @staticmethod
+    def _uncertainty(spread, probs):
+        variance = np.asarray(spread["variance"], dtype=np.float32).reshape(-1)
+        idx = 0 if variance.size == 1 else int(np.argmax(probs))
+        return {
+            "variance": [float(v) for v in variance],
+            "std": float(np.sqrt(variance[idx])),  # of the reported class probability
+            "views": spread["views"],
+            "models": spread["models"],
+        }
+
+    def predict(self, image_bytes):
+        """Single upload -> result dict. Raises ValueError if the bytes do not decode."""
+        start = time.perf_counter()
+        img = decode_image(image_bytes)
+        if img is None:
+            raise ValueError("Failed to decode image")
+        decode_ms = _ms(start)
+        result = self.predict_images([img])[0]
+        result["timings_ms"] = dict(result["timings_ms"], decode=decode_ms)
+        return result
+
+
+class MultiHeadCascade(TwoStageCascade):
+    """
+    One model with outputs [chest, diagnosis]; both heads come out of a single
+    backbone pass, so there is nothing left to skip on rejection.
+    """
+
+    mode = "multihead"
+
+    def __init__(self, model, class_names, threshold=0.5, input_size=(224, 224), reject_label=REJECT_LABEL):
+        super().__init__(None, None, class_names, threshold, input_size, input_size, reject_label)
+        self.model = model
+
+    def predict_images(self, images):
+        start = time.perf_counter()
+        with span("multihead_inference", images=len(images)):
+            outputs = self.model.predict(to_batch(images, self.main_size), verbose=0)
+        if isinstance(outputs, dict):
+            outputs = [outputs["chest"], outputs["diagnosis"]]
+        if not isinstance(outputs, (list, tuple)) or len(outputs) != 2:
+            raise ValueError("multi-head cascade model must return [chest, diagnosis]")
+        elapsed = _ms(start)
+        chest = _squeeze_rows(outputs[0], len(images))[:, 0]
+        probs = _squeeze_rows(outputs[1], len(images))
+        timings = {"decode": 0.0, "chest": 0.0, "main": elapsed}
+        return [dict(self._result(chest[i], probs[i]), timings_ms=timings) for i in range(len(images))]
+
+
+def build_cascade(chest_model, main_model, class_names, threshold=0.5, chest_size=(128, 128),
+                  main_size=(224, 224), multihead_model=None, tta=None):
+    """The multi-head cascade when its model loaded, otherwise the two-stage one (optionally with TTA)."""
+    if multihead_model is not None:
+        shape = getattr(multihead_model, "input_shape", None)
+        size = (int(shape[1]), int(shape[2])) if shape and len(shape) >= 4 and shape[1] else main_size
+        return MultiHeadCascade(multihead_model, class_names, threshold, size)
+    return TwoStageCascade(chest_model, main_model, class_names, threshold, chest_size, main_size, tta=tta)
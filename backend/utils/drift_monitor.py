@@ -0,0 +1,307 @@
+"""drift_monitor.py — online input-drift monitoring for /predict
+Every upload is reduced to:
+  - cheap image statistics on a 64px thumbnail of the already decoded image
+    (about a millisecond): brightness, contrast, saturation, colourfulness,
+    dark/bright fractions, edge density, entropy, aspect ratio, resolution,
+    which separate CT slices from screenshots and photos;
+  - for classified uploads, the classifier's pooled backbone features (the
+    cascade's `embedding`, from the same forward pass as the prediction on
+    the Keras backend), reduced to 16-d by a fixed random projection.
+    Backends that expose no features leave the embedding score unknown.
+These feed streaming sketches per time window (fixed-bin histograms,
+running sum / sum of outer products for mean and covariance, label counts,
+a chest-filter probability histogram). Sketches are additive, so windows
+merge and a window can be saved as the reference.
+
+Drift scores against the reference window:
+  - psi: per-feature population stability index (max is reported);
+  - embedding: Mahalanobis distance between window and reference means;
+  - labels / chest_prob: PSI of the label mix and of the chest-filter output.
+PSI above 0.1 is "warn", above 0.25 "drift".
+
+Build a reference from known-good scans (--model adds backbone embeddings):
+    python -m utils.drift_monitor model_training/dataset/chest --model <classifier.keras> --out logs/drift_reference.json
+Without one, the first window with enough uploads becomes the reference of
+that worker. It is kept in memory only, so each worker picks its own and a
+restart starts over; only a built reference is loaded from disk.
+"""
+
+import os
+import json
+import time
+import threading
+import numpy as np
+
+FEATURES = ["brightness", "contrast", "saturation", "colorfulness", "dark_fraction", "bright_fraction",
+            "edge_density", "entropy", "aspect_ratio", "resolution"]
+EMBED_DIM = 16
+N_BINS = 20
+THUMB = 64
+PSI_WARN, PSI_DRIFT = 0.1, 0.25
+EMBED_WARN, EMBED_DRIFT = 1.0, 2.0
+EMBED_SPACE = "backbone_rp16"  # saved with a sketch; references from another space get no embedding score
+
+_projections = {}
+
+
+def project_embedding(features):
+    """Backbone features (any width) -> EMBED_DIM through a fixed random projection, seeded by the width,
+    so every worker and every restart use the same space."""
+    features = np.asarray(features, dtype=np.float64).reshape(-1)
+    dim = len(features)
+    if dim not in _projections:
+        _projections[dim] = np.random.default_rng(dim).standard_normal((dim, EMBED_DIM)) / np.sqrt(dim)
+    return features @ _projections[dim]
+
+
+def image_features(img):
+    """Statistics of a decoded RGB PIL image, each in [0, 1]."""
+    w, h = img.size
+    # reducing_gap: box-reduce first, then resample; keeps large uploads cheap
+    rgb = np.asarray(img.convert("RGB").resize((THUMB, THUMB), reducing_gap=2.0), dtype=np.float32) / 255.0
+    gray = rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    mx, mn = rgb.max(axis=2), rgb.min(axis=2)
+    saturation = np.where(mx > 0, (mx - mn) / np.maximum(mx, 1e-6), 0.0)
+    hist = np.bincount((gray * 255).astype(np.int64).ravel(), minlength=256) / gray.size
+    nz = hist[hist > 0]
+    edges = np.abs(np.diff(gray, axis=0)).mean() + np.abs(np.diff(gray, axis=1)).mean()
+    stats = np.array([
+        gray.mean(),
+        min(1.0, gray.std() * 2),
+        saturation.mean(),
+        min(1.0, (np.abs(rgb[..., 0] - rgb[..., 1]) + np.abs(rgb[..., 1] - rgb[..., 2])).mean()),
+        (gray < 0.125).mean(),
+        (gray > 0.875).mean(),
+        min(1.0, edges * 4),
+        float(-(nz * np.log2(nz)).sum()) / 8.0,
+        float(np.clip(0.5 + np.log2(w / h) / 4, 0, 1)),
+        float(np.clip(np.log2(w * h) / 24, 0, 1)),
+    ], dtype=np.float64)
+    return stats
+
+
+def psi(expected, actual, eps=1e-4):
+    """Population stability index between two count vectors."""
+    e = np.asarray(expected, dtype=float)
+    a = np.asarray(actual, dtype=float)
+    if e.sum() == 0 or a.sum() == 0:
+        return None
+    e = np.maximum(e / e.sum(), eps)
+    a = np.maximum(a / a.sum(), eps)
+    return float(np.sum((a - e) * np.log(a / e)))
+
+
+def _level(value, warn, drift):
+    if value is None:
+        return "unknown"
+    return "drift" if value >= drift else "warn" if value >= warn else "ok"
+
+
+class WindowSketch:
+    """Additive summary of the uploads seen in one time window."""
+
+    def __init__(self, start=None):
+        self.start = time.time() if start is None else start
+        self.count = 0
+        self.emb_count = 0  # uploads that came with backbone features
+        self.hist = np.zeros((len(FEATURES), N_BINS), dtype=np.int64)
+        self.emb_sum = np.zeros(EMBED_DIM)
+        self.emb_outer = np.zeros((EMBED_DIM, EMBED_DIM))
+        self.labels = {}
+        self.chest_hist = np.zeros(N_BINS, dtype=np.int64)
+
+    def add(self, stats, embedding=None, label=None, chest_prob=None):
+        """`embedding` is an EMBED_DIM vector from project_embedding, or None."""
+        bins = np.clip((stats * N_BINS).astype(np.int64), 0, N_BINS - 1)
+        self.hist[np.arange(len(FEATURES)), bins] += 1
+        if embedding is not None:
+            self.emb_sum += embedding
+            self.emb_outer += np.outer(embedding, embedding)
+            self.emb_count += 1
+        self.count += 1
+        if label is not None:
+            self.labels[label] = self.labels.get(label, 0) + 1
+        if chest_prob is not None:
+            self.chest_hist[min(N_BINS - 1, max(0, int(chest_prob * N_BINS)))] += 1
+
+    def merge(self, other):
+        self.start = min(self.start, other.start)
+        self.count += other.count
+        self.emb_count += other.emb_count
+        self.hist += other.hist
+        self.emb_sum += other.emb_sum
+        self.emb_outer += other.emb_outer
+        self.chest_hist += other.chest_hist
+        for label, n in other.labels.items():
+            self.labels[label] = self.labels.get(label, 0) + n
+        return self
+
+    def mean(self):
+        return self.emb_sum / max(self.emb_count, 1)
+
+    def cov(self):
+        mu = self.mean()
+        return self.emb_outer / max(self.emb_count, 1) - np.outer(mu, mu)
+
+    def to_dict(self):
+        return {"start": self.start, "count": self.count, "hist": self.hist.tolist(),
+                "embedding_space": EMBED_SPACE, "emb_count": self.emb_count,
+                "emb_sum": self.emb_sum.tolist(), "emb_outer": self.emb_outer.tolist(),
+                "labels": self.labels, "chest_hist": self.chest_hist.tolist()}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["start"])
+        sketch.count = data["count"]
+        sketch.hist = np.asarray(data["hist"], dtype=np.int64)
+        if data.get("embedding_space") == EMBED_SPACE:
+            sketch.emb_count = data["emb_count"]
+            sketch.emb_sum = np.asarray(data["emb_sum"], dtype=float)
+            sketch.emb_outer = np.asarray(data["emb_outer"], dtype=float)
+        sketch.labels = dict(data["labels"])
+        sketch.chest_hist = np.asarray(data["chest_hist"], dtype=np.int64)
+        return sketch
+
+
+class DriftMonitor:
+    def __init__(self, reference_path=None, window_seconds=3600, min_samples=50, history=24):
+        self.reference_path = reference_path
+        self.window_seconds = window_seconds
+        self.min_samples = min_samples
+        self.reference = None
+        self.reference_source = None  # "file" or "auto" (first full window, this worker only)
+        self._ref_inv = None
+        self.window = WindowSketch()
+        self.closed = []  # (sketch, scores) of recent windows, newest last
+        self.history = history
+        self._lock = threading.Lock()
+        if reference_path and os.path.exists(reference_path):
+            with open(reference_path) as f:
+                self._set_reference(WindowSketch.from_dict(json.load(f)), "file")
+
+    def _set_reference(self, sketch, source):
+        self.reference, self.reference_source = sketch, source
+        # ridge keeps the inverse stable for near-constant inputs
+        self._ref_inv = np.linalg.inv(sketch.cov() + 1e-3 * np.eye(EMBED_DIM)) if sketch.emb_count >= 2 else None
+
+    def observe(self, img, result=None):
+        """Sketch one decoded upload (and its cascade result); returns the feature cost in ms."""
+        start = time.perf_counter()
+        stats = image_features(img)
+        result = result or {}
+        features = result.get("embedding")
+        embedding = project_embedding(features) if features is not None else None
+        with self._lock:
+            if time.time() - self.window.start >= self.window_seconds:
+                self._rotate()
+            self.window.add(stats, embedding, result.get("label"), result.get("chest_prob"))
+        return (time.perf_counter() - start) * 1000.0
+
+    def _rotate(self):
+        finished, self.window = self.window, WindowSketch()
+        if self.reference is None:
+            if finished.count >= self.min_samples:
+                # in memory only: every worker would race to write it, and a restart should pick afresh
+                self._set_reference(finished, "auto")
+            return
+        self.closed.append((finished, self.scores(finished)))
+        del self.closed[:-self.history]
+
+    def set_reference(self, sketch):
+        """Use `sketch` as the reference and save it to reference_path (an explicit, single-writer action)."""
+        self._set_reference(sketch, "file")
+        if self.reference_path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.reference_path)), exist_ok=True)
+            with open(self.reference_path, "w") as f:
+                json.dump(sketch.to_dict(), f)
+
+    def scores(self, sketch=None):
+        """Drift of a window (the current one by default) relative to the reference."""
+        sketch = sketch or self.window
+        ref = self.reference
+        if ref is None or sketch.count == 0:
+            return {"status": "unknown", "count": sketch.count, "reference_count": ref.count if ref else 0}
+        feature_psi = {name: psi(ref.hist[i], sketch.hist[i]) for i, name in enumerate(FEATURES)}
+        max_psi = max(feature_psi.values())
+        embedding = None
+        if self._ref_inv is not None and sketch.emb_count:
+            d = sketch.mean() - ref.mean()
+            embedding = float(np.sqrt(max(0.0, d @ self._ref_inv @ d)))
+        labels = sorted(set(ref.labels) | set(sketch.labels))
+        label_psi = psi([ref.labels.get(l, 0) for l in labels], [sketch.labels.get(l, 0) for l in labels]) \
+            if labels else None
+        chest_psi = psi(ref.chest_hist, sketch.chest_hist)
+        levels = [_level(max_psi, PSI_WARN, PSI_DRIFT), _level(embedding, EMBED_WARN, EMBED_DRIFT),
+                  _level(label_psi, PSI_WARN, PSI_DRIFT), _level(chest_psi, PSI_WARN, PSI_DRIFT)]
+        status = "drift" if "drift" in levels else "warn" if "warn" in levels else "ok"
+        if sketch.count < self.min_samples and status != "ok":
+            status = "insufficient_data"
+        return {
+            "status": status,
+            "count": sketch.count,
+            "embedded_count": sketch.emb_count,
+            "reference_count": ref.count,
+            "reference_source": self.reference_source,
+            "psi": max_psi,
+            "feature_psi": feature_psi,
+            "embedding": embedding,
+            "labels": label_psi,
+            "chest_prob": chest_psi,
+            "label_counts": dict(sketch.labels),
+        }
+
+    def summary(self):
+        with self._lock:
+            return {
+                "window_seconds": self.window_seconds,
+                "window_start": self.window.start,
+                "current": self.scores(),
+                "recent": [dict(s, start=w.start) for w, s in self.closed],
+            }
+
+
+def build_reference(image_dir, out_path, model=None, input_size=(224, 224),
+                    extensions=(".png", ".jpg", ".jpeg", ".bmp")):
+    """
+    Sketch every image under image_dir and save it as a reference window.
+    With `model` (a backend exposing predict_with_embedding) the backbone
+    embeddings are sketched too; labels are never included.
+    """
+    from PIL import Image
+    sketch = WindowSketch()
+    for dirpath, _, files in os.walk(image_dir):
+        for name in sorted(files):
+            if name.lower().endswith(extensions):
+                try:
+                    with Image.open(os.path.join(dirpath, name)) as img:
+                        if model is None:
+                            img.draft("RGB", (THUMB * 2, THUMB * 2))  # JPEG decode-time downscale
+                        img = img.convert("RGB")
+                        embedding = None
+                        if model is not None:
+                            x = np.asarray(img.resize(input_size), dtype=np.float32)[None] / 255.0
+                            _, features = model.predict_with_embedding(x)
+                            if features is not None:
+                                embedding = project_embedding(features[0])
+                        sketch.add(image_features(img), embedding)
+                except Exception as e:
+                    print(f"❌ Skipping {name}: {e}")
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "w") as f:
+        json.dump(sketch.to_dict(), f)
+    return sketch
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Build a drift reference window from known-good images.")
+    parser.add_argument("image_dir")
+    parser.add_argument("--model", help="Keras classifier whose pooled features are sketched as embeddings")
+    parser.add_argument("--out", default=os.path.join("logs", "drift_reference.json"))
+    args = parser.parse_args()
+    model = None
+    if args.model:
+        from utils.inference_backends import load_backend, backend_config_from_env
+        model = load_backend(args.model, dict(backend_config_from_env(), backend="keras"))
+    ref = build_reference(args.image_dir, args.out, model)
+    print(f"✅ Reference from {ref.count} images ({ref.emb_count} embedded) saved to {args.out}")
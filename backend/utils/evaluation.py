@@ -0,0 +1,273 @@
+"""evaluation.py — shared, vectorized metrics for ShwasNetra validation scripts
+Used by validate_model.py, scripts/clinical_predictions.py and scripts/validate_iqoth.py.
+Everything works on NumPy arrays: all thresholds and all bootstrap resamples
+are evaluated in one pass instead of Python loops over scans.
+"""
+
+import csv
+import numpy as np
+
+
+# ----------------------------------------
+# Loading
+# ----------------------------------------
+
+def load_id_values(path, dtype=float):
+    """Read a headerless `id,value` file (clinical_predictions.txt / clinical_scores.txt)."""
+    data = np.loadtxt(path, delimiter=",", dtype=str, ndmin=2)
+    if data.size == 0:
+        return np.array([], dtype=str), np.array([], dtype=dtype)
+    return data[:, 0], data[:, 1].astype(dtype)
+
+
+def load_ids(path):
+    """Read one id per line (sampled_ids.txt)."""
+    with open(path) as f:
+        return np.array([line.strip() for line in f if line.strip()])
+
+
+def labels_from_annotations(annotations_path, scan_ids, id_column="seriesuid"):
+    """1 for every scan that has at least one annotated nodule, else 0."""
+    with open(annotations_path, newline="") as f:
+        positives = np.array([row[id_column] for row in csv.DictReader(f)])
+    return np.isin(scan_ids, positives).astype(np.int64)
+
+
+def align_by_id(ref_ids, ids, values):
+    """
+    Reorder `values` (keyed by `ids`) to follow `ref_ids`.
+    Returns (found_mask, aligned_values) — aligned_values only covers found ids.
+    """
+    ref_ids, ids, values = np.asarray(ref_ids), np.asarray(ids), np.asarray(values)
+    if len(ids) == 0:
+        return np.zeros(len(ref_ids), dtype=bool), values[:0]
+    order = np.argsort(ids)
+    sorted_ids = ids[order]
+    pos = np.clip(np.searchsorted(sorted_ids, ref_ids), 0, len(ids) - 1)
+    found = sorted_ids[pos] == ref_ids
+    return found, values[order][pos[found]]
+
+
+# ----------------------------------------
+# Fixed-threshold metrics
+# ----------------------------------------
+
+def confusion_matrix(y_true, y_pred, num_classes=None):
+    """Rows = true class, columns = predicted class."""
+    y_true = np.asarray(y_true, dtype=np.int64)
+    y_pred = np.asarray(y_pred, dtype=np.int64)
+    if num_classes is None:
+        num_classes = int(max(y_true.max(initial=0), y_pred.max(initial=0))) + 1
+    counts = np.bincount(y_true * num_classes + y_pred, minlength=num_classes * num_classes)
+    return counts.reshape(num_classes, num_classes)
+
+
+def classification_summary(cm, class_names=None):
+    """Per-class precision/recall/F1/support plus accuracy, from a confusion matrix."""
+    cm = np.asarray(cm, dtype=np.float64)
+    tp = np.diag(cm)
+    support = cm.sum(axis=1)
+    predicted = cm.sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(predicted > 0, tp / predicted, 0.0)
+        recall = np.where(support > 0, tp / support, 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+    names = class_names or [str(i) for i in range(len(cm))]
+    return {
+        "classes": {
+            name: {"precision": float(p), "recall": float(r), "f1": float(f), "support": int(s)}
+            for name, p, r, f, s in zip(names, precision, recall, f1, support)
+        },
+        "accuracy": float(tp.sum() / cm.sum()) if cm.sum() else 0.0,
+        "total": int(cm.sum()),
+    }
+
+
+def format_report(cm, class_names=None):
+    """Plain-text report in the same layout as sklearn's classification_report."""
+    summary = classification_summary(cm, class_names)
+    width = max(12, max(len(n) for n in summary["classes"]))
+    lines = [f"{'':>{width}} {'precision':>9} {'recall':>9} {'f1-score':>9} {'support':>9}", ""]
+    for name, m in summary["classes"].items():
+        lines.append(f"{name:>{width}} {m['precision']:>9.2f} {m['recall']:>9.2f} {m['f1']:>9.2f} {m['support']:>9d}")
+    lines += ["", f"{'accuracy':>{width}} {'':>9} {'':>9} {summary['accuracy']:>9.2f} {summary['total']:>9d}"]
+    return "\n".join(lines)
+
+
+# ----------------------------------------
+# Threshold sweeps (binary)
+# ----------------------------------------
+
+def _grouped_counts(y_true, scores, weights=None):
+    """
+    Collapse samples onto unique score values.
+    Returns (thresholds[K], pos[..., K], neg[..., K]); `weights` may be [B, n]
+    (bootstrap resample counts) to get B sets of counts at once.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    y = np.asarray(y_true, dtype=np.int64)
+    order = np.argsort(scores, kind="mergesort")
+    s, y = scores[order], y[order]
+    starts = np.flatnonzero(np.r_[True, s[1:] != s[:-1]])
+
+    w = np.ones_like(s) if weights is None else np.asarray(weights)[..., order]
+    pos = np.add.reduceat(w * y, starts, axis=-1)
+    neg = np.add.reduceat(w * (1 - y), starts, axis=-1)
+    return s[starts], pos, neg
+
+
+def threshold_sweep(y_true, scores):
+    """
+    TP/FP/FN/TN for every distinct threshold (predict positive when score >= threshold),
+    thresholds in ascending order.
+    """
+    thresholds, pos, neg = _grouped_counts(y_true, scores)
+    tp = np.cumsum(pos[::-1])[::-1]
+    fp = np.cumsum(neg[::-1])[::-1]
+    return {
+        "thresholds": thresholds,
+        "tp": tp, "fp": fp,
+        "fn": pos.sum() - tp, "tn": neg.sum() - fp,
+    }
+
+
+def roc_curve(y_true, scores):
+    """(fpr, tpr, thresholds) from the strictest to the most lenient threshold."""
+    sweep = threshold_sweep(y_true, scores)
+    p = sweep["tp"][0] + sweep["fn"][0]
+    n = sweep["fp"][0] + sweep["tn"][0]
+    tpr = np.r_[0.0, (sweep["tp"] / max(p, 1))[::-1]]
+    fpr = np.r_[0.0, (sweep["fp"] / max(n, 1))[::-1]]
+    return fpr, tpr, np.r_[np.inf, sweep["thresholds"][::-1]]
+
+
+def precision_recall_curve(y_true, scores):
+    """(precision, recall, thresholds) from the strictest to the most lenient threshold."""
+    sweep = threshold_sweep(y_true, scores)
+    tp, fp = sweep["tp"][::-1], sweep["fp"][::-1]
+    p = sweep["tp"][0] + sweep["fn"][0]
+    precision = tp / np.maximum(tp + fp, 1)
+    recall = tp / max(p, 1)
+    return np.r_[1.0, precision], np.r_[0.0, recall], np.r_[np.inf, sweep["thresholds"][::-1]]
+
+
+def _auc_from_counts(pos, neg):
+    """Tie-aware Mann-Whitney AUC from grouped counts; works on [..., K] arrays."""
+    neg_below = np.cumsum(neg, axis=-1) - neg
+    num = (pos * (neg_below + 0.5 * neg)).sum(axis=-1)
+    den = pos.sum(axis=-1) * neg.sum(axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(den > 0, num / den, np.nan)
+
+
+def _sens_at_spec_from_counts(pos, neg, specificity):
+    """Best sensitivity among thresholds whose specificity >= target; works on [..., K] arrays."""
+    tn = np.cumsum(neg, axis=-1) - neg                      # negatives strictly below threshold k
+    tp = np.flip(np.cumsum(np.flip(pos, -1), axis=-1), -1)  # positives at or above threshold k
+    spec = tn / np.maximum(neg.sum(axis=-1, keepdims=True), 1)
+    ok = spec >= specificity
+    first = np.argmax(ok, axis=-1)  # lowest qualifying threshold has the highest sensitivity
+    sens = np.take_along_axis(tp, first[..., None], axis=-1)[..., 0] / np.maximum(pos.sum(axis=-1), 1)
+    return np.where(ok.any(axis=-1), sens, 0.0)
+
+
+def roc_auc(y_true, scores):
+    _, pos, neg = _grouped_counts(y_true, scores)
+    return float(_auc_from_counts(pos, neg))
+
+
+def average_precision(y_true, scores):
+    precision, recall, _ = precision_recall_curve(y_true, scores)
+    return float(np.sum(np.diff(recall) * precision[1:]))
+
+
+def sensitivity_at_specificity(y_true, scores, specificity=0.9):
+    _, pos, neg = _grouped_counts(y_true, scores)
+    return float(_sens_at_spec_from_counts(pos, neg, specificity))
+
+
+def bootstrap_ci(y_true, scores, threshold=0.5, specificity=0.9, n_boot=1000, alpha=0.05, seed=42, chunk=250):
+    """
+    Percentile bootstrap intervals for AUC, sensitivity@specificity and the
+    fixed-threshold sensitivity/specificity/accuracy. Resamples are drawn as
+    multinomial count vectors and evaluated `chunk` at a time as one matrix.
+    Returns {metric: (point, low, high)}.
+    """
+    y = np.asarray(y_true, dtype=np.int64)
+    s = np.asarray(scores, dtype=np.float64)
+    n = len(y)
+    rng = np.random.default_rng(seed)
+    pred = (s >= threshold).astype(np.int64)
+
+    def metrics(w):
+        _, pos, neg = _grouped_counts(y, s, w)
+        tp = (w * (y * pred)).sum(axis=-1)
+        tn = (w * ((1 - y) * (1 - pred))).sum(axis=-1)
+        p = (w * y).sum(axis=-1)
+        q = (w * (1 - y)).sum(axis=-1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return {
+                "auc": _auc_from_counts(pos, neg),
+                f"sensitivity@{specificity:.2f}spec": _sens_at_spec_from_counts(pos, neg, specificity),
+                "sensitivity": np.where(p > 0, tp / p, np.nan),
+                "specificity": np.where(q > 0, tn / q, np.nan),
+                "accuracy": (tp + tn) / w.sum(axis=-1),
+            }
+
+    point = metrics(np.ones((1, n)))
+    samples = {k: [] for k in point}
+    for start in range(0, n_boot, chunk):
+        w = rng.multinomial(n, np.full(n, 1.0 / n), size=min(chunk, n_boot - start)).astype(np.float64)
+        for k, v in metrics(w).items():
+            samples[k].append(v)
+
+    out = {}
+    for k, v in samples.items():
+        v = np.concatenate(v)
+        lo, hi = np.nanpercentile(v, [100 * alpha / 2, 100 * (1 - alpha / 2)])
+        out[k] = (float(point[k][0]), float(lo), float(hi))
+    return out
+
+
+# ----------------------------------------
+# Streaming accumulation
+# ----------------------------------------
+
+class StreamingBinaryEvaluator:
+    """
+    Accumulates binary metrics batch by batch in O(bins) memory: confusion
+    counts at a fixed threshold plus per-class score histograms, from which
+    AUC and sensitivity@specificity are computed at the end (exact up to
+    the histogram bin width). Evaluators from several workers can be merged.
+    """
+
+    def __init__(self, threshold=0.5, bins=1000):
+        self.threshold = threshold
+        self.bins = bins
+        self.cm = np.zeros((2, 2), dtype=np.int64)
+        self.pos_hist = np.zeros(bins, dtype=np.int64)
+        self.neg_hist = np.zeros(bins, dtype=np.int64)
+
+    def update(self, y_true, scores):
+        y = np.asarray(y_true, dtype=np.int64).ravel()
+        s = np.asarray(scores, dtype=np.float64).ravel()
+        self.cm += confusion_matrix(y, (s > self.threshold).astype(np.int64), num_classes=2)
+        idx = np.clip((s * self.bins).astype(np.int64), 0, self.bins - 1)
+        self.pos_hist += np.bincount(idx[y == 1], minlength=self.bins)
+        self.neg_hist += np.bincount(idx[y == 0], minlength=self.bins)
+
+    def merge(self, other):
+        self.cm += other.cm
+        self.pos_hist += other.pos_hist
+        self.neg_hist += other.neg_hist
+        return self
+
+    @property
+    def count(self):
+        return int(self.cm.sum())
+
+    def auc(self):
+        return float(_auc_from_counts(self.pos_hist, self.neg_hist))
+
+    def sensitivity_at_specificity(self, specificity=0.9):
+        return float(_sens_at_spec_from_counts(self.pos_hist, self.neg_hist, specificity))
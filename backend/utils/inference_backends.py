@@ -0,0 +1,133 @@
+"""inference_backends.py — pluggable model runtimes for serving
+Every backend exposes the same surface the /predict code path already uses:
+  - predict(x, verbose=0) -> np.ndarray   (x: float32 NHWC batch in [0, 1])
+  - input_shape                           ((None, H, W, C), like Keras)
+  - name                                  ("keras" | "tflite" | "onnx")
+The Keras backend can also return the pooled backbone features from the same
+forward pass (predict_with_embedding) for the similar-case index.
+Heavy runtimes are imported lazily, so an ONNX or TFLite deployment never
+imports full TensorFlow.
+"""
+
+import os
+import logging
+import numpy as np
+
+from utils.tflite_runtime import InterpreterPool, exported_model_path
+from utils.runtime_config import configure_tensorflow
+
+logger = logging.getLogger("shwasnetra.inference")
+
+BACKENDS = ("keras", "tflite", "onnx")
+
+
+def backend_config_from_env():
+    """Serving configuration read once from the environment."""
+    return {
+        "backend": os.getenv("SERVING_BACKEND", "keras").strip().lower(),
+        "tflite_variant": os.getenv("TFLITE_VARIANT", "int8").strip(),
+        "tflite_pool_size": int(os.getenv("TFLITE_POOL_SIZE", "2")),
+        "tflite_threads": int(os.getenv("TFLITE_THREADS", "1")),
+        # 0 = runtime default; otherwise follows the worker layout from utils/runtime_config.py
+        "onnx_intra_threads": int(os.getenv("ONNX_INTRA_OP_THREADS", os.getenv("INTRA_OP_THREADS", "0"))),
+        "onnx_inter_threads": int(os.getenv("ONNX_INTER_OP_THREADS", os.getenv("INTER_OP_THREADS", "0"))),
+    }
+
+
+class KerasBackend:
+    name = "keras"
+
+    def __init__(self, model_path):
+        import tensorflow as tf
+        configure_tensorflow(tf)
+        self.tf = tf
+        self.model = tf.keras.models.load_model(model_path)
+        self.input_shape = tuple(self.model.input_shape)
+        self._embedding_model = None
+
+    def predict(self, x, verbose=0):
+        return self.model.predict(x, verbose=verbose)
+
+    def embedding_layer(self):
+        """The last global pooling layer (MobileNetV2 -> GlobalAveragePooling2D), or None."""
+        for layer in reversed(self.model.layers):
+            if "GlobalAveragePooling" in type(layer).__name__ or "GlobalMaxPooling" in type(layer).__name__:
+                return layer
+        return None
+
+    def predict_with_embedding(self, x):
+        """(predictions, pooled features) from one forward pass; features are None without a pooling layer."""
+        if self._embedding_model is None:
+            layer = self.embedding_layer()
+            if layer is None:
+                return self.predict(x), None
+            self._embedding_model = self.tf.keras.Model(self.model.inputs, [self.model.output, layer.output])
+        preds, features = self._embedding_model(x, training=False)
+        return np.asarray(preds), np.asarray(features, dtype=np.float32)
+
+
+class TFLiteBackend(InterpreterPool):
+    name = "tflite"
+
+
+class OnnxBackend:
+    name = "onnx"
+
+    def __init__(self, model_path, intra_threads=0, inter_threads=0):
+        import onnxruntime as ort
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        opts.intra_op_num_threads = intra_threads
+        opts.inter_op_num_threads = inter_threads
+        self.session = ort.InferenceSession(model_path, sess_options=opts, providers=["CPUExecutionProvider"])
+        inp = self.session.get_inputs()[0]
+        self.input_name = inp.name
+        self.input_shape = (None, *[d if isinstance(d, int) else None for d in inp.shape[1:]])
+
+    def predict(self, x, verbose=0):
+        # InferenceSession.run is thread-safe; no pool needed
+        return self.session.run(None, {self.input_name: np.asarray(x, dtype=np.float32)})[0]
+
+
+def artifact_path(keras_path, backend, config):
+    if backend == "tflite":
+        return exported_model_path(keras_path, config["tflite_variant"])
+    if backend == "onnx":
+        return exported_model_path(keras_path, "model", ext="onnx")
+    return keras_path
+
+
+def load_backend(keras_path, config=None):
+    """
+    Load `keras_path` with the configured backend, falling back to Keras when the
+    exported artifact is missing or fails to load. Returns None if nothing loads.
+    """
+    config = config or backend_config_from_env()
+    backend = config["backend"] if config["backend"] in BACKENDS else "keras"
+
+    if backend != "keras":
+        path = artifact_path(keras_path, backend, config)
+        if os.path.exists(path):
+            try:
+                if backend == "tflite":
+                    model = TFLiteBackend(path, size=config["tflite_pool_size"], num_threads=config["tflite_threads"])
+                else:
+                    model = OnnxBackend(path, config["onnx_intra_threads"], config["onnx_inter_threads"])
+                logger.info(f"[model] {backend} ready: {path} input_shape={model.input_shape}")
+                return model
+            except Exception as e:
+                logger.exception(f"[model] failed to load {backend} {path}: {e}")
+        logger.warning(f"[model] no usable {backend} export for {keras_path}; falling back to keras")
+
+    try:
+        if not os.path.exists(keras_path):
+            logger.info(f"[model] not found: {keras_path}")
+            return None
+        logger.info(f"[model] loading: {keras_path}")
+        model = KerasBackend(keras_path)
+        logger.info(f"[model] loaded: {keras_path} input_shape={model.input_shape}")
+        return model
+    except Exception as e:
+        logger.exception(f"[model] failed to load {keras_path}: {e}")
+        return None
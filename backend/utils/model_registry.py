@@ -0,0 +1,389 @@
+"""model_registry.py — versioned model artifacts and hot swapping in the serving process
+Registry layout (MODEL_REGISTRY_DIR, default model_training/registry):
+
+    manifest.json
+    <role>/<version>/<artifact>.keras        (+ exported/ from export_models.py)
+
+manifest.json records, per role ("main", "chest_filter"), every registered
+version with its metadata and which version is `active` and which, if any,
+is the `shadow` candidate. The manifest is the source of truth shared by all
+gunicorn workers: each worker's ManifestWatcher notices a changed manifest
+and loads the new version itself.
+
+    python -m utils.model_registry register main v2 path/to/model.keras --notes "retrained"
+    python -m utils.model_registry shadow main v2      # compare on live traffic
+    python -m utils.model_registry activate main v2    # every worker swaps within a few seconds
+
+HotSwapModel is what the cascade holds instead of a bare backend:
+  - swap() loads and warms a version on a background thread and then
+    replaces the served model with a single reference assignment; requests
+    already running finish on the model they started with, nothing is dropped;
+  - a shadow version sees a copy of live batches on its own thread (and is
+    skipped while it is still busy), and its agreement with the served model
+    and its latency are recorded, but its output is never returned;
+  - every predict is timed per (role, version, primary|shadow);
+  - a version that fails to load is retried with exponential backoff while
+    the previous version keeps serving (status "failed", with `serving` and
+    `retry_at`), so a transient error does not need a new manifest write.
+"""
+
+import os
+import json
+import time
+import shutil
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+from utils.inference_backends import load_backend
+from utils.serving_metrics import REGISTRY, MODEL_LOADED, record_model
+
+logger = logging.getLogger("shwasnetra.registry")
+RETRY_BASE_SECONDS, RETRY_MAX_SECONDS = 15, 600  # backoff between loads of a version that failed
+
+MANIFEST = "manifest.json"
+
+MODEL_SECONDS = REGISTRY.histogram("shwasnetra_model_seconds", "Model predict latency per version",
+                                   ["role", "version", "mode"])
+ACTIVE_VERSION = REGISTRY.gauge("shwasnetra_model_active", "1 for the version currently served", ["role", "version"])
+SHADOW_AGREEMENT = REGISTRY.counter("shwasnetra_shadow_predictions_total",
+                                    "Shadow predictions by agreement with the served model",
+                                    ["role", "version", "agree"])
+
+
+class ModelRegistry:
+    def __init__(self, root):
+        self.root = root
+        self.path = os.path.join(root, MANIFEST)
+        self._lock = threading.Lock()
+
+    def manifest(self):
+        if not os.path.exists(self.path):
+            return {"roles": {}}
+        with open(self.path) as f:
+            return json.load(f)
+
+    def _write(self, manifest):
+        os.makedirs(self.root, exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)  # readers see the old or the new manifest, never half of one
+
+    def _update(self, fn):
+        with self._lock:
+            manifest = self.manifest()
+            fn(manifest)
+            self._write(manifest)
+            return manifest
+
+    def register(self, role, version, artifact, copy=True, **metadata):
+        """Add `artifact` as role/version (copied into the registry unless copy=False)."""
+        path = os.path.abspath(artifact)
+        if copy:
+            target_dir = os.path.join(self.root, role, version)
+            os.makedirs(target_dir, exist_ok=True)
+            path = os.path.join(target_dir, os.path.basename(artifact))
+            shutil.copy2(artifact, path)
+
+        def add(manifest):
+            entry = manifest["roles"].setdefault(role, {"active": None, "shadow": None, "versions": {}})
+            entry["versions"][version] = dict(metadata, path=os.path.relpath(path, self.root),
+                                              registered_at=datetime.utcnow().isoformat())
+            if entry["active"] is None:
+                entry["active"] = version
+        return self._update(add)
+
+    def _set(self, role, key, version):
+        def set_pointer(manifest):
+            entry = manifest["roles"].get(role)
+            if entry is None or (version is not None and version not in entry["versions"]):
+                raise KeyError(f"Unknown model {role}/{version}")
+            entry[key] = version
+        return self._update(set_pointer)
+
+    def activate(self, role, version):
+        return self._set(role, "active", version)
+
+    def set_shadow(self, role, version):
+        """Shadow-evaluate `version` on live traffic (None stops shadowing)."""
+        return self._set(role, "shadow", version)
+
+    def resolve(self, role, version):
+        """Absolute artifact path of role/version, or None."""
+        entry = self.manifest()["roles"].get(role, {})
+        info = entry.get("versions", {}).get(version)
+        return os.path.join(self.root, info["path"]) if info else None
+
+    def pointers(self, role):
+        entry = self.manifest()["roles"].get(role, {})
+        return entry.get("active"), entry.get("shadow")
+
+
+class _VersionStats:
+    """Recent latencies of one served or shadow version (the histograms keep the long-run view)."""
+
+    def __init__(self, window=512):
+        self.latencies_ms = deque(maxlen=window)
+        self.count = 0
+        self.rows = 0  # shadow only: compared predictions (batches hold several)
+        self.agree = 0
+        self.abs_diff = 0.0
+
+    def summary(self):
+        lat = np.asarray(self.latencies_ms) if self.latencies_ms else None
+        return {
+            "count": self.count,
+            "p50_ms": None if lat is None else round(float(np.percentile(lat, 50)), 3),
+            "p95_ms": None if lat is None else round(float(np.percentile(lat, 95)), 3),
+            "mean_ms": None if lat is None else round(float(lat.mean()), 3),
+        }
+
+
+class HotSwapModel:
+    """A backend-shaped proxy (predict / input_shape / name) whose model can be replaced live."""
+
+    def __init__(self, role, model=None, version="default", config=None, warmup_runs=3):
+        self.role = role
+        self.config = config
+        self.warmup_runs = warmup_runs
+        self._current = (version, model) if model is not None else (None, None)
+        self._shadow = (None, None)
+        self._shadow_busy = threading.Lock()
+        self._swap_lock = threading.Lock()
+        self._failures = {}  # version -> consecutive failed loads
+        self.stats = {}
+        self.status = {"state": "ready" if model is not None else "empty", "version": self.version, "error": None}
+        if model is not None:
+            ACTIVE_VERSION.set(1, role=role, version=version)
+
+    # ---- backend surface ----
+    @property
+    def version(self):
+        return self._current[0]
+
+    @property
+    def model(self):
+        return self._current[1]
+
+    @property
+    def input_shape(self):
+        return getattr(self.model, "input_shape", None)
+
+    @property
+    def name(self):
+        return getattr(self.model, "name", None)
+
+    def __bool__(self):
+        return self.model is not None
+
+    def _timed(self, version, mode, fn):
+        start = time.perf_counter()
+        out = fn()
+        elapsed = time.perf_counter() - start
+        MODEL_SECONDS.observe(elapsed, role=self.role, version=version, mode=mode)
+        stats = self.stats.setdefault((version, mode), _VersionStats())
+        stats.latencies_ms.append(elapsed * 1000.0)
+        stats.count += 1
+        return out
+
+    def predict(self, x, verbose=0):
+        version, model = self._current  # one read: a concurrent swap cannot split this request
+        preds = self._timed(version, "primary", lambda: model.predict(x, verbose=verbose))
+        self._shadow_predict(x, preds)
+        return preds
+
+    def predict_with_embedding(self, x):
+        version, model = self._current
+        if not hasattr(model, "predict_with_embedding"):
+            return self.predict(x), None
+        preds, features = self._timed(version, "primary", lambda: model.predict_with_embedding(x))
+        self._shadow_predict(x, preds)
+        return preds, features
+
+    # ---- shadow evaluation ----
+    def _shadow_predict(self, x, primary):
+        version, model = self._shadow
+        if model is None or not self._shadow_busy.acquire(blocking=False):
+            return  # no candidate, or it is still on the previous batch: never queue behind live traffic
+        threading.Thread(target=self._run_shadow, args=(version, model, np.array(x), np.asarray(primary)),
+                         name=f"shadow-{self.role}", daemon=True).start()
+
+    def _run_shadow(self, version, model, x, primary):
+        try:
+            preds = np.asarray(self._timed(version, "shadow", lambda: model.predict(x, verbose=0)))
+            if preds.shape == primary.shape:
+                rows_p, rows_s = primary.reshape(len(x), -1), preds.reshape(len(x), -1)
+                if rows_p.shape[1] == 1:
+                    agree = (rows_p[:, 0] > 0.5) == (rows_s[:, 0] > 0.5)
+                else:
+                    agree = rows_p.argmax(axis=1) == rows_s.argmax(axis=1)
+                stats = self.stats[(version, "shadow")]
+                stats.rows += len(agree)
+                stats.agree += int(agree.sum())
+                stats.abs_diff += float(np.abs(rows_p - rows_s).mean(axis=1).sum())
+                for a in agree:
+                    SHADOW_AGREEMENT.inc(role=self.role, version=version, agree=str(bool(a)).lower())
+        except Exception as e:
+            logger.warning(f"[registry] shadow {self.role}/{version} failed: {e}")
+        finally:
+            self._shadow_busy.release()
+
+    # ---- loading & swapping ----
+    def _load(self, version, path):
+        model = load_backend(path, self.config)
+        if model is None:
+            raise RuntimeError(f"could not load {path}")
+        current = self.input_shape
+        if current is not None and tuple(model.input_shape[1:]) != tuple(current[1:]):
+            raise ValueError(f"{self.role}/{version} expects input {model.input_shape}, serving uses {current}")
+        shape = [d or 1 for d in model.input_shape]
+        x = np.zeros(shape, dtype=np.float32)
+        for _ in range(self.warmup_runs):  # graph tracing / allocator warm-up happen here, not on a live request
+            model.predict(x, verbose=0)
+        return model
+
+    def wants(self, version):
+        """False while `version` is loading, or failed and still inside its retry backoff."""
+        status = self.status
+        if status.get("version") != version:
+            return True
+        if status["state"] == "loading":
+            return False
+        if status["state"] == "failed":
+            return time.time() >= status.get("retry_at", 0)
+        return True
+
+    def swap(self, version, path, shadow=False, background=True):
+        """Load, warm and then serve (or shadow) `version`; returns the loader thread when backgrounded."""
+        def run():
+            with self._swap_lock:
+                self.status = {"state": "loading", "version": version, "shadow": shadow, "error": None}
+                try:
+                    model = self._load(version, path)
+                except Exception as e:
+                    attempts = self._failures[version] = self._failures.get(version, 0) + 1
+                    delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+                    logger.exception(f"[registry] {self.role}/{version} failed to load (attempt {attempts}, "
+                                     f"retry in {delay:.0f}s; still serving {self.version}): {e}")
+                    self.status = {"state": "failed", "version": version, "shadow": shadow, "error": str(e),
+                                   "serving": self.version, "attempts": attempts, "retry_at": time.time() + delay}
+                    return
+                self._failures.pop(version, None)
+                if shadow:
+                    self._shadow = (version, model)
+                else:
+                    previous, previous_backend = self.version, self.name
+                    self._current = (version, model)  # atomic: the next request uses the new version
+                    if previous is not None:
+                        ACTIVE_VERSION.set(0, role=self.role, version=previous)
+                    ACTIVE_VERSION.set(1, role=self.role, version=version)
+                    record_model(self.role, self)
+                    if previous_backend and previous_backend != self.name:
+                        MODEL_LOADED.set(0, model=self.role, backend=previous_backend)
+                    if self._shadow[0] == version:
+                        self._shadow = (None, None)
+                logger.info(f"[registry] {self.role} {'shadowing' if shadow else 'serving'} {version}")
+                self.status = {"state": "ready", "version": self.version, "shadow": self._shadow[0], "error": None}
+
+        if self.status.get("version") == version and self.status["state"] == "loading":
+            return None  # already on its way
+        self.status = {"state": "loading", "version": version, "shadow": shadow, "error": None}
+        if not background:
+            run()
+            return None
+        thread = threading.Thread(target=run, name=f"swap-{self.role}", daemon=True)
+        thread.start()
+        return thread
+
+    def stop_shadow(self):
+        self._shadow = (None, None)
+
+    def describe(self):
+        versions = {}
+        for (version, mode), stats in list(self.stats.items()):
+            entry = dict(stats.summary())
+            if mode == "shadow" and stats.rows:
+                entry["agreement"] = round(stats.agree / stats.rows, 4)
+                entry["mean_abs_diff"] = round(stats.abs_diff / stats.rows, 6)
+            versions.setdefault(version, {})[mode] = entry
+        return {"role": self.role, "serving": self.version, "shadow": self._shadow[0],
+                "status": self.status, "versions": versions}
+
+
+class ManifestWatcher:
+    """Polls the manifest and brings this worker's HotSwapModels in line with it."""
+
+    def __init__(self, registry, models, interval=5.0):
+        self.registry = registry
+        self.models = models  # role -> HotSwapModel
+        self.interval = interval
+        self._mtime = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sync(self, background=True):
+        try:
+            mtime = os.path.getmtime(self.registry.path)
+        except OSError:
+            return
+        retry_due = any(m.status.get("state") == "failed" and m.wants(m.status.get("version"))
+                        for m in self.models.values())
+        if mtime == self._mtime and not retry_due:
+            return
+        self._mtime = mtime
+        for role, model in self.models.items():
+            active, shadow = self.registry.pointers(role)
+            if active and active != model.version and model.wants(active):
+                path = self.registry.resolve(role, active)
+                if path:
+                    model.swap(active, path, background=background)
+            if shadow != model._shadow[0] and model.wants(shadow):
+                if shadow is None:
+                    model.stop_shadow()
+                elif shadow != active:
+                    path = self.registry.resolve(role, shadow)
+                    if path:
+                        model.swap(shadow, path, shadow=True, background=background)
+
+    def start(self):
+        def run():
+            while not self._stop.wait(self.interval):
+                self.sync()
+        self._thread = threading.Thread(target=run, name="manifest-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Manage the serving model registry.")
+    parser.add_argument("--root", default=os.getenv("MODEL_REGISTRY_DIR", os.path.join("model_training", "registry")))
+    sub = parser.add_subparsers(dest="command", required=True)
+    reg = sub.add_parser("register")
+    reg.add_argument("role")
+    reg.add_argument("version")
+    reg.add_argument("artifact")
+    reg.add_argument("--notes", default="")
+    reg.add_argument("--no-copy", action="store_true", help="reference the artifact where it is")
+    for name in ("activate", "shadow"):
+        cmd = sub.add_parser(name)
+        cmd.add_argument("role")
+        cmd.add_argument("version", nargs="?" if name == "shadow" else None)
+    sub.add_parser("list")
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.root)
+    if args.command == "register":
+        registry.register(args.role, args.version, args.artifact, copy=not args.no_copy, notes=args.notes)
+    elif args.command == "activate":
+        registry.activate(args.role, args.version)
+    elif args.command == "shadow":
+        registry.set_shadow(args.role, args.version)
+    print(json.dumps(registry.manifest(), indent=2))
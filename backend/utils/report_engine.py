@@ -0,0 +1,291 @@
+"""report_engine.py — PDF diagnostic reports
+Builds the same report /download_report always produced, but:
+  - layout (positions, wrap widths, fonts) is computed once per process, and
+    the static page furniture (title, rules, footer) is drawn once per document
+    as a reportlab form and stamped onto every page;
+  - the AI explanation is word-wrapped and flows onto further pages;
+  - the Grad-CAM image is embedded from memory (primed by /predict, else read
+    once from static/heatmaps and kept in an LRU);
+  - identical payloads within REPORT_CACHE_TTL seconds return the cached PDF
+    (REPORT_CACHE_TTL=0 turns the cache off);
+  - render_batch() renders many reports into one multi-page PDF or a zip,
+    rendering the zip entries in a worker pool (threads by default;
+    REPORT_POOL=process uses spawned processes, which sidesteps the GIL but
+    costs a process start per pool worker).
+"""
+
+import io
+import os
+import json
+import time
+import base64
+import hashlib
+import zipfile
+import threading
+import multiprocessing
+from collections import OrderedDict
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader, simpleSplit
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+PAGE_W, PAGE_H = A4
+MARGIN = 50
+TITLE = "ShwasNetra AI Diagnostic Report"
+DISCLAIMER = "AI-assisted screening result. Must be reviewed by a qualified healthcare professional."
+GRADCAM_BOX = (220, 220)  # max width/height of the embedded heatmap, points
+TEMPLATE_FORM = "shwasnetra_page"
+
+
+class LRUCache:
+    """Thread-safe LRU bounded by entry count and total bytes, with an optional TTL (None = never expire)."""
+
+    def __init__(self, max_entries=128, max_bytes=64 * 1024 * 1024, ttl=None):
+        self.max_entries, self.max_bytes, self.ttl = max_entries, max_bytes, ttl
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or (self.ttl is not None and time.monotonic() - item[1] > self.ttl):
+                if item is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, value):
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                self._drop(key)
+            self._items[key] = (value, time.monotonic())
+            self._bytes += size
+            while len(self._items) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._items)))
+
+    def _drop(self, key):
+        value, _ = self._items.pop(key)
+        self._bytes -= len(value)
+
+
+# -------------------------
+# Fonts & layout (once per process)
+# -------------------------
+_FONTS = None
+
+
+def fonts():
+    """(regular, bold) font names; a TTF from REPORT_FONT / REPORT_FONT_BOLD is registered once."""
+    global _FONTS
+    if _FONTS is None:
+        regular, bold = "Helvetica", "Helvetica-Bold"
+        path, bold_path = os.getenv("REPORT_FONT"), os.getenv("REPORT_FONT_BOLD")
+        if path and os.path.exists(path):
+            pdfmetrics.registerFont(TTFont("ReportSans", path))
+            regular = bold = "ReportSans"
+            if bold_path and os.path.exists(bold_path):
+                pdfmetrics.registerFont(TTFont("ReportSans-Bold", bold_path))
+                bold = "ReportSans-Bold"
+        _FONTS = (regular, bold)
+    return _FONTS
+
+
+class Layout:
+    def __init__(self):
+        self.regular, self.bold = fonts()
+        self.text_width = PAGE_W - 2 * MARGIN - 10
+        self.title_y = PAGE_H - 60
+        self.rule_y = PAGE_H - 75
+        self.first_line_y = PAGE_H - 100
+        self.continuation_y = PAGE_H - 100
+        self.bottom_y = MARGIN + 30
+        self.leading = 14
+
+
+_LAYOUT = None
+
+
+def layout():
+    global _LAYOUT
+    if _LAYOUT is None:
+        _LAYOUT = Layout()
+    return _LAYOUT
+
+
+def _define_template(c, lay):
+    """Static page furniture, drawn once per document and reused on every page."""
+    c.beginForm(TEMPLATE_FORM)
+    c.setFont(lay.bold, 18)
+    c.drawCentredString(PAGE_W / 2, lay.title_y, TITLE)
+    c.setLineWidth(0.5)
+    c.line(MARGIN, lay.rule_y, PAGE_W - MARGIN, lay.rule_y)
+    c.line(MARGIN, MARGIN + 15, PAGE_W - MARGIN, MARGIN + 15)
+    c.setFont(lay.regular, 8)
+    c.drawString(MARGIN, MARGIN, DISCLAIMER)
+    c.endForm()
+
+
+# -------------------------
+# Rendering
+# -------------------------
+_IMAGES = LRUCache(max_entries=64, max_bytes=32 * 1024 * 1024)
+
+
+def remember_image(name, data):
+    """Prime the in-memory Grad-CAM cache (called by /predict right after writing the file)."""
+    _IMAGES.put(os.path.basename(name), data)
+
+
+def _gradcam_bytes(result, static_dir):
+    if result.get("gradcam_image"):
+        return base64.b64decode(result["gradcam_image"])
+    name = os.path.basename(result.get("gradcam") or "")
+    if not name:
+        return None
+    data = _IMAGES.get(name)
+    if data is None and static_dir:
+        path = os.path.join(static_dir, name)
+        if os.path.isfile(path):
+            with open(path, "rb") as f:
+                data = f.read()
+            _IMAGES.put(name, data)
+    return data
+
+
+def _draw_report(c, payload, static_dir, lay):
+    patient = payload.get("patient", {}) or {}
+    result = payload.get("result", {}) or {}
+    explanation = payload.get("ai_explanation", "") or ""
+    generated = payload.get("generated_at") or datetime.utcnow().strftime('%Y-%m-%d %H:%M UTC')
+
+    c.doForm(TEMPLATE_FORM)
+    y = lay.first_line_y
+    c.setFont(lay.regular, 12)
+    c.drawString(MARGIN, y, f"Date: {generated}")
+    y -= 40
+    c.drawString(MARGIN, y, f"Age: {patient.get('age','N/A')}  Gender: {patient.get('gender','N/A')}")
+    y -= 20
+    c.drawString(MARGIN, y, f"Smoking: {patient.get('smoking','N/A')}  Cough: {patient.get('cough','N/A')}")
+    y -= 30
+    c.drawString(MARGIN, y, f"Result: {result.get('result','N/A')}  Confidence: {result.get('confidence','N/A')}%")
+    y -= 20
+
+    image = _gradcam_bytes(result, static_dir)
+    if image:
+        try:
+            reader = ImageReader(io.BytesIO(image))
+            iw, ih = reader.getSize()
+            scale = min(GRADCAM_BOX[0] / iw, GRADCAM_BOX[1] / ih)
+            w, h = iw * scale, ih * scale
+            c.drawImage(reader, MARGIN, y - h, width=w, height=h)
+            y -= h + 20
+        except Exception:
+            pass  # unreadable image: report without it
+
+    y -= 10
+    c.setFont(lay.bold, 14)
+    c.drawString(MARGIN, y, "AI Explanation:")
+    y -= 20
+    c.setFont(lay.regular, 11)
+    for paragraph in explanation.splitlines() or [""]:
+        for line in simpleSplit(paragraph, lay.regular, 11, lay.text_width) or [""]:
+            if y < lay.bottom_y:
+                c.showPage()
+                c.doForm(TEMPLATE_FORM)
+                c.setFont(lay.regular, 11)
+                y = lay.continuation_y
+            c.drawString(MARGIN + 10, y, line)
+            y -= lay.leading
+    c.showPage()
+
+
+def render_pdf(payloads, static_dir=None):
+    """One PDF containing every payload's report (each starting on a new page)."""
+    lay = layout()
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4, pageCompression=1)
+    c.setTitle(TITLE)
+    _define_template(c, lay)
+    for payload in payloads:
+        _draw_report(c, payload, static_dir, lay)
+    c.save()
+    return buffer.getvalue()
+
+
+def _render_one(args):
+    payload, static_dir = args
+    return render_pdf([payload], static_dir)
+
+
+class ReportEngine:
+    def __init__(self, static_dir, cache_entries=256, cache_ttl=300, workers=None, pool="thread"):
+        self.static_dir = static_dir
+        self.pool_kind = pool
+        # cache_ttl=0 disables caching; None keeps entries until they are evicted
+        self.cache = None if cache_ttl == 0 else LRUCache(max_entries=cache_entries, ttl=cache_ttl)
+        self.workers = workers or max(1, min(4, (os.cpu_count() or 2) // 2))
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        layout()  # fonts and layout resolved up front, not on the first request
+
+    def cache_key(self, payload):
+        canonical = {k: v for k, v in payload.items() if k != "generated_at"}
+        return hashlib.sha256(json.dumps(canonical, sort_keys=True, default=str).encode()).hexdigest()
+
+    def render(self, payload):
+        """PDF bytes for one report; identical payloads are served from the cache."""
+        if self.cache is None:
+            return render_pdf([payload], self.static_dir)
+        key = self.cache_key(payload)
+        pdf = self.cache.get(key)
+        if pdf is None:
+            pdf = render_pdf([payload], self.static_dir)
+            self.cache.put(key, pdf)
+        return pdf
+
+    def _executor(self):
+        with self._pool_lock:
+            if self._pool is None:
+                if self.pool_kind == "process":
+                    # spawn, not fork: the serving process already runs model threads
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context("spawn"))
+                else:
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="report")
+            return self._pool
+
+    def render_batch(self, payloads, fmt="zip"):
+        """Many reports as one multi-page PDF (fmt='pdf') or a zip of per-patient PDFs."""
+        if fmt == "pdf":
+            return render_pdf(payloads, self.static_dir)
+
+        pdfs = [self.cache.get(self.cache_key(p)) if self.cache else None for p in payloads]
+        missing = [i for i, pdf in enumerate(pdfs) if pdf is None]
+        if len(missing) > 1 and self.workers > 1:
+            rendered = self._executor().map(_render_one, [(payloads[i], self.static_dir) for i in missing])
+        else:
+            rendered = (render_pdf([payloads[i]], self.static_dir) for i in missing)
+        for i, pdf in zip(missing, rendered):
+            pdfs[i] = pdf
+            if self.cache is not None:
+                self.cache.put(self.cache_key(payloads[i]), pdf)
+
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as zf:  # PDFs are already compressed
+            for i, (payload, pdf) in enumerate(zip(payloads, pdfs), 1):
+                patient_id = str((payload.get("patient") or {}).get("id") or i)
+                safe_id = "".join(ch for ch in patient_id if ch.isalnum() or ch in "-_") or str(i)
+                zf.writestr(f"ShwasNetra_Report_{i:03d}_{safe_id}.pdf", pdf)
+        return buffer.getvalue()
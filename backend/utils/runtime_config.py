@@ -0,0 +1,85 @@
+"""runtime_config.py — CPU thread layout for inference workers
+Every gunicorn worker runs its own TensorFlow / ONNX Runtime / TFLite thread
+pools. Left at their defaults each pool sizes itself to the whole machine, so
+N workers oversubscribe the CPU N times over. This module derives one layout
+from the environment and applies it per worker:
+
+  WEB_CONCURRENCY        gunicorn workers            (default: cores // 4, at least 1)
+  INTRA_OP_THREADS       threads inside one op       (default: cores // workers)
+  INTER_OP_THREADS       ops run concurrently        (default: 1)
+  CPU_AFFINITY           "none" | "spread"           (spread: pin worker i to its own slice of cores)
+
+Thread counts must be set before a runtime creates its pools, so
+apply_thread_config() runs in gunicorn's post_fork hook (gunicorn.conf.py)
+and again, harmlessly, at app import for `python app.py`.
+"""
+
+import os
+import logging
+
+logger = logging.getLogger("shwasnetra.runtime")
+
+# Read by TensorFlow, OpenMP/MKL and numpy's BLAS when their pools start
+_THREAD_ENV = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+
+def available_cores():
+    """Cores this process may run on (respects cgroup/taskset restrictions)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on macOS / Windows
+        return os.cpu_count() or 1
+
+
+def thread_config_from_env(cores=None):
+    cores = cores or available_cores()
+    workers = int(os.getenv("WEB_CONCURRENCY", "0")) or max(1, cores // 4)
+    intra = int(os.getenv("INTRA_OP_THREADS", "0")) or max(1, cores // workers)
+    return {
+        "cores": cores,
+        "workers": workers,
+        "intra_op_threads": intra,
+        "inter_op_threads": int(os.getenv("INTER_OP_THREADS", "1")),
+        "cpu_affinity": os.getenv("CPU_AFFINITY", "none").strip().lower(),
+    }
+
+
+def worker_cpus(config, slot):
+    """The cores worker `slot` is pinned to under CPU_AFFINITY=spread."""
+    cpus = sorted(os.sched_getaffinity(0))
+    per_worker = max(1, len(cpus) // config["workers"])
+    start = (slot % config["workers"]) * per_worker
+    return set(cpus[start:start + per_worker]) or set(cpus)
+
+
+def apply_thread_config(config=None, slot=None):
+    """
+    Export the thread counts for runtimes that have not started yet and, when
+    `slot` is given and CPU_AFFINITY=spread, pin this process to its cores.
+    Explicitly set environment variables are left alone.
+    """
+    config = config or thread_config_from_env()
+    # pin the derived layout so later reads (after affinity shrinks the core count) agree
+    os.environ.setdefault("WEB_CONCURRENCY", str(config["workers"]))
+    os.environ.setdefault("INTRA_OP_THREADS", str(config["intra_op_threads"]))
+    os.environ.setdefault("INTER_OP_THREADS", str(config["inter_op_threads"]))
+    os.environ.setdefault("TF_NUM_INTRAOP_THREADS", str(config["intra_op_threads"]))
+    os.environ.setdefault("TF_NUM_INTEROP_THREADS", str(config["inter_op_threads"]))
+    for name in _THREAD_ENV:
+        os.environ.setdefault(name, str(config["intra_op_threads"]))
+
+    if slot is not None and config["cpu_affinity"] == "spread" and hasattr(os, "sched_setaffinity"):
+        cpus = worker_cpus(config, slot)
+        os.sched_setaffinity(0, cpus)
+        logger.info(f"[runtime] worker slot {slot} pinned to cpus {sorted(cpus)}")
+    return config
+
+
+def configure_tensorflow(tf, config=None):
+    """Apply the layout to TensorFlow's own pools; a no-op once TF has initialized them."""
+    config = config or thread_config_from_env()
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(config["intra_op_threads"])
+        tf.config.threading.set_inter_op_parallelism_threads(config["inter_op_threads"])
+    except RuntimeError as e:
+        logger.warning(f"[runtime] TensorFlow threads already initialized: {e}")
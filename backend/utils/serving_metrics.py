@@ -0,0 +1,190 @@
+"""serving_metrics.py — in-process Prometheus-style metrics
+Counters, gauges and histograms rendered in the Prometheus text exposition
+format by /metrics. No client library is needed: each metric is a dict of
+label tuples guarded by one lock, and observe() is a bisect plus two adds.
+
+Values are per process; with several gunicorn workers each scrape sees the
+worker that served it (the `pid` label on shwasnetra_process_info tells them
+apart), so scrape workers individually or aggregate with sum() in PromQL.
+"""
+
+import os
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+from utils.tracing import span
+
+# Seconds; covers sub-ms stages (decode of a small PNG) up to slow LLM calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _label_str(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [f"{self.name}{_label_str(self.labelnames, k)} {v}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def dec(self, amount=1.0, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][idx] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        with self._lock:
+            items = sorted((k, (list(s[0]), s[1], s[2])) for k, s in self._values.items())
+        lines = self._header()
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_label_str(self.labelnames, key, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_str(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_label_str(self.labelnames, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = cls(name, *args, **kwargs)
+            return self._metrics[name]
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(line for m in metrics for line in m.render()) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+PROCESS_INFO = REGISTRY.gauge("shwasnetra_process_info", "Serving process (one series per worker)", ["pid"])
+REQUESTS = REGISTRY.counter("shwasnetra_requests_total", "HTTP requests by endpoint and status", ["endpoint", "status"])
+REQUEST_SECONDS = REGISTRY.histogram("shwasnetra_request_seconds", "End-to-end request latency", ["endpoint"])
+INFLIGHT = REGISTRY.gauge("shwasnetra_inflight_requests", "Requests being handled by this worker", ["endpoint"])
+STAGE_SECONDS = REGISTRY.histogram("shwasnetra_stage_seconds", "Time spent per pipeline stage", ["endpoint", "stage"])
+MODEL_LOADED = REGISTRY.gauge("shwasnetra_model_loaded", "1 if the model loaded at startup", ["model", "backend"])
+PREDICTIONS = REGISTRY.counter("shwasnetra_predictions_total", "Predictions by returned label", ["label"])
+LLM_SECONDS = REGISTRY.histogram("shwasnetra_llm_seconds", "Chat provider call latency", ["provider", "outcome"])
+ADMISSIONS = REGISTRY.counter("shwasnetra_admissions_total", "Admission decisions by endpoint, lane and outcome",
+                              ["endpoint", "lane", "outcome"])
+ADMISSION_QUEUED = REGISTRY.gauge("shwasnetra_admission_queued", "Requests waiting for admission, by endpoint and lane",
+                                  ["endpoint", "lane"])
+ADMISSION_RUNNING = REGISTRY.gauge("shwasnetra_admission_running", "Admitted requests currently running, by endpoint",
+                                   ["endpoint"])
+DRIFT_SCORE = REGISTRY.gauge("shwasnetra_drift_score", "Input drift of the current window vs the reference", ["score"])
+
+
+@contextmanager
+def stage_timer(stage, endpoint="predict"):
+    """Record the duration of one pipeline stage in shwasnetra_stage_seconds (and as a trace span)."""
+    start = time.perf_counter()
+    try:
+        with span(stage):
+            yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint, stage=stage)
+
+
+def record_model(model_name, model):
+    # bool(): a HotSwapModel proxy is never None but is falsy while it holds no model
+    MODEL_LOADED.set(1 if model else 0, model=model_name, backend=getattr(model, "name", None) or "none")
+
+
+def record_admission(controllers, lanes):
+    """Queue depth per lane and running count of each AdmissionController; `lanes` maps lane name -> index."""
+    for name, controller in controllers.items():
+        state = controller.state()
+        ADMISSION_RUNNING.set(state["inflight"], endpoint=name)
+        for lane, index in lanes.items():
+            ADMISSION_QUEUED.set(state["queued"][index], endpoint=name, lane=lane)
+
+
+def render_metrics():
+    PROCESS_INFO.set(1, pid=os.getpid())  # the worker answering this scrape
+    return REGISTRY.render()
@@ -0,0 +1,277 @@
+"""similarity_index.py — similar-case retrieval over backbone embeddings
+Every classified upload's pooled MobileNetV2 features (returned by the Keras
+backend in the same forward pass as the prediction) are L2-normalised and
+inserted into an inverted-file (IVF) index, pure NumPy:
+  - until `train_after` cases exist, search is an exact scan (one matmul);
+  - after that, k-means centroids split the vectors into `n_lists` lists and
+    a query only scans the `n_probe` lists closest to it;
+  - inserts are incremental (nearest centroid, O(n_lists * dim)); the
+    centroids are retrained on a background thread, on a sample, whenever
+    the index has doubled since the last training.
+
+Storage is append-only in `root`: vectors.f32 (raw float32 rows) and
+cases.jsonl (one metadata line per row), so a restart reloads everything
+and a crash loses at most the case being written: the next insert cuts off
+a metadata line left without its newline, and lines that still cannot be
+parsed keep their row but are never returned. Row number = case id.
+"""
+
+import os
+import json
+import fcntl
+import logging
+import threading
+import numpy as np
+
+logger = logging.getLogger("shwasnetra.similarity")
+
+VECTORS_FILE = "vectors.f32"
+CASES_FILE = "cases.jsonl"
+
+
+def _normalize(x):
+    x = np.asarray(x, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
+
+
+def _parse_case(line):
+    try:
+        case = json.loads(line)
+    except ValueError:
+        return None
+    return case if isinstance(case, dict) and "dim" in case else None
+
+
+def kmeans(x, k, iters=10, seed=0):
+    """Spherical k-means on unit vectors; returns unit-norm centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = x[rng.choice(len(x), size=k, replace=False)]
+    for _ in range(iters):
+        assign = np.argmax(x @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, x)
+        counts = np.bincount(assign, minlength=k)
+        empty = counts == 0
+        sums[empty] = x[rng.choice(len(x), size=int(empty.sum()))]  # reseed empty lists
+        centroids = _normalize(sums)
+    return centroids
+
+
+class IVFIndex:
+    def __init__(self, dim, n_lists=64, n_probe=8, train_after=1024, train_sample=8192):
+        self.dim = dim
+        self.n_lists, self.n_probe = n_lists, n_probe
+        self.train_after, self.train_sample = train_after, train_sample
+        self._vectors = np.zeros((1024, dim), dtype=np.float32)
+        self.size = 0
+        self.centroids = None
+        self._lists = None   # list id -> np.ndarray of row ids
+        self._trained_at = 0
+        self._training = False
+        self._lock = threading.Lock()
+
+    @property
+    def vectors(self):
+        return self._vectors[:self.size]
+
+    def add(self, vector):
+        """Insert one embedding; returns its row id."""
+        v = _normalize(vector).reshape(-1)
+        with self._lock:
+            if self.size == len(self._vectors):
+                grown = np.zeros((2 * len(self._vectors), self.dim), dtype=np.float32)
+                grown[:self.size] = self._vectors[:self.size]
+                self._vectors = grown
+            row = self.size
+            self._vectors[row] = v
+            self.size += 1
+            if self.centroids is not None:
+                c = int(np.argmax(self.centroids @ v))
+                self._lists[c] = np.append(self._lists[c], row)
+            retrain = (not self._training and self.size >= self.train_after
+                       and self.size >= 2 * max(self._trained_at, self.train_after // 2))
+            if retrain:
+                self._training = True
+        if retrain:
+            threading.Thread(target=self.train, name="ivf-train", daemon=True).start()
+        return row
+
+    def add_many(self, vectors):
+        """Bulk load (e.g. on startup), then train once if large enough."""
+        vectors = _normalize(vectors).reshape(-1, self.dim)
+        with self._lock:
+            needed = self.size + len(vectors)
+            if needed > len(self._vectors):
+                grown = np.zeros((max(needed, 2 * len(self._vectors)), self.dim), dtype=np.float32)
+                grown[:self.size] = self._vectors[:self.size]
+                self._vectors = grown
+            self._vectors[self.size:needed] = vectors
+            self.size = needed
+        if self.size >= self.train_after:
+            self.train()
+
+    def train(self):
+        with self._lock:
+            n = self.size
+            self._training = True
+        try:
+            rng = np.random.default_rng(n)
+            data = self._vectors[:n]
+            sample = data[rng.choice(n, size=min(n, self.train_sample), replace=False)]
+            centroids = kmeans(sample, min(self.n_lists, len(sample)))
+            assign = np.argmax(data @ centroids.T, axis=1)
+            lists = [np.flatnonzero(assign == c) for c in range(len(centroids))]
+            with self._lock:
+                # rows inserted while training are assigned with the new centroids
+                if self.size > n:
+                    late = np.argmax(self._vectors[n:self.size] @ centroids.T, axis=1)
+                    for offset, c in enumerate(late):
+                        lists[c] = np.append(lists[c], n + offset)
+                self.centroids, self._lists, self._trained_at = centroids, lists, n
+        finally:
+            self._training = False
+
+    def search(self, vector, k=5, exclude=None):
+        """[(row id, cosine similarity)] of the k nearest stored vectors, best first."""
+        q = _normalize(vector).reshape(-1)
+        with self._lock:
+            size, centroids, lists = self.size, self.centroids, self._lists
+            vectors = self._vectors
+        if size == 0:
+            return []
+        if centroids is None:
+            candidates = np.arange(size)
+        else:
+            probe = np.argsort(-(centroids @ q))[:self.n_probe]
+            candidates = np.concatenate([lists[c] for c in probe])
+            candidates = candidates[candidates < size]
+        if exclude is not None:
+            candidates = candidates[candidates != exclude]
+        if len(candidates) == 0:
+            return []
+        scores = vectors[candidates] @ q
+        top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k] if len(scores) > k else np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return [(int(candidates[i]), float(scores[i])) for i in top]
+
+
+class SimilarCaseStore:
+    """
+    Persistent IVF index plus the case metadata (filename, prediction, confidence, ...).
+    Several gunicorn workers can share one root: appends happen under an
+    exclusive flock, and each worker picks up the others' cases from the
+    files before it writes or searches.
+    """
+
+    def __init__(self, root, dim=None, **index_kwargs):
+        self.root = root
+        self.index_kwargs = index_kwargs
+        self.index = IVFIndex(dim, **index_kwargs) if dim else None
+        self.cases = []
+        self._cases_offset = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self._cases_path = os.path.join(root, CASES_FILE)
+        self._vectors_path = os.path.join(root, VECTORS_FILE)
+        with self._lock:
+            self._catch_up()
+
+    def _catch_up(self):
+        """Load cases appended since the last read (by this or another worker)."""
+        if not os.path.exists(self._cases_path) or os.path.getsize(self._cases_path) == self._cases_offset:
+            return
+        with open(self._cases_path, "rb") as f:
+            f.seek(self._cases_offset)
+            lines = f.read().split(b"\n")[:-1]  # the last piece is empty or a line still being written
+        if not lines:
+            return
+        new = [_parse_case(line) for line in lines]
+        known = [case for case in new if case is not None]
+        dim = self.index.dim if self.index is not None else (known[0]["dim"] if known else None)
+        if dim is None:
+            return  # nothing readable yet to size the vector rows by
+        with open(self._vectors_path, "rb") as f:
+            f.seek(len(self.cases) * dim * 4)
+            raw = np.frombuffer(f.read(len(new) * dim * 4), dtype=np.float32)
+        rows = min(len(new), raw.size // dim)
+        if rows == 0:
+            return
+        self._cases_offset += sum(len(line) + 1 for line in lines[:rows])
+        for line, case in zip(lines[:rows], new[:rows]):
+            if case is None:
+                # the row keeps its place so later case ids still match their vectors
+                logger.warning(f"[similarity] skipping unreadable case {len(self.cases)}: {line[:80]!r}")
+            self.cases.append(case)
+        vectors = raw[:rows * dim].reshape(rows, dim)
+        if self.index is None:
+            self.index = IVFIndex(dim, **self.index_kwargs)
+        if self.index.size == 0:
+            self.index.add_many(vectors)  # startup: bulk load, train once
+        else:
+            for v in vectors:
+                self.index.add(v)
+
+    def _drop_partial_line(self):
+        """Cut off a metadata line left without its newline by a crash mid-write (caller holds the flock)."""
+        if not os.path.exists(self._cases_path):
+            return
+        with open(self._cases_path, "r+b") as f:
+            end = f.seek(0, os.SEEK_END)
+            if end == 0:
+                return
+            f.seek(end - 1)
+            if f.read(1) == b"\n":
+                return
+            pos = end
+            while pos > 0:
+                start = max(0, pos - 4096)
+                f.seek(start)
+                cut = f.read(pos - start).rfind(b"\n")
+                if cut >= 0:
+                    break
+                pos = start
+            f.truncate(start + cut + 1 if pos > 0 else 0)
+        logger.warning(f"[similarity] dropped a partial line at the end of {self._cases_path}")
+
+    def add(self, embedding, **case):
+        """Store one case; returns its case id (its row in the shared files)."""
+        embedding = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        with self._lock, open(os.path.join(self.root, ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self._drop_partial_line()
+            self._catch_up()
+            case = dict(case, case_id=len(self.cases), dim=len(embedding))
+            # vector at its row's offset first: a crash before the metadata line
+            # leaves an orphan row that the next insert overwrites
+            with open(self._vectors_path, "r+b" if os.path.exists(self._vectors_path) else "wb") as f:
+                f.seek(case["case_id"] * len(embedding) * 4)
+                f.write(embedding.tobytes())
+            with open(self._cases_path, "a") as f:
+                f.write(json.dumps(case) + "\n")
+            self._catch_up()
+        return case["case_id"]
+
+    def similar(self, case_id, k=5):
+        """Prior cases most similar to a stored case (the case itself excluded); None if unknown."""
+        with self._lock:
+            self._catch_up()
+        if self.index is None or not 0 <= case_id < len(self.cases) or self.cases[case_id] is None:
+            return None
+        return self._matches(self.index.search(self.index.vectors[case_id], k, exclude=case_id))
+
+    def similar_to(self, embedding, k=5):
+        """Stored cases most similar to an embedding that is not in the store."""
+        with self._lock:
+            self._catch_up()
+        if self.index is None:
+            return []
+        return self._matches(self.index.search(embedding, k))
+
+    def _matches(self, hits):
+        return [dict({key: value for key, value in self.cases[row].items() if key != "dim"},
+                     similarity=round(score, 4))
+                for row, score in hits if self.cases[row] is not None]
+
+    def __len__(self):
+        return len(self.cases)
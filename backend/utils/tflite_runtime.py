@@ -0,0 +1,59 @@
+"""tflite_runtime.py — pooled TFLite interpreters for CPU serving
+A TFLite Interpreter is not thread-safe, so each request borrows one from a
+small pool. XNNPACK is applied by the default op resolver for float and int8
+models; num_threads controls its thread pool per interpreter.
+"""
+
+import os
+import queue
+import numpy as np
+
+
+def _interpreter_class():
+    """Prefer the standalone runtime when installed (no full TensorFlow import)."""
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except Exception:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+def exported_model_path(keras_path, variant, ext="tflite", export_root=None):
+    """Where export_models.py writes the `variant` file for `keras_path`."""
+    model_dir = os.path.dirname(keras_path)
+    stem = os.path.splitext(os.path.basename(keras_path))[0]
+    return os.path.join(export_root or os.path.join(model_dir, "exported"), stem, f"{variant}.{ext}")
+
+
+class InterpreterPool:
+    """Drop-in for model.predict(x) backed by `size` TFLite interpreters."""
+
+    def __init__(self, model_path, size=2, num_threads=1):
+        self.model_path = model_path
+        self._pool = queue.Queue()
+        Interpreter = _interpreter_class()
+        for _ in range(max(1, size)):
+            interp = Interpreter(model_path=model_path, num_threads=num_threads)
+            interp.allocate_tensors()
+            self._pool.put(interp)
+
+        probe = self._pool.get()
+        self._input = probe.get_input_details()[0]
+        self._output = probe.get_output_details()[0]
+        self._pool.put(probe)
+        # same convention as Keras: (None, H, W, C)
+        self.input_shape = (None, *[int(d) for d in self._input["shape"][1:]])
+
+    def predict(self, x, verbose=0):
+        x = np.asarray(x, dtype=self._input["dtype"])
+        interp = self._pool.get()
+        try:
+            if tuple(interp.get_input_details()[0]["shape"]) != x.shape:
+                interp.resize_tensor_input(self._input["index"], x.shape)
+                interp.allocate_tensors()
+            interp.set_tensor(self._input["index"], x)
+            interp.invoke()
+            return np.array(interp.get_tensor(self._output["index"]))  # copy before the interpreter is reused
+        finally:
+            self._pool.put(interp)
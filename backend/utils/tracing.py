@@ -0,0 +1,249 @@
+"""tracing.py — lightweight per-request tracing
+Each request gets a trace (id from X-Request-ID / W3C traceparent, or a new
+one) and spans opened with `span()` / `@traced` nest under it through
+contextvars, so helpers need no extra arguments. A finished trace is
+  - summarized for the client as a Server-Timing header, and
+  - exported off the request path as OTLP/JSON: appended as one line to
+    TRACE_FILE (readable by the collector's otlpjsonfile receiver) or POSTed
+    to OTEL_EXPORTER_OTLP_ENDPOINT/v1/traces.
+
+Config: TRACE_EXPORT = none (default) | jsonl | otlp, TRACE_FILE,
+TRACE_FILE_MAX_MB / TRACE_FILE_BACKUPS (size-based rotation of the jsonl file),
+OTEL_EXPORTER_OTLP_ENDPOINT, TRACE_SAMPLE_RATE (share of traces exported).
+Outside a trace span() is a no-op.
+"""
+
+import os
+import json
+import fcntl
+import time
+import queue
+import random
+import logging
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+
+logger = logging.getLogger("shwasnetra.tracing")
+
+SERVICE_NAME = "shwasnetra-backend"
+_trace_var = contextvars.ContextVar("shwasnetra_trace", default=None)
+_span_var = contextvars.ContextVar("shwasnetra_span", default=None)
+
+
+def _hex_id(nbytes):
+    return os.urandom(nbytes).hex()
+
+
+class Span:
+    __slots__ = ("name", "span_id", "parent_id", "start_ns", "end_ns", "attributes")
+
+    def __init__(self, name, parent_id=None, attributes=None):
+        self.name = name
+        self.span_id = _hex_id(8)
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+
+    @property
+    def duration_ms(self):
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+
+class Trace:
+    def __init__(self, name, request_id=None, trace_id=None, parent_span_id=None):
+        self.trace_id = trace_id or _hex_id(16)
+        self.request_id = request_id or self.trace_id
+        self.root = Span(name, parent_span_id, {"request.id": self.request_id})
+        self.spans = [self.root]
+
+
+def parse_traceparent(header):
+    """(trace_id, parent_span_id) from a W3C traceparent header, or (None, None)."""
+    parts = (header or "").split("-")
+    if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16:
+        return parts[1], parts[2]
+    return None, None
+
+
+def start_trace(name, request_id=None, traceparent=None):
+    trace_id, parent = parse_traceparent(traceparent)
+    trace = Trace(name, (request_id or "")[:64] or None, trace_id, parent)
+    _trace_var.set(trace)
+    _span_var.set(trace.root)
+    return trace
+
+
+def current_trace():
+    return _trace_var.get()
+
+
+@contextmanager
+def span(name, **attributes):
+    trace = _trace_var.get()
+    if trace is None:
+        yield None
+        return
+    parent = _span_var.get()
+    s = Span(name, parent.span_id if parent else None, attributes)
+    trace.spans.append(s)
+    token = _span_var.set(s)
+    try:
+        yield s
+    except Exception as e:
+        s.attributes["error"] = type(e).__name__
+        raise
+    finally:
+        s.end_ns = time.time_ns()
+        _span_var.reset(token)
+
+
+def traced(name=None):
+    """Decorator form of span(); the span is named after the function by default."""
+    def decorate(fn):
+        span_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def server_timing(trace, limit=12):
+    """Server-Timing header value: total plus per-name durations of direct and nested spans."""
+    totals = {}
+    for s in trace.spans[1:]:
+        totals[s.name] = totals.get(s.name, 0.0) + s.duration_ms
+    parts = [f"total;dur={trace.root.duration_ms:.1f}"]
+    parts += [f"{name.replace(' ', '_')};dur={ms:.1f}" for name, ms in list(totals.items())[:limit]]
+    return ", ".join(parts)
+
+
+# -------------------------
+# Export
+# -------------------------
+def _attr(key, value):
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def to_otlp(trace):
+    spans = []
+    for s in trace.spans:
+        spans.append({
+            "traceId": trace.trace_id,
+            "spanId": s.span_id,
+            "parentSpanId": s.parent_id or "",
+            "name": s.name,
+            "kind": 2 if s is trace.root else 1,  # SERVER / INTERNAL
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns or time.time_ns()),
+            "attributes": [_attr(k, v) for k, v in s.attributes.items()],
+        })
+    return {"resourceSpans": [{
+        "resource": {"attributes": [_attr("service.name", SERVICE_NAME), _attr("process.pid", os.getpid())]},
+        "scopeSpans": [{"scope": {"name": "shwasnetra.tracing"}, "spans": spans}],
+    }]}
+
+
+class _BackgroundExporter:
+    """Drains finished traces on a daemon thread; drops them when the queue is full."""
+
+    def __init__(self, max_queue=1000):
+        self._queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        threading.Thread(target=self._run, name=type(self).__name__, daemon=True).start()
+
+    def submit(self, trace):
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < 64:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.export(batch)
+            except Exception as e:
+                logger.warning(f"[tracing] export failed: {e}")
+
+    def export(self, traces):
+        raise NotImplementedError
+
+
+class JsonlExporter(_BackgroundExporter):
+    """Appends to `path`; once it reaches max_bytes it becomes path.1 (path.1 -> path.2, ...), keeping `backups`."""
+
+    def __init__(self, path, max_bytes=100 * 1024 * 1024, backups=3):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        super().__init__()
+
+    def export(self, traces):
+        lines = "".join(json.dumps(to_otlp(t), separators=(",", ":")) + "\n" for t in traces)
+        # workers share the file: rotate and append under one lock so no two rotate at once
+        with open(self.path + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+                self._rotate()
+            with open(self.path, "a") as f:
+                f.write(lines)
+
+    def _rotate(self):
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+
+class OtlpHttpExporter(_BackgroundExporter):
+    def __init__(self, endpoint):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        super().__init__()
+
+    def export(self, traces):
+        import requests
+        docs = [to_otlp(t)["resourceSpans"][0] for t in traces]
+        requests.post(self.url, json={"resourceSpans": docs}, timeout=5)
+
+
+def exporter_from_env(default_file):
+    kind = os.getenv("TRACE_EXPORT", "none").strip().lower()
+    if kind == "otlp":
+        return OtlpHttpExporter(os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318"))
+    if kind == "jsonl":
+        return JsonlExporter(os.getenv("TRACE_FILE", default_file),
+                             max_bytes=int(float(os.getenv("TRACE_FILE_MAX_MB", "100")) * 1024 * 1024),
+                             backups=int(os.getenv("TRACE_FILE_BACKUPS", "3")))
+    return None
+
+
+def end_trace(trace, exporter=None, sample_rate=1.0, **attributes):
+    """Close the root span, detach the trace from this context and hand it to the exporter."""
+    trace.root.end_ns = time.time_ns()
+    trace.root.attributes.update(attributes)
+    _trace_var.set(None)
+    _span_var.set(None)
+    if exporter is not None and (sample_rate >= 1.0 or random.random() < sample_rate):
+        exporter.submit(trace)
+    return trace
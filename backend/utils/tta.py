@@ -0,0 +1,111 @@
+"""tta.py — test-time augmentation and checkpoint ensembles for the classifier
+Each accepted upload is expanded into views (identity, horizontal flip, 90%
+crops) and every view of every image goes through each model as ONE stacked
+batch, so N views cost one predict() call per model rather than N. The
+result is the mean probability over views x models, with the per-class
+variance as an uncertainty estimate.
+
+The number of views adapts to a latency budget: the measured cost per
+(image, view, model) is tracked as an EWMA, and each call uses as many views
+(in priority order, identity first) as fit the budget. CPU contention under
+load raises the measured cost, which lowers the view count automatically.
+"""
+
+import time
+import threading
+import numpy as np
+
+from utils.tracing import span
+
+# priority order: the first view is the plain prediction
+VIEWS = ("identity", "hflip", "crop_center", "crop_tl", "crop_br", "hflip_crop_center", "crop_tr", "crop_bl")
+CROP = 0.9
+
+
+def make_views(img, size, views):
+    """(len(views), H, W, 3) float32 batch for one decoded image, in [0, 1] like cascade.to_batch."""
+    w, h = size
+    base = np.asarray(img.resize(size), dtype=np.float32) / 255.0
+    out = []
+    big = None
+    for name in views:
+        if name == "identity":
+            view = base
+        elif name == "hflip":
+            view = base[:, ::-1]
+        else:
+            if big is None:
+                # one upscale serves every crop: a 90% window of it is exactly `size`
+                bw, bh = int(round(w / CROP)), int(round(h / CROP))
+                big = np.asarray(img.resize((bw, bh)), dtype=np.float32) / 255.0
+            bh, bw = big.shape[:2]
+            corner = name.rsplit("_", 1)[-1]
+            top = {"tl": 0, "tr": 0, "bl": bh - h, "br": bh - h}.get(corner, (bh - h) // 2)
+            left = {"tl": 0, "bl": 0, "tr": bw - w, "br": bw - w}.get(corner, (bw - w) // 2)
+            view = big[top:top + h, left:left + w]
+            if name.startswith("hflip"):
+                view = view[:, ::-1]
+        out.append(view)
+    return np.stack(out)
+
+
+class LatencyBudget:
+    """How many views fit in `budget_ms`, from an EWMA of the measured cost per (image, view, model)."""
+
+    def __init__(self, budget_ms=250.0, max_views=4, min_views=1, alpha=0.2):
+        self.budget_ms = budget_ms
+        self.max_views = max(1, min(max_views, len(VIEWS)))
+        self.min_views = max(1, min(min_views, self.max_views))
+        self.alpha = alpha
+        self.unit_ms = None
+        self._lock = threading.Lock()
+
+    def views(self, n_images=1, n_models=1):
+        with self._lock:
+            unit = self.unit_ms
+        if unit is None or self.budget_ms <= 0:
+            return self.max_views
+        fit = int(self.budget_ms // (unit * max(1, n_images) * max(1, n_models)))
+        return max(self.min_views, min(self.max_views, fit))
+
+    def record(self, elapsed_ms, units):
+        unit = elapsed_ms / max(1, units)
+        with self._lock:
+            self.unit_ms = unit if self.unit_ms is None else (1 - self.alpha) * self.unit_ms + self.alpha * unit
+
+
+class TTAEnsemble:
+    """Mean/variance of class probabilities over augmented views and several checkpoints."""
+
+    def __init__(self, models, size=(224, 224), budget=None):
+        self.models = [m for m in models if m]
+        if not self.models:
+            raise ValueError("TTAEnsemble needs at least one loaded model")
+        self.size = tuple(size)
+        self.budget = budget or LatencyBudget()
+
+    def predict_images(self, images):
+        """
+        Decoded PIL images -> (mean probs (N, C), variance (N, C), embeddings (N, D) or None, n_views).
+        Embeddings are the identity view's pooled features from the first model, when it exposes them.
+        """
+        n_views = self.budget.views(len(images), len(self.models))
+        views = VIEWS[:n_views]
+        start = time.perf_counter()
+        batch = np.concatenate([make_views(img, self.size, views) for img in images])  # image-major
+
+        outputs, embeddings = [], None
+        with span("tta_inference", images=len(images), views=n_views, models=len(self.models)):
+            for i, model in enumerate(self.models):
+                if i == 0 and hasattr(model, "predict_with_embedding"):
+                    preds, features = model.predict_with_embedding(batch)
+                    if features is not None:
+                        embeddings = np.asarray(features).reshape(len(images), n_views, -1)[:, 0]
+                else:
+                    preds = model.predict(batch, verbose=0)
+                preds = np.asarray(preds, dtype=np.float32).reshape(len(images), n_views, -1)
+                outputs.append(preds)
+        self.budget.record((time.perf_counter() - start) * 1000.0, len(images) * n_views * len(self.models))
+
+        stacked = np.concatenate(outputs, axis=1)  # (N, views * models, C)
+        return stacked.mean(axis=1), stacked.var(axis=1), embeddings, n_views
@@ -1,31 +1,64 @@
 import os
-import numpy as np
+import time
+import tensorflow as tf
 from tensorflow.keras.models import load_model
-from tensorflow.keras.preprocessing.image import load_img, img_to_array
-from sklearn.metrics import classification_report
-
-model = load_model('model_training/lung_cancer_detector.keras')
-
-validation_dir = 'validation'
-class_names = ['cancer', 'normal']
-X, y_true = [], []
-
-for label in class_names:
-    folder = os.path.join(validation_dir, label)
-    for img_name in os.listdir(folder):
-        img_path = os.path.join(folder, img_name)
-        try:
-            img = load_img(img_path, target_size=(224, 224))
-            img_array = img_to_array(img) / 255.0
-            X.append(img_array)
-            y_true.append(0 if label == 'cancer' else 1)
-        except Exception as e:
-            print(f"Error loading {img_name}: {e}")
-
-X = np.array(X)
-y_true = np.array(y_true)
-y_pred_probs = model.predict(X).flatten()
-y_pred = [1 if p > 0.5 else 0 for p in y_pred_probs]
-
-# Print detailed classification report
-print(classification_report(y_true, y_pred, target_names=class_names))
+from utils.evaluation import StreamingBinaryEvaluator, format_report
+
+MODEL_PATH = 'model_training/lung_cancer_detector.keras'
+VALIDATION_DIR = 'validation'
+CLASS_NAMES = ['cancer', 'normal']
+IMG_SIZE = (224, 224)
+BATCH_SIZE = 32
+PREFETCH_BATCHES = 2  # at most this many decoded batches wait ahead of the model
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+def list_validation_files(validation_dir=VALIDATION_DIR):
+    """Paths and labels only (0 = cancer, 1 = normal) — no pixels are read here."""
+    paths, labels = [], []
+    for label, name in enumerate(CLASS_NAMES):
+        folder = os.path.join(validation_dir, name)
+        for img_name in sorted(os.listdir(folder)):
+            if img_name.lower().endswith(IMAGE_EXTS):
+                paths.append(os.path.join(folder, img_name))
+                labels.append(label)
+    return paths, labels
+
+
+def decode_image(path, label):
+    img = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+    img = tf.image.resize(img, IMG_SIZE, method='nearest')  # same interpolation as load_img
+    return tf.cast(img, tf.float32) / 255.0, label
+
+
+def build_dataset(paths, labels):
+    """Parallel decode, fixed-size batches, bounded prefetch."""
+    ds = tf.data.Dataset.from_tensor_slices((paths, labels))
+    ds = ds.map(decode_image, num_parallel_calls=tf.data.AUTOTUNE)
+    ds = ds.ignore_errors(log_warning=True)  # unreadable images are skipped, as before
+    return ds.batch(BATCH_SIZE).prefetch(PREFETCH_BATCHES)
+
+
+def evaluate(model, dataset):
+    """Predict batch by batch and fold each batch into the running metrics."""
+    evaluator = StreamingBinaryEvaluator(threshold=0.5)
+    start = time.perf_counter()
+    for images, labels in dataset:
+        probs = model(images, training=False).numpy().ravel()
+        evaluator.update(labels.numpy(), probs)
+    return evaluator, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    model = load_model(MODEL_PATH)
+    paths, labels = list_validation_files()
+    evaluator, seconds = evaluate(model, build_dataset(paths, labels))
+
+    skipped = len(paths) - evaluator.count
+    if skipped:
+        print(f"Skipped {skipped} unreadable images")
+
+    # Print detailed classification report
+    print(format_report(evaluator.cm, CLASS_NAMES))
+    print(f"AUC (normal vs cancer): {evaluator.auc():.4f}")
+    print(f"Evaluated {evaluator.count} images in {seconds:.1f}s ({evaluator.count / max(seconds, 1e-9):.1f} images/sec)")
@@ -1,16 +1,23 @@
 import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 from tensorflow.keras.models import load_model
 from tensorflow.keras.preprocessing.image import load_img, img_to_array
 
-from bias_testing.monitoring_logger import log_misclassification
+from monitoring import get_logger, log_misclassification
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+from model_training.bias_testing import SubgroupAggregator
 
 # === Utilities ===
 
 def load_and_preprocess(image_path):
     img = load_img(image_path, target_size=(224, 224), color_mode='rgb')
-    img_array = img_to_array(img) / 255.0
-    return np.expand_dims(img_array, axis=0)
+    return img_to_array(img) / 255.0
 
 def get_true_label(image_path):
     # Assumes label in filename: e.g., lung_1_23_cancer.png
@@ -30,28 +37,56 @@ def get_age_group(image_path):
     else:
         return "senior"
 
-# === Load model ===
-model = load_model("model_training/lung_cancer_detector.keras")
-
-# === Run inference with logging ===
-image_folder = "data/iqoth/val"
-image_paths = [os.path.join(image_folder, f) for f in os.listdir(image_folder) if f.endswith(".png")]
-
-for image_path in image_paths:
-    img = load_and_preprocess(image_path)
-    pred_prob = model.predict(img)[0][0]
-    pred = int(pred_prob >= 0.5)
-    true_label = get_true_label(image_path)
-    confidence = float(pred_prob)
-
-    gender = get_gender(image_path)
-    age_group = get_age_group(image_path)
-
-    if pred != true_label:
-        log_misclassification(
-            image_path=image_path,
-            pred=pred,
-            true=true_label,
-            confidence=confidence,
-            metadata={"gender": gender, "age_group": age_group}
-        )
+
+def run(image_folder, model_path, batch_size=32, workers=8, threshold=0.5, bias_out="logs/bias_aggregate.json"):
+    model = load_model(model_path)
+    bias = SubgroupAggregator()
+    image_paths = sorted(os.path.join(image_folder, f) for f in os.listdir(image_folder) if f.endswith(".png"))
+    misclassified = 0
+    start = time.perf_counter()
+
+    # Decode the next batch while the model predicts the current one; the
+    # monitoring logger only buffers, so logging never stalls the loop.
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        batches = [image_paths[i:i + batch_size] for i in range(0, len(image_paths), batch_size)]
+        pending = [pool.submit(load_and_preprocess, p) for p in batches[0]] if batches else []
+        for b, paths in enumerate(batches):
+            arrays = [f.result() for f in pending]
+            if b + 1 < len(batches):
+                pending = [pool.submit(load_and_preprocess, p) for p in batches[b + 1]]
+            probs = np.asarray(model.predict_on_batch(np.stack(arrays))).reshape(len(paths), -1)[:, 0]
+            preds = (probs >= threshold).astype(int)
+            trues = [get_true_label(p) for p in paths]
+            genders = [get_gender(p) for p in paths]
+            age_groups = [get_age_group(p) for p in paths]
+            bias.update_batch(preds, trues, probs, {"gender": genders, "age_group": age_groups})
+
+            for i in np.flatnonzero(preds != np.asarray(trues)):
+                misclassified += 1
+                log_misclassification(
+                    image_path=paths[i],
+                    pred=int(preds[i]),
+                    true=trues[i],
+                    confidence=float(probs[i]),
+                    metadata={"gender": genders[i], "age_group": age_groups[i]}
+                )
+
+    elapsed = time.perf_counter() - start
+    logger = get_logger()
+    logger.close()
+    print(f"✅ {len(image_paths)} images in {elapsed:.1f}s ({len(image_paths) / max(elapsed, 1e-9):.1f} images/sec), "
+          f"{misclassified} misclassified — monitoring: {logger.stats()}")
+    os.makedirs(os.path.dirname(bias_out) or ".", exist_ok=True)
+    bias.save(bias_out)  # merge several runs/workers with: python model_training/bias_testing.py <files>
+    bias.report()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batched inference with misclassification monitoring.")
+    parser.add_argument("--images", default="data/iqoth/val")
+    parser.add_argument("--model", default="model_training/lung_cancer_detector.keras")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=8, help="decode threads")
+    parser.add_argument("--bias-out", default="logs/bias_aggregate.json", help="where to save the subgroup aggregate")
+    args = parser.parse_args()
+    run(args.images, args.model, args.batch_size, args.workers, bias_out=args.bias_out)
@@ -0,0 +1,42 @@
+"""Monitoring events (misclassifications, predictions) logged without blocking inference.
+
+    from monitoring import log_misclassification
+    log_misclassification(image_path, pred, true, confidence, metadata={...})
+
+Events go to MONITORING_STORE (default logs/monitoring.db; a path ending in
+.parquet writes part files instead).
+"""
+
+import os
+import threading
+
+from .logger import MonitoringLogger
+from .stores import SqliteEventStore, ParquetEventStore, open_store
+
+DEFAULT_STORE = os.getenv("MONITORING_STORE", os.path.join("logs", "monitoring.db"))
+
+_logger = None
+_lock = threading.Lock()
+
+
+def get_logger(path=None):
+    """Process-wide logger, created on first use."""
+    global _logger
+    with _lock:
+        if _logger is None:
+            _logger = MonitoringLogger(path or DEFAULT_STORE)
+        return _logger
+
+
+def log_prediction(image_path, pred, confidence, true=None, metadata=None):
+    get_logger().log("prediction", image_path=image_path, pred=pred, true_label=true,
+                     confidence=confidence, metadata=metadata)
+
+
+def log_misclassification(image_path, pred, true, confidence, metadata=None):
+    get_logger().log("misclassification", image_path=image_path, pred=pred, true_label=true,
+                     confidence=confidence, metadata=metadata)
+
+
+__all__ = ["MonitoringLogger", "SqliteEventStore", "ParquetEventStore", "open_store",
+           "get_logger", "log_prediction", "log_misclassification"]
@@ -0,0 +1,86 @@
+"""logger.py — buffered, non-blocking monitoring logger
+log() only appends to an in-memory ring buffer (a deque, so it never waits on
+I/O); a daemon thread drains the buffer in batches into the store every
+`flush_interval` seconds, or sooner once `flush_at` events are waiting.
+When producers outrun the store the oldest events are dropped and counted in
+`dropped` rather than stalling inference; so is a batch the store fails to
+write (the failure is logged).
+"""
+
+import time
+import atexit
+import logging
+import threading
+from collections import deque
+
+from .stores import open_store
+
+logger = logging.getLogger("shwasnetra.monitoring")
+
+
+class MonitoringLogger:
+    def __init__(self, path, capacity=10000, flush_at=256, flush_interval=2.0):
+        self.store = open_store(path)
+        self.capacity = capacity
+        self.flush_at = flush_at
+        self.flush_interval = flush_interval
+        self._buffer = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self.logged = self.written = self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name="monitoring-flush", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def log(self, kind, **fields):
+        event = dict(fields, kind=kind, ts=fields.get("ts") or time.time())
+        with self._lock:
+            if len(self._buffer) == self.capacity:
+                self.dropped += 1  # deque(maxlen) evicts the oldest event
+            self._buffer.append(event)
+            self.logged += 1
+            pending = len(self._buffer)
+        if pending >= self.flush_at:
+            self._wake.set()
+
+    def _drain(self):
+        with self._lock:
+            batch = list(self._buffer)
+            self._buffer.clear()
+        return batch
+
+    def flush(self):
+        """Write everything buffered so far (called by the flush thread, and on close)."""
+        batch = self._drain()
+        if not batch:
+            return 0
+        try:
+            self.store.write(batch)
+        except Exception:
+            with self._lock:
+                self.dropped += len(batch)
+            logger.exception(f"[monitoring] flush failed, dropped {len(batch)} events")
+            return 0
+        self.written += len(batch)
+        return len(batch)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self):
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout=10)
+        self.flush()
+        self.store.close()
+
+    def stats(self):
+        with self._lock:
+            return {"logged": self.logged, "written": self.written, "dropped": self.dropped,
+                    "buffered": len(self._buffer)}
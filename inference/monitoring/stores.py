@@ -0,0 +1,80 @@
+"""stores.py — append-only sinks for monitoring events
+Each store receives whole batches from the flush thread, never single events.
+  - SqliteEventStore: one row per event, one transaction per batch (WAL, so
+    readers such as the bias reports never block the writer);
+  - ParquetEventStore: one part file per batch inside a directory ending in
+    .parquet (needs pyarrow), for columnar analysis.
+"""
+
+import os
+import json
+import sqlite3
+
+COLUMNS = ["ts", "kind", "image_path", "pred", "true_label", "confidence", "metadata"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts          REAL NOT NULL,
+    kind        TEXT NOT NULL,
+    image_path  TEXT,
+    pred        INTEGER,
+    true_label  INTEGER,
+    confidence  REAL,
+    metadata    TEXT
+);
+CREATE INDEX IF NOT EXISTS events_kind_ts ON events (kind, ts);
+"""
+
+
+def _row(event):
+    return (event["ts"], event["kind"], event.get("image_path"), event.get("pred"), event.get("true_label"),
+            event.get("confidence"), json.dumps(event.get("metadata") or {}, sort_keys=True))
+
+
+class SqliteEventStore:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # only the flush thread writes, but it is not the thread that opened the store
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def write(self, events):
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT INTO events ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                [_row(e) for e in events])
+
+    def close(self):
+        self.conn.close()
+
+
+class ParquetEventStore:
+    """One part file per flush, written to a temp name and renamed, so a crash never leaves half a part."""
+
+    def __init__(self, path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self.pa, self.pq = pa, pq
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.parts = len([f for f in os.listdir(path) if f.endswith(".parquet")])
+
+    def write(self, events):
+        columns = list(zip(*(_row(e) for e in events)))
+        table = self.pa.table({name: list(values) for name, values in zip(COLUMNS, columns)})
+        part = f"part-{self.parts:05d}.parquet"
+        tmp = os.path.join(self.path, part + ".tmp")
+        self.pq.write_table(table, tmp)
+        os.replace(tmp, os.path.join(self.path, part))
+        self.parts += 1
+
+    def close(self):
+        pass
+
+
+def open_store(path):
+    return ParquetEventStore(path) if path.endswith(".parquet") else SqliteEventStore(path)
@@ -0,0 +1,180 @@
+import os
+import csv
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.preprocessing import image
+
+# Same conventions as prediction/predict_single.py
+MODEL_PATH = 'model_training/lung_cancer_detector.keras'
+CLASS_NAMES = ['cancer', 'normal']  # sigmoid > 0.5 -> normal
+TARGET_SIZE = (224, 224)
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.bmp')
+FIELDS = ['filename', 'predicted_label', 'confidence']
+
+
+def collect_images(root, extensions=IMAGE_EXTS):
+    """All images under root (recursively), as sorted paths relative to root."""
+    found = []
+    for dirpath, _, files in os.walk(root):
+        for f in files:
+            if f.lower().endswith(extensions):
+                found.append(os.path.relpath(os.path.join(dirpath, f), root))
+    return sorted(found)
+
+
+def load_image(path):
+    img = image.load_img(path, target_size=TARGET_SIZE)
+    return image.img_to_array(img) / 255.0
+
+
+def iter_decoded_batches(root, rel_paths, batch_size, workers, prefetch_batches=2):
+    """
+    Decode images on a thread pool while the model works on the previous batch.
+    At most `prefetch_batches` batches are decoded ahead. Yields (names, array).
+    """
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+
+        def collect(names, futures):
+            ok_names, arrays = [], []
+            for name, fut in zip(names, futures):
+                try:
+                    arrays.append(fut.result())
+                    ok_names.append(name)
+                except Exception as e:
+                    print(f"❌ Error processing {name}: {e}")
+            return ok_names, (np.stack(arrays) if arrays else None)
+
+        for i in range(0, len(rel_paths), batch_size):
+            names = rel_paths[i:i + batch_size]
+            pending.append((names, [pool.submit(load_image, os.path.join(root, n)) for n in names]))
+            if len(pending) > prefetch_batches:
+                yield collect(*pending.popleft())
+        while pending:
+            yield collect(*pending.popleft())
+
+
+class CsvResultWriter:
+    """
+    Rows are written as they are produced. A new run overwrites the file; with
+    resume=True, existing rows mark files as done and new rows are appended.
+    """
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.done = set()
+        if resume and os.path.exists(path):
+            with open(path, newline='') as f:
+                reader = csv.DictReader(f)
+                if reader.fieldnames and reader.fieldnames != FIELDS:
+                    raise ValueError(f"{path} has columns {reader.fieldnames}, expected {FIELDS}; "
+                                     f"rerun without --resume to overwrite it")
+                self.done = {row['filename'] for row in reader}
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.file = open(path, 'a' if self.done else 'w', newline='')
+        self.writer = csv.DictWriter(self.file, fieldnames=FIELDS)
+        if not self.done:
+            self.writer.writeheader()
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetResultWriter:
+    """
+    One part file per flush inside an output directory, so a resumed run never
+    rewrites data. A new run removes the existing parts; with resume=True they
+    mark files as done.
+    """
+    def __init__(self, path, resume=False):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self.pa, self.pq = pa, pq
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.parts = sorted(f for f in os.listdir(path) if f.endswith('.parquet'))
+        self.done = set()
+        if not resume:
+            for part in self.parts:
+                os.remove(os.path.join(path, part))
+            self.parts = []
+        for part in self.parts:
+            columns = pq.read_schema(os.path.join(path, part)).names
+            if columns != FIELDS:
+                raise ValueError(f"{os.path.join(path, part)} has columns {columns}, expected {FIELDS}; "
+                                 f"rerun without --resume to overwrite it")
+            self.done.update(pq.read_table(os.path.join(path, part), columns=['filename']).column(0).to_pylist())
+
+    def write(self, rows):
+        table = self.pa.Table.from_pylist(rows)
+        part = f"part-{len(self.parts):05d}.parquet"
+        tmp = os.path.join(self.path, part + '.tmp')
+        self.pq.write_table(table, tmp)
+        os.replace(tmp, os.path.join(self.path, part))  # a crash never leaves half a part behind
+        self.parts.append(part)
+
+    def close(self):
+        pass
+
+
+def run_batch_prediction(image_dir, output_path, model_path=MODEL_PATH, batch_size=32, workers=8,
+                         flush_every=256, extensions=IMAGE_EXTS, resume=False):
+    writer_cls = ParquetResultWriter if output_path.endswith('.parquet') else CsvResultWriter
+    writer = writer_cls(output_path, resume=resume)
+    todo = [p for p in collect_images(image_dir, extensions) if p not in writer.done]
+    print(f"🔎 {len(todo)} images to predict ({len(writer.done)} already done)")
+    if not todo:
+        writer.close()
+        return
+
+    model = tf.keras.models.load_model(model_path)
+    buffered, processed = [], 0
+    start = time.perf_counter()
+    try:
+        for names, batch in iter_decoded_batches(image_dir, todo, batch_size, workers):
+            if batch is None:
+                continue
+            probs = np.asarray(model.predict_on_batch(batch)).reshape(len(names), -1)[:, 0]
+            for name, p in zip(names, probs):
+                buffered.append({
+                    'filename': name,
+                    'predicted_label': CLASS_NAMES[1] if p > 0.5 else CLASS_NAMES[0],
+                    'confidence': float(p),
+                })
+            processed += len(names)
+            if len(buffered) >= flush_every:
+                writer.write(buffered)
+                buffered = []
+                elapsed = time.perf_counter() - start
+                print(f"⏱️ {processed}/{len(todo)} images, {processed / elapsed:.1f} images/sec")
+    finally:
+        if buffered:
+            writer.write(buffered)
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ Predictions saved to {output_path} — {processed} images in {elapsed:.1f}s "
+          f"({processed / max(elapsed, 1e-9):.1f} images/sec)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Batch-predict every image under a directory tree.")
+    parser.add_argument('image_dir')
+    parser.add_argument('output', help="results .csv file, or a directory ending in .parquet")
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--workers', type=int, default=8, help="decode threads")
+    parser.add_argument('--flush-every', type=int, default=256, help="rows buffered before each write")
+    parser.add_argument('--resume', action='store_true',
+                        help="skip images already in the output and append; by default the output is overwritten")
+    args = parser.parse_args()
+    run_batch_prediction(args.image_dir, args.output, args.model, args.batch_size, args.workers, args.flush_every,
+                         resume=args.resume)
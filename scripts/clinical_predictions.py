@@ -1,49 +1,52 @@
-import csv
 import os
-from sklearn.metrics import classification_report, confusion_matrix
+import sys
+import numpy as np
+
+# Shared metrics live in backend/utils/evaluation.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+from utils.evaluation import (
+    load_ids, load_id_values, labels_from_annotations, align_by_id,
+    confusion_matrix, format_report, roc_auc, average_precision,
+    sensitivity_at_specificity, bootstrap_ci,
+)
 
 # Paths
 annotations_file = "LUNA16/annotations.csv"
 predictions_file = "validation/clinical_predictions.txt"
+scores_file = "validation/clinical_scores.txt"  # written by clinical_validate.py
 sample_ids_file = "validation/sampled_ids.txt"
 
-# Step 1: Load ground truth from annotations.csv
-nodule_positive_scans = set()
-with open(annotations_file, newline='') as f:
-    reader = csv.DictReader(f)
-    for row in reader:
-        scan_id = row['seriesuid']
-        nodule_positive_scans.add(scan_id)
-
-# Step 2: Load sampled scan IDs
-with open(sample_ids_file) as f:
-    sampled_ids = [line.strip() for line in f.readlines()]
+SPECIFICITY = 0.90
+N_BOOTSTRAP = 2000
 
-# Step 3: Build ground truth labels
-ground_truth = []
-for scan_id in sampled_ids:
-    label = 1 if scan_id in nodule_positive_scans else 0
-    ground_truth.append((scan_id, label))
+# Step 1: Ground truth for the sampled scans (1 = has an annotated nodule)
+sampled_ids = load_ids(sample_ids_file)
+ground_truth = labels_from_annotations(annotations_file, sampled_ids)
 
-# Step 4: Load model predictions
-pred_dict = {}
-with open(predictions_file) as f:
-    for line in f:
-        scan_id, pred = line.strip().split(',')
-        pred_dict[scan_id] = int(pred)
+# Step 2: Match model predictions to the sampled scans
+pred_ids, preds = load_id_values(predictions_file, dtype=np.int64)
+found, y_pred = align_by_id(sampled_ids, pred_ids, preds)
+for scan_id in sampled_ids[~found]:
+    print(f"⚠️ Missing prediction for {scan_id}")
+y_true = ground_truth[found]
 
-# Step 5: Match predictions with ground truth
-y_true, y_pred = [], []
-for scan_id, label in ground_truth:
-    if scan_id in pred_dict:
-        y_true.append(label)
-        y_pred.append(pred_dict[scan_id])
-    else:
-        print(f"⚠️ Missing prediction for {scan_id}")
-
-# Step 6: Print metrics
+# Step 3: Print metrics
 print("✅ Evaluation Report:\n")
 print("Confusion Matrix:")
-print(confusion_matrix(y_true, y_pred))
+cm = confusion_matrix(y_true, y_pred, num_classes=2)
+print(cm)
 print("\nClassification Report:")
-print(classification_report(y_true, y_pred, target_names=["No Nodule", "Nodule"]))
+print(format_report(cm, ["No Nodule", "Nodule"]))
+
+# Step 4: Threshold-free metrics when continuous scores are available
+if os.path.exists(scores_file):
+    score_ids, scores = load_id_values(scores_file)
+    found, y_score = align_by_id(sampled_ids, score_ids, scores)
+    y_true = ground_truth[found]
+    print("\nROC / PR:")
+    print(f"AUC: {roc_auc(y_true, y_score):.4f}")
+    print(f"Average precision: {average_precision(y_true, y_score):.4f}")
+    print(f"Sensitivity @ {SPECIFICITY:.0%} specificity: {sensitivity_at_specificity(y_true, y_score, SPECIFICITY):.4f}")
+    print(f"\nBootstrap 95% CI ({N_BOOTSTRAP} resamples):")
+    for name, (point, lo, hi) in bootstrap_ci(y_true, y_score, specificity=SPECIFICITY, n_boot=N_BOOTSTRAP).items():
+        print(f"  {name:<22} {point:.4f}  [{lo:.4f}, {hi:.4f}]")
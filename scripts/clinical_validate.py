@@ -1,57 +1,61 @@
 import os
 import numpy as np
 import torch
-from torch.utils.data import Dataset, DataLoader
-from train_luna16 import Simple3DCNN
-import scipy.ndimage  # ✅ for resizing 3D volumes
+from model import load_checkpoint
+from sliding_window import SlidingWindowEngine, load_volume
 
 # Load sampled IDs
 with open("validation/sampled_ids.txt") as f:
     sample_ids = [line.strip() for line in f.readlines()]
 
 PREPROCESSED_DIR = "preprocessed_luna16"
-MODEL_PATH = "shwasnetra_luna16_model.pth"
-
-def resize_volume(img, target_shape=(32, 64, 64)):
-    # Resize a 3D numpy volume
-    factors = [t / s for t, s in zip(target_shape, img.shape)]
-    return scipy.ndimage.zoom(img, zoom=factors, order=1)  # linear interpolation
-
-# Define Dataset
-class LUNASampleDataset(Dataset):
-    def __init__(self, ids):
-        self.ids = ids
-
-    def __len__(self):
-        return len(self.ids)
-
-    def __getitem__(self, idx):
-        volume = np.load(os.path.join(PREPROCESSED_DIR, self.ids[idx] + ".npy"))
-        volume = volume.astype(np.float32)
-        volume = resize_volume(volume, target_shape=(32, 64, 64))  # ✅ resize to match model input
-        volume = torch.tensor(volume).unsqueeze(0)  # shape: (1, D, H, W)
-        return volume, self.ids[idx]
-
-dataset = LUNASampleDataset(sample_ids)
-loader = DataLoader(dataset, batch_size=1)
-
-# Load model
-model = Simple3DCNN()
-model.load_state_dict(torch.load(MODEL_PATH, map_location=torch.device('cpu')))
+MODEL_PATH = "models/shwasnetra_luna16_model.pth"  # saved by train_luna16.py; windows match its input size
+
+# Inference knobs
+THRESHOLD = 0.5        # scan is "Nodule" if any window scores above this
+BATCH_SIZE = 64
+MAX_BATCH_MB = 256
+NUM_THREADS = os.cpu_count()
+SAVE_HEATMAPS = False  # write per-scan window heat grids to validation/heatmaps/
+
+torch.set_num_threads(NUM_THREADS)
+
+# Load model (32³ patch-bank model, or 128³ if it was trained on whole volumes)
+model = load_checkpoint(MODEL_PATH, map_location=torch.device('cpu'))
 model.eval()
+PATCH_SIZE = model.input_size
+STRIDE = PATCH_SIZE // 2
+
+engine = SlidingWindowEngine(model, patch_size=PATCH_SIZE, stride=STRIDE,
+                             batch_size=BATCH_SIZE, max_batch_mb=MAX_BATCH_MB)
+
+def iter_scans():
+    for scan_id in sample_ids:
+        path = os.path.join(PREPROCESSED_DIR, scan_id + ".npy")
+        if not os.path.exists(path):
+            print(f"⚠️ Missing volume for {scan_id}")
+            continue
+        yield scan_id, load_volume(PREPROCESSED_DIR, scan_id)
 
-# Run predictions
+# Run predictions (full resolution, windows batched across scans)
 results = []
-with torch.no_grad():
-    for volume, scan_id in loader:
-        outputs = model(volume)
-        prediction = torch.argmax(outputs, dim=1).item()
-        results.append((scan_id[0], prediction))
+if SAVE_HEATMAPS:
+    os.makedirs("validation/heatmaps", exist_ok=True)
+for result in engine.run(iter_scans()):
+    prediction = int(result.score >= THRESHOLD)
+    results.append((result.scan_id, prediction, result.score))
+    if SAVE_HEATMAPS:
+        np.save(os.path.join("validation/heatmaps", result.scan_id + ".npy"), result.heat)
 
 # Save to file
 os.makedirs("validation", exist_ok=True)
 with open("validation/clinical_predictions.txt", "w") as f:
-    for scan_id, pred in results:
+    for scan_id, pred, _ in results:
         f.write(f"{scan_id},{pred}\n")
+with open("validation/clinical_scores.txt", "w") as f:
+    for scan_id, _, score in results:
+        f.write(f"{scan_id},{score:.6f}\n")
 
-print("✅ Predictions saved to validation/clinical_predictions.txt")
+print("✅ Predictions saved to validation/clinical_predictions.txt (scores in validation/clinical_scores.txt)")
+print(f"⚡ {engine.patches_scored} patches scored, {engine.patches_skipped} air windows skipped, "
+      f"{engine.patches_per_sec:.1f} patches/sec (batch size {engine.batch_size})")
@@ -60,3 +60,31 @@ class Luna16Dataset(Dataset):
 
         label = 1 if scan_id in self.positive_ids else 0
         return volume, label
+
+
+class Luna16PatchDataset(Dataset):
+    """
+    Nodule-centric cubes from the patch bank written by patch_bank.py.
+    Patches are memory-mapped, so only the sampled cubes are read each step.
+    """
+    def __init__(self, bank_dir, augment=True):
+        self.patches = np.load(os.path.join(bank_dir, "patches.npy"), mmap_mode="r")
+        self.labels = np.load(os.path.join(bank_dir, "labels.npy")).astype(np.int64)
+        self.patch_size = self.patches.shape[1]
+        self.augment = augment
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, idx):
+        patch = np.asarray(self.patches[idx], dtype=np.float32)
+
+        # Random flips along each axis (nodules have no canonical orientation)
+        if self.augment:
+            for axis in range(3):
+                if np.random.rand() < 0.5:
+                    patch = np.flip(patch, axis=axis)
+            patch = np.ascontiguousarray(patch)
+
+        volume = torch.from_numpy(patch).unsqueeze(0)  # [1, P, P, P]
+        return volume, int(self.labels[idx])
@@ -0,0 +1,56 @@
+"""
+Export a trained ShwasNetra3D checkpoint to ONNX with a dynamic batch axis and
+check it against ONNX Runtime on random cubes.
+
+Usage:
+    python export_onnx.py --model models/shwasnetra_luna16_model.pth
+The cube size is read from the checkpoint.
+"""
+
+import os
+import argparse
+import numpy as np
+import torch
+
+from model import load_checkpoint
+
+MODEL_PATH = "models/shwasnetra_luna16_model.pth"
+
+
+def export(model_path, output_path, opset=17):
+    model = load_checkpoint(model_path, map_location=torch.device('cpu'))
+    model.eval()
+    input_size = model.input_size
+
+    dummy = torch.zeros(1, 1, input_size, input_size, input_size)
+    torch.onnx.export(model, dummy, output_path, opset_version=opset,
+                      input_names=["input"], output_names=["logits"],
+                      dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}})
+    return model
+
+
+def verify(model, onnx_path, input_size, batch_size=4, atol=1e-4):
+    """Max |torch - onnxruntime| logit difference on a random batch."""
+    import onnxruntime as ort
+    session = ort.InferenceSession(onnx_path, providers=["CPUExecutionProvider"])
+    x = np.random.default_rng(0).random((batch_size, 1, input_size, input_size, input_size), dtype=np.float32)
+    with torch.no_grad():
+        ref = model(torch.from_numpy(x)).numpy()
+    out = session.run(None, {"input": x})[0]
+    diff = float(np.abs(ref - out).max())
+    if diff > atol:
+        raise RuntimeError(f"ONNX output differs from PyTorch by {diff:.2e} (> {atol})")
+    return diff
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export ShwasNetra3D to ONNX.")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--output", help="defaults to the checkpoint path with .onnx")
+    parser.add_argument("--opset", type=int, default=17)
+    args = parser.parse_args()
+
+    output = args.output or os.path.splitext(args.model)[0] + ".onnx"
+    model = export(args.model, output, args.opset)
+    diff = verify(model, output, model.input_size)
+    print(f"✅ Exported {output} (max abs diff vs PyTorch {diff:.2e})")
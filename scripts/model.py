@@ -3,8 +3,9 @@ import torch.nn as nn
 import torch.nn.functional as F
 
 class ShwasNetra3D(nn.Module):
-    def __init__(self):
+    def __init__(self, input_size=128):
         super(ShwasNetra3D, self).__init__()
+        self.input_size = input_size
         
         self.conv1 = nn.Conv3d(1, 16, kernel_size=3, padding=1)
         self.bn1 = nn.BatchNorm3d(16)
@@ -18,9 +19,10 @@ class ShwasNetra3D(nn.Module):
         self.bn3 = nn.BatchNorm3d(64)
         self.pool3 = nn.MaxPool3d(2)
 
-        # Assuming input shape: [1, 128, 128, 128]
-        # After pooling 3 times: [64, 16, 16, 16]
-        self.fc1 = nn.Linear(64 * 16 * 16 * 16, 256)
+        # Input shape: [1, S, S, S] (128 for whole volumes, 32 for patch-bank cubes)
+        # After pooling 3 times: [64, S/8, S/8, S/8]
+        reduced = input_size // 8
+        self.fc1 = nn.Linear(64 * reduced * reduced * reduced, 256)
         self.dropout = nn.Dropout(0.3)
         self.fc2 = nn.Linear(256, 2)  # 2 classes: [No Nodule, Nodule]
 
@@ -33,3 +35,22 @@ class ShwasNetra3D(nn.Module):
         x = self.dropout(x)
         x = self.fc2(x)
         return x
+
+
+def save_checkpoint(model, path):
+    """Weights plus the cube size they were trained on, so loaders can rebuild the matching fc1."""
+    torch.save({"state_dict": model.state_dict(), "input_size": model.input_size}, path)
+
+
+def load_checkpoint(path, map_location="cpu"):
+    """ShwasNetra3D from a save_checkpoint() file, or from a bare state_dict (size read off fc1)."""
+    checkpoint = torch.load(path, map_location=map_location)
+    if "state_dict" in checkpoint:
+        state_dict, input_size = checkpoint["state_dict"], checkpoint["input_size"]
+    else:
+        state_dict = checkpoint
+        reduced = round((state_dict["fc1.weight"].shape[1] / 64) ** (1 / 3))
+        input_size = reduced * 8
+    model = ShwasNetra3D(input_size=input_size)
+    model.load_state_dict(state_dict)
+    return model
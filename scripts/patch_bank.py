@@ -0,0 +1,152 @@
+import os
+import csv
+import json
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+# Paths (same layout as train_luna16.py)
+PREPROCESSED_DIR = "preprocessed_luna16"
+ANNOTATIONS_PATH = "luna16/annotations.csv"
+PATCH_BANK_DIR = "patch_bank"
+
+# Sampling parameters
+PATCH_SIZE = 32             # cube edge in voxels (1 mm after resampling)
+NEGATIVES_PER_SCAN = 8      # random background cubes per scan
+NEGATIVE_MARGIN_MM = 10.0   # keep negatives this far outside any nodule radius
+HU_MIN, HU_MAX = -1000, 400  # same clipping window as preprocess_luna16.py
+SEED = 42
+
+
+def load_scan_meta(data_dir, scan_id):
+    """Return (origin_xyz, spacing_xyz) saved next to the .npy by preprocess_luna16.py, or None."""
+    meta_path = os.path.join(data_dir, scan_id + ".json")
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as f:
+        meta = json.load(f)
+    return np.array(meta["origin"], dtype=np.float64), np.array(meta["spacing"], dtype=np.float64)
+
+
+def world_to_voxel(world_xyz, origin_xyz, spacing_xyz):
+    """Convert world (mm, x/y/z) coordinates to array indices in (z, y, x) order."""
+    voxel_xyz = (np.asarray(world_xyz, dtype=np.float64) - origin_xyz) / spacing_xyz
+    return np.rint(voxel_xyz[..., ::-1]).astype(np.int64)
+
+
+def extract_patch(volume, center_zyx, size=PATCH_SIZE):
+    """Cut a size³ cube centred on center_zyx, padding with air (HU_MIN) past the scan border."""
+    half = size // 2
+    start = np.asarray(center_zyx) - half
+    stop = start + size
+    src_start = np.maximum(start, 0)
+    src_stop = np.minimum(stop, volume.shape)
+
+    patch = np.full((size, size, size), HU_MIN, dtype=volume.dtype)
+    dst_start = src_start - start
+    dst_stop = dst_start + (src_stop - src_start)
+    if np.all(src_stop > src_start):
+        patch[dst_start[0]:dst_stop[0], dst_start[1]:dst_stop[1], dst_start[2]:dst_stop[2]] = \
+            volume[src_start[0]:src_stop[0], src_start[1]:src_stop[1], src_start[2]:src_stop[2]]
+    return patch
+
+
+def normalize_hu(patch):
+    """Map the clipped HU window to [0, 1]."""
+    return (patch.astype(np.float32) - HU_MIN) / (HU_MAX - HU_MIN)
+
+
+def sample_negative_centers(shape, nodule_centers, nodule_radii, n, rng, margin=NEGATIVE_MARGIN_MM):
+    """Draw n random centres that stay clear of every annotated nodule."""
+    half = PATCH_SIZE // 2
+    low = np.array([half] * 3)
+    high = np.maximum(np.array(shape) - half, low + 1)
+
+    centers = []
+    for _ in range(n * 20):  # bounded rejection sampling
+        if len(centers) == n:
+            break
+        c = rng.integers(low, high)
+        if len(nodule_centers):
+            dist = np.linalg.norm(nodule_centers - c, axis=1)
+            if np.any(dist < nodule_radii + margin + half):
+                continue
+        centers.append(c)
+    return np.array(centers, dtype=np.int64).reshape(-1, 3)
+
+
+def plan_candidates(data_dir, annotations_path, negatives_per_scan=NEGATIVES_PER_SCAN, seed=SEED):
+    """
+    Decide every (scan, centre, label) to extract without reading voxel data.
+    Volumes are opened with mmap_mode='r' so only the header is touched here.
+    """
+    rng = np.random.default_rng(seed)
+    annotations = pd.read_csv(annotations_path)
+    by_scan = {uid: grp for uid, grp in annotations.groupby("seriesuid")}
+
+    scan_ids = sorted(f[:-4] for f in os.listdir(data_dir) if f.endswith(".npy"))
+    candidates = []
+    for scan_id in scan_ids:
+        meta = load_scan_meta(data_dir, scan_id)
+        if meta is None:
+            print(f"⚠️ Missing origin/spacing for {scan_id} — rerun preprocess_luna16.py")
+            continue
+        origin, spacing = meta
+        shape = np.load(os.path.join(data_dir, scan_id + ".npy"), mmap_mode="r").shape
+
+        nodules = by_scan.get(scan_id)
+        if nodules is not None:
+            world = nodules[["coordX", "coordY", "coordZ"]].to_numpy()
+            centers = world_to_voxel(world, origin, spacing)
+            radii = nodules["diameter_mm"].to_numpy() / 2.0 / spacing.min()
+            inside = np.all((centers >= 0) & (centers < shape), axis=1)
+            for c, d in zip(centers[inside], nodules["diameter_mm"].to_numpy()[inside]):
+                candidates.append((scan_id, *c, 1, float(d)))
+        else:
+            centers = np.empty((0, 3), dtype=np.int64)
+            radii = np.empty(0)
+
+        for c in sample_negative_centers(shape, centers, radii, negatives_per_scan, rng):
+            candidates.append((scan_id, *c, 0, 0.0))
+    return candidates
+
+
+def build_patch_bank(data_dir=PREPROCESSED_DIR, annotations_path=ANNOTATIONS_PATH, out_dir=PATCH_BANK_DIR,
+                     patch_size=PATCH_SIZE, negatives_per_scan=NEGATIVES_PER_SCAN, seed=SEED):
+    """
+    Extract fixed-size cubes around annotated nodules plus random negatives
+    into a single float16 patches.npy (memory-mappable), labels.npy and index.csv.
+    """
+    candidates = plan_candidates(data_dir, annotations_path, negatives_per_scan, seed)
+    if not candidates:
+        raise ValueError(f"No candidates found in {data_dir}")
+    os.makedirs(out_dir, exist_ok=True)
+
+    patches = np.lib.format.open_memmap(
+        os.path.join(out_dir, "patches.npy"), mode="w+", dtype=np.float16,
+        shape=(len(candidates), patch_size, patch_size, patch_size)
+    )
+    labels = np.array([c[4] for c in candidates], dtype=np.int8)
+
+    # Candidates are grouped by scan, so each volume is opened once
+    current_id, volume = None, None
+    for i, (scan_id, z, y, x, label, diameter) in enumerate(tqdm(candidates, desc="Extracting patches")):
+        if scan_id != current_id:
+            volume = np.load(os.path.join(data_dir, scan_id + ".npy"), mmap_mode="r")
+            current_id = scan_id
+        patches[i] = normalize_hu(extract_patch(volume, (z, y, x), patch_size))
+    patches.flush()
+    np.save(os.path.join(out_dir, "labels.npy"), labels)
+
+    with open(os.path.join(out_dir, "index.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["seriesuid", "z", "y", "x", "label", "diameter_mm"])
+        writer.writerows(candidates)
+
+    print(f"✅ Patch bank saved to {out_dir}: {len(candidates)} patches "
+          f"({int(labels.sum())} nodule, {int((labels == 0).sum())} background)")
+    return out_dir
+
+
+if __name__ == "__main__":
+    build_patch_bank()
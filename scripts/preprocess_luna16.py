@@ -1,10 +1,12 @@
 import os
+import json
 import numpy as np
 import SimpleITK as sitk
 from tqdm import tqdm
 
-# INPUT path
-LUNA16_SUBSET_PATH = r"E:\Shwasnetra\LUNA16\subset0"
+# INPUT paths (subset0 ... subset9 under the LUNA16 root; missing ones are skipped)
+LUNA16_ROOT = r"E:\Shwasnetra\LUNA16"
+LUNA16_SUBSETS = [f"subset{i}" for i in range(10)]
 
 # OUTPUT path for .npy files
 OUTPUT_DIR = r"E:\Shwasnetra\preprocessed_luna16"
@@ -38,12 +40,24 @@ def resample_image(itk_image, new_spacing=[1.0, 1.0, 1.0]):
 
     return resample.Execute(itk_image)
 
+def collect_mhd_files():
+    files = []
+    for subset in LUNA16_SUBSETS:
+        subset_path = os.path.join(LUNA16_ROOT, subset)
+        if not os.path.isdir(subset_path):
+            continue
+        files.extend(os.path.join(subset_path, f) for f in os.listdir(subset_path) if f.endswith('.mhd'))
+    return files
+
 def preprocess_and_save():
-    files = [f for f in os.listdir(LUNA16_SUBSET_PATH) if f.endswith('.mhd')]
+    files = collect_mhd_files()
     print(f"Found {len(files)} .mhd files.")
 
-    for f in tqdm(files, desc="Preprocessing"):
-        filepath = os.path.join(LUNA16_SUBSET_PATH, f)
+    for filepath in tqdm(files, desc="Preprocessing"):
+        f = os.path.basename(filepath)
+        scan_id = os.path.splitext(f)[0]
+        if os.path.exists(os.path.join(OUTPUT_DIR, scan_id + ".json")):
+            continue  # already preprocessed (resumable across subsets)
         try:
             img_array, origin, spacing, itk_image = load_itk_image(filepath)
 
@@ -55,8 +69,17 @@ def preprocess_and_save():
             clipped = np.clip(resampled_array, -1000, 400)
 
             # Save .npy
-            filename = os.path.splitext(f)[0] + ".npy"
-            np.save(os.path.join(OUTPUT_DIR, filename), clipped)
+            np.save(os.path.join(OUTPUT_DIR, scan_id + ".npy"), clipped)
+
+            # Save origin/spacing of the resampled grid so world (mm) nodule
+            # coordinates from annotations.csv can be mapped back to voxels
+            meta = {
+                "origin": list(resampled_itk.GetOrigin()),
+                "spacing": list(resampled_itk.GetSpacing()),
+                "shape": list(clipped.shape),
+            }
+            with open(os.path.join(OUTPUT_DIR, scan_id + ".json"), "w") as mf:
+                json.dump(meta, mf)
 
         except Exception as e:
             print(f"Error processing {f}: {e}")
@@ -0,0 +1,127 @@
+import os
+import time
+import numpy as np
+import torch
+
+from patch_bank import extract_patch, normalize_hu
+
+# Default knobs (override per call)
+PATCH_SIZE = 32          # must match the patch-bank model input
+STRIDE = 16              # 50% overlap between neighbouring windows
+BATCH_SIZE = 64          # patches per forward pass, mixed across scans
+MAX_BATCH_MB = 256       # ceiling on input + first-layer activations per batch
+AIR_HU = -900            # windows whose mean is below this are outside the body
+ACTIVATION_FACTOR = 17   # input + 16 conv1 channels, same spatial size
+
+
+def window_starts(length, size, stride):
+    """Start offsets covering [0, length) with the last window flush against the end."""
+    if length <= size:
+        return [0]
+    starts = list(range(0, length - size + 1, stride))
+    if starts[-1] != length - size:
+        starts.append(length - size)
+    return starts
+
+
+class ScanResult:
+    def __init__(self, scan_id, score, heat, origins):
+        self.scan_id = scan_id
+        self.score = score        # max window probability of the nodule class
+        self.heat = heat          # [nz, ny, nx] window probabilities (stride resolution)
+        self.origins = origins    # per-axis window start offsets, to map heat back to voxels
+
+
+class SlidingWindowEngine:
+    """
+    Tiles full-resolution CT volumes into overlapping cubes and scores them in
+    batches that mix windows from several scans, so the model always sees full
+    batches regardless of how many windows the current scan has left.
+    """
+    def __init__(self, model, patch_size=PATCH_SIZE, stride=STRIDE, batch_size=BATCH_SIZE,
+                 max_batch_mb=MAX_BATCH_MB, skip_air=True, device=None):
+        self.model = model.eval()
+        self.patch_size = patch_size
+        self.stride = stride
+        self.skip_air = skip_air
+        self.device = device or torch.device("cpu")
+
+        patch_bytes = 4 * patch_size ** 3 * ACTIVATION_FACTOR
+        self.batch_size = max(1, min(batch_size, (max_batch_mb * 1024 * 1024) // patch_bytes))
+
+        self.patches_scored = 0
+        self.patches_skipped = 0
+        self.seconds = 0.0
+
+    @property
+    def patches_per_sec(self):
+        return self.patches_scored / self.seconds if self.seconds else 0.0
+
+    def _score_batch(self, batch):
+        x = torch.from_numpy(np.stack(batch)).unsqueeze(1).to(self.device)  # [B, 1, P, P, P]
+        start = time.perf_counter()
+        with torch.no_grad():
+            probs = torch.softmax(self.model(x), dim=1)[:, 1].cpu().numpy()
+        self.seconds += time.perf_counter() - start
+        self.patches_scored += len(batch)
+        return probs
+
+    def run(self, scans):
+        """
+        scans: iterable of (scan_id, volume[D, H, W] in clipped HU).
+        Yields a ScanResult as soon as every window of that scan has been scored.
+        """
+        pending = {}   # scan_id -> [heat, remaining windows, origins]
+        batch, owners = [], []
+
+        def flush():
+            if not batch:
+                return
+            for (sid, idx), p in zip(owners, self._score_batch(batch)):
+                pending[sid][0][idx] = p
+                pending[sid][1] -= 1
+            batch.clear()
+            owners.clear()
+
+        def finished():
+            for sid in [s for s, state in pending.items() if state[1] == 0]:
+                heat, _, origins = pending.pop(sid)
+                yield ScanResult(sid, float(heat.max()), heat, origins)
+
+        for scan_id, volume in scans:
+            origins = [window_starts(n, self.patch_size, self.stride) for n in volume.shape]
+            grid = tuple(len(o) for o in origins)
+            pending[scan_id] = [np.zeros(grid, dtype=np.float32), int(np.prod(grid)), origins]
+
+            for idx in np.ndindex(*grid):
+                start = np.array([origins[a][idx[a]] for a in range(3)])
+                patch = extract_patch(volume, start + self.patch_size // 2, self.patch_size)
+                if self.skip_air and patch.mean() < AIR_HU:
+                    self.patches_skipped += 1
+                    pending[scan_id][1] -= 1
+                    continue
+                batch.append(normalize_hu(patch))
+                owners.append((scan_id, idx))
+                if len(batch) == self.batch_size:
+                    flush()
+                    yield from finished()
+            yield from finished()  # scans made only of air windows
+
+        flush()
+        yield from finished()
+
+
+def load_volume(data_dir, scan_id):
+    """Memory-map a preprocessed scan so only the tiled windows are read."""
+    return np.load(os.path.join(data_dir, scan_id + ".npy"), mmap_mode="r")
+
+
+def heat_to_volume(result, shape, patch_size=PATCH_SIZE):
+    """Spread window scores back over the voxels they cover (mean over overlaps)."""
+    total = np.zeros(shape, dtype=np.float32)
+    count = np.zeros(shape, dtype=np.uint16)
+    for idx in np.ndindex(*result.heat.shape):
+        z, y, x = (result.origins[a][idx[a]] for a in range(3))
+        total[z:z + patch_size, y:y + patch_size, x:x + patch_size] += result.heat[idx]
+        count[z:z + patch_size, y:y + patch_size, x:x + patch_size] += 1
+    return total / np.maximum(count, 1)
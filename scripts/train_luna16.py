@@ -3,8 +3,8 @@ import torch
 import torch.nn as nn
 import torch.optim as optim
 from torch.utils.data import DataLoader, WeightedRandomSampler
-from dataset_luna16 import Luna16Dataset
-from model import ShwasNetra3D
+from dataset_luna16 import Luna16Dataset, Luna16PatchDataset
+from model import ShwasNetra3D, save_checkpoint
 import numpy as np
 from collections import Counter
 
@@ -32,12 +32,23 @@ class FocalLoss(nn.Module):
 # Device configuration
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
-# Load dataset
+# Load dataset: nodule-centric patch bank (see patch_bank.py) when built, whole volumes otherwise
 annotations_path = "luna16/annotations.csv"
-dataset = Luna16Dataset(data_dir="preprocessed_luna16", annotations_path=annotations_path)
+PATCH_BANK_DIR = "patch_bank"
+USE_PATCH_BANK = os.path.exists(os.path.join(PATCH_BANK_DIR, "patches.npy"))
+
+if USE_PATCH_BANK:
+    dataset = Luna16PatchDataset(PATCH_BANK_DIR)
+    labels = dataset.labels.tolist()
+    input_size = dataset.patch_size
+    batch_size = 32
+else:
+    dataset = Luna16Dataset(data_dir="preprocessed_luna16", annotations_path=annotations_path)
+    labels = [1 if scan_id in dataset.positive_ids else 0 for scan_id in dataset.scan_ids]
+    input_size = 128
+    batch_size = 2
 
 # Count label distribution
-labels = [1 if scan_id in dataset.positive_ids else 0 for scan_id in dataset.scan_ids]
 label_counts = Counter(labels)
 print(f"📊 Label distribution: {label_counts}")
 
@@ -46,10 +57,10 @@ weights = [1.0 / label_counts[label] for label in labels]
 sampler = WeightedRandomSampler(weights, num_samples=len(weights), replacement=True)
 
 # DataLoader
-dataloader = DataLoader(dataset, batch_size=2, sampler=sampler)
+dataloader = DataLoader(dataset, batch_size=batch_size, sampler=sampler)
 
 # Initialize model
-model = ShwasNetra3D().to(device)
+model = ShwasNetra3D(input_size=input_size).to(device)
 
 # Loss, optimizer
 criterion = FocalLoss(alpha=1.0, gamma=2.0)
@@ -57,7 +68,7 @@ optimizer = optim.Adam(model.parameters(), lr=0.001)
 
 # Training loop
 num_epochs = 50  # You said you want 50
-print(f"🚀 Starting training on {device} with {len(dataset)} samples...")
+print(f"🚀 Starting training on {device} with {len(dataset)} {'patches' if USE_PATCH_BANK else 'scans'}...")
 
 for epoch in range(num_epochs):
     model.train()
@@ -89,7 +100,7 @@ for epoch in range(num_epochs):
     accuracy = 100 * correct / total
     print(f"✅ Epoch {epoch+1} completed. Avg Loss: {avg_loss:.4f}, Accuracy: {accuracy:.2f}%")
 
-# Save the model
+# Save the model with its input size: the patch-bank (32³) and whole-volume (128³) models differ in fc1
 os.makedirs("models", exist_ok=True)
-torch.save(model.state_dict(), "models/shwasnetra_luna16_model.pth")
-print("✅ Model saved as models/shwasnetra_luna16_model.pth")
+save_checkpoint(model, "models/shwasnetra_luna16_model.pth")
+print(f"✅ Model ({input_size}³ input) saved as models/shwasnetra_luna16_model.pth")
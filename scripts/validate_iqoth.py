@@ -1,11 +1,17 @@
 import os
+import sys
+import numpy as np
 import torch
 from torchvision import transforms
 from PIL import Image
 from torch.utils.data import DataLoader, Dataset
 
 # Import the same model you used in training
-from train_luna16 import Simple3DCNN
+from model import load_checkpoint
+
+# Shared metrics live in backend/utils/evaluation.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+from utils.evaluation import confusion_matrix, format_report, roc_auc
 
 DATA_DIR = "E:/Shwasnetra/The IQ-OTHNCCD lung cancer dataset"
 MODEL_PATH = "shwasnetra_luna16_model.pth"
@@ -17,8 +23,9 @@ LABEL_MAP = {
 }
 
 class IQOTHDataset(Dataset):
-    def __init__(self, root_dir, transform=None):
+    def __init__(self, root_dir, transform=None, cube_size=128):
         self.transform = transform
+        self.cube_size = cube_size
         self.samples = []
         for label_name, label in LABEL_MAP.items():
             class_dir = os.path.join(root_dir, label_name)
@@ -35,7 +42,7 @@ class IQOTHDataset(Dataset):
         if self.transform:
             image = self.transform(image)
         image = image.unsqueeze(0)  # shape: (1, H, W)
-        image = torch.nn.functional.interpolate(image.unsqueeze(0), size=(128, 128, 128), mode="trilinear", align_corners=False)
+        image = torch.nn.functional.interpolate(image.unsqueeze(0), size=(self.cube_size,) * 3, mode="trilinear", align_corners=False)
         return image.squeeze(0), torch.tensor(label, dtype=torch.float32)
 
 transform = transforms.Compose([
@@ -43,25 +50,27 @@ transform = transforms.Compose([
     transforms.ToTensor(),
 ])
 
-dataset = IQOTHDataset(DATA_DIR, transform=transform)
-loader = DataLoader(dataset, batch_size=4, shuffle=False)
-
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
-model = Simple3DCNN().to(device)
-model.load_state_dict(torch.load(MODEL_PATH, map_location=device))
+# the checkpoint records its cube size (32 for the patch-bank model, 128 for whole volumes)
+model = load_checkpoint(MODEL_PATH, map_location=device).to(device)
 model.eval()
 
-correct = 0
-total = 0
+dataset = IQOTHDataset(DATA_DIR, transform=transform, cube_size=model.input_size)
+loader = DataLoader(dataset, batch_size=4, shuffle=False)
+
+scores, y_true = [], []
 
 with torch.no_grad():
     for images, labels in loader:
-        images, labels = images.to(device), labels.to(device).unsqueeze(1)
-        outputs = model(images)
-        preds = (outputs > 0.5).float()
-        correct += (preds == labels).sum().item()
-        total += labels.size(0)
+        outputs = model(images.to(device))
+        scores.append(torch.softmax(outputs, dim=1)[:, 1].cpu().numpy())
+        y_true.append(labels.numpy().astype(np.int64))
+
+scores = np.concatenate(scores)
+y_true = np.concatenate(y_true)
+cm = confusion_matrix(y_true, (scores > 0.5).astype(np.int64), num_classes=2)
 
-accuracy = correct / total
-print(f"✅ External Validation Accuracy on IQ-OTH/NCCD: {accuracy:.4f}")
+print(f"✅ External Validation Accuracy on IQ-OTH/NCCD: {np.trace(cm) / cm.sum():.4f}")
+print(format_report(cm, ["normal", "abnormal"]))
+print(f"AUC: {roc_auc(y_true, scores):.4f}")